@@ -0,0 +1,335 @@
+"""Arquivamento e remoção dos registros excluídos logicamente.
+
+Os registros com deleted=True há mais de ARCHIVE_AFTER_DAYS dias (pelo updated_on)
+são movidos para a tabela de arquivo do model (<tabela>_archive) ou removidos
+definitivamente. O processamento é feito em lotes limitados, cada lote em uma
+transação (cópia para o arquivo + exclusão na tabela principal), com pausa entre
+os lotes. Como os registros processados saem da tabela principal, uma execução
+interrompida continua de onde parou na próxima execução.
+
+A exclusão utiliza o Collector do Django, assim os registros removidos em cascata
+(on_delete=CASCADE e tabelas intermediárias dos ManyToMany) também são arquivados,
+cada um na tabela de arquivo do seu model. Os registros cuja remoção alcançaria
+registros ativos (dependentes não excluídos, PROTECT, SET_NULL ou SET_DEFAULT) são
+mantidos na tabela principal e contados como ignorados.
+
+Os registros arquivados são acessados pelo Model.objects_archive, no mesmo estilo
+do objects_all, e podem ser devolvidos à tabela principal com o restore(), que
+devolve também os dependentes arquivados em cascata:
+    Model.objects_archive.filter(archived_on__lt=data).restore()
+"""
+import logging
+import time
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+
+from django.apps.registry import Apps
+from django.db import connections, models, router, transaction
+from django.db.models import Q
+from django.db.models.deletion import Collector, ProtectedError
+from django.utils import timezone
+
+from .facets import bump_facet_version
+from .settings import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, ARCHIVE_SLEEP
+from .soft_delete import is_soft_deletable, soft_delete_cascade
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_TABLE_SUFFIX = '_archive'
+
+# Registro isolado para os models de arquivo, que não fazem parte das migrations
+_archive_apps = Apps()
+_archive_models = {}
+_archive_tables = set()
+
+ArchiveResult = namedtuple('ArchiveResult', ['batches', 'counts', 'finished', 'skipped'])
+
+# Atributos que não são copiados para os campos da tabela de arquivo
+_DROPPED_FIELD_KWARGS = ('unique', 'db_index', 'auto_now', 'auto_now_add', 'default', 'db_column', 'primary_key',
+                         'unique_for_date', 'unique_for_month', 'unique_for_year', 'validators')
+
+
+def _archive_field(field):
+    """Campo equivalente na tabela de arquivo, os relacionamentos viram colunas simples
+    (sem chave estrangeira) com o mesmo tipo da chave referenciada
+
+    Returns:
+        Tuple -- (nome, campo)
+    """
+    source = field.target_field if field.is_relation else field
+    name, path, args, kwargs = source.deconstruct()
+    for key in _DROPPED_FIELD_KWARGS:
+        kwargs.pop(key, None)
+    field_class = source.__class__
+    if isinstance(source, models.BigAutoField):
+        field_class = models.BigIntegerField
+    elif isinstance(source, models.AutoField):
+        field_class = models.IntegerField
+    if field.primary_key:
+        kwargs['primary_key'] = True
+    else:
+        kwargs['null'] = True
+    return field.attname, field_class(*args, db_column=field.column, **kwargs)
+
+
+def get_archive_model(model):
+    """Model (não gerenciado pelas migrations) da tabela de arquivo, criado uma única vez por model"""
+    archive_model = _archive_models.get(model)
+    if archive_model is None:
+        attrs = OrderedDict(_archive_field(field) for field in model._meta.concrete_fields)
+        attrs['archived_on'] = models.DateTimeField(db_index=True)
+        attrs['objects'] = ArchiveQuerySet.as_manager()
+        attrs['source_model'] = model
+        attrs['__module__'] = model.__module__
+        attrs['Meta'] = type('Meta', (), {
+            'apps': _archive_apps,
+            'app_label': model._meta.app_label,
+            'db_table': model._meta.db_table + ARCHIVE_TABLE_SUFFIX,
+            'ordering': ['-archived_on'],
+        })
+        archive_model = type('{}Archive'.format(model.__name__), (models.Model,), attrs)
+        _archive_models[model] = archive_model
+    return archive_model
+
+
+def ensure_archive_table(model, using='default'):
+    """Cria a tabela de arquivo do model caso ainda não exista"""
+    archive_model = get_archive_model(model)
+    key = (using, archive_model._meta.db_table)
+    if key not in _archive_tables:
+        connection = connections[using]
+        if archive_model._meta.db_table not in connection.introspection.table_names():
+            with connection.schema_editor() as schema_editor:
+                schema_editor.create_model(archive_model)
+        _archive_tables.add(key)
+    return archive_model
+
+
+def _copy_rows(model, queryset, archived_on, using, batch_size):
+    """Copia as linhas da queryset para a tabela de arquivo do model"""
+    archive_model = ensure_archive_table(model, using)
+    names = [field.attname for field in model._meta.concrete_fields]
+    copied = 0
+    rows = []
+    for values in queryset.values(*names).iterator():
+        rows.append(archive_model(archived_on=archived_on, **values))
+        if len(rows) >= batch_size:
+            archive_model._base_manager.using(using).bulk_create(rows)
+            copied += len(rows)
+            rows = []
+    if rows:
+        archive_model._base_manager.using(using).bulk_create(rows)
+        copied += len(rows)
+    return copied
+
+
+def _has_live_rows(model, queryset):
+    """Indica se a queryset possui registros ativos, as linhas das tabelas
+    intermediárias dos ManyToMany acompanham os registros arquivados"""
+    if model._meta.auto_created:
+        return False
+    if is_soft_deletable(model):
+        return queryset.filter(deleted=False).exists()
+    return queryset.exists()
+
+
+def _collect(model, keys, using):
+    """Collector da remoção dos registros ou None quando ela alcança registros ativos"""
+    collector = Collector(using=using)
+    try:
+        collector.collect(list(model._base_manager.using(using).filter(pk__in=keys)))
+    except ProtectedError:
+        return None
+    # SET_NULL e SET_DEFAULT alteram registros que permanecem na tabela principal
+    if collector.field_updates:
+        return None
+    for related_model, instances in collector.data.items():
+        if related_model._meta.auto_created:
+            continue
+        if not is_soft_deletable(related_model) or any(not instance.deleted for instance in instances):
+            return None
+    if any(_has_live_rows(queryset.model, queryset) for queryset in collector.fast_deletes):
+        return None
+    return collector
+
+
+def _archive_batch(model, keys, using, purge, batch_size):
+    """Arquiva (ou apenas remove quando purge) um lote de registros e os dependentes em cascata.
+    Quando o lote alcança registros ativos apenas os registros que não os alcançam são processados
+
+    Returns:
+        Tuple -- ({label do model: quantidade de registros removidos}, quantidade de registros ignorados)
+    """
+    collector = _collect(model, keys, using)
+    skipped = 0
+    if collector is None:
+        clean = [key for key in keys if _collect(model, [key], using) is not None]
+        skipped = len(keys) - len(clean)
+        if not clean:
+            return {}, skipped
+        collector = _collect(model, clean, using)
+    if not purge:
+        archived_on = timezone.now()
+        for qs in collector.fast_deletes:
+            _copy_rows(qs.model, qs, archived_on, using, batch_size)
+        for related_model, instances in collector.data.items():
+            related_keys = [instance.pk for instance in instances]
+            _copy_rows(related_model, related_model._base_manager.using(using).filter(pk__in=related_keys),
+                       archived_on, using, batch_size)
+    deleted, counts = collector.delete()
+    for label in counts:
+        bump_facet_version(model._meta.apps.get_model(label))
+    return counts, skipped
+
+
+def get_archivable(model, days=None, using='default'):
+    """Registros excluídos logicamente há mais de days dias"""
+    days = ARCHIVE_AFTER_DAYS if days is None else days
+    limit = timezone.now() - timedelta(days=days)
+    return model._base_manager.using(using).filter(deleted=True, updated_on__lt=limit)
+
+
+def get_dependent_relations(model):
+    """Relacionamentos reversos (ForeignKey/OneToOne e tabelas intermediárias dos ManyToMany)
+    dos models que podem ser removidos em cascata junto com o registro"""
+    return [relation for relation in model._meta.get_fields(include_hidden=True)
+            if relation.auto_created and not relation.concrete and (relation.one_to_many or relation.one_to_one)]
+
+
+def ensure_archive_tables(model, using='default', visited=None):
+    """Cria as tabelas de arquivo do model e dos models que podem ser removidos em cascata.
+    As tabelas são criadas antes dos lotes, pois o SQLite não altera o schema dentro de transações
+    """
+    visited = set() if visited is None else visited
+    if model in visited:
+        return
+    visited.add(model)
+    ensure_archive_table(model, using)
+    for relation in get_dependent_relations(model):
+        ensure_archive_tables(relation.related_model, using, visited)
+
+
+def archive_deleted(model, days=None, purge=False, batch_size=None, sleep=None, max_batches=None, time_limit=None,
+                  using=None, progress=None):
+    """Move para a tabela de arquivo (ou remove definitivamente quando purge) os registros
+    excluídos logicamente há mais de days dias
+
+    Keyword Arguments:
+        days {int} -- Idade mínima em dias, quando None utiliza o ARCHIVE_AFTER_DAYS (default: {None})
+        purge {bool} -- Remover sem arquivar (default: {False})
+        batch_size {int} -- Registros por lote, quando None utiliza o ARCHIVE_BATCH_SIZE (default: {None})
+        sleep {float} -- Pausa entre os lotes, quando None utiliza o ARCHIVE_SLEEP (default: {None})
+        max_batches {int} -- Quantidade máxima de lotes nesta execução (default: {None})
+        time_limit {float} -- Tempo máximo em segundos desta execução (default: {None})
+        using {str} -- Banco de dados (default: {None})
+        progress {callable} -- Função chamada a cada lote com (número do lote, contagens acumuladas)
+
+    Returns:
+        ArchiveResult -- Lotes processados, {label do model: quantidade}, se todos os registros foram
+                         processados e a quantidade de registros ignorados por alcançarem registros ativos
+    """
+    using = using or router.db_for_write(model)
+    batch_size = batch_size or ARCHIVE_BATCH_SIZE
+    sleep = ARCHIVE_SLEEP if sleep is None else sleep
+    if not purge:
+        ensure_archive_tables(model, using)
+    started = time.monotonic()
+    counts = OrderedDict()
+    batches = 0
+    skipped = 0
+    # os registros ignorados permanecem na tabela, os lotes seguem pela chave primária
+    last = None
+    while True:
+        if max_batches is not None and batches >= max_batches:
+            return ArchiveResult(batches, counts, False, skipped)
+        if time_limit is not None and time.monotonic() - started >= time_limit:
+            return ArchiveResult(batches, counts, False, skipped)
+        queryset = get_archivable(model, days, using).order_by('pk')
+        if last is not None:
+            queryset = queryset.filter(pk__gt=last)
+        keys = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not keys:
+            return ArchiveResult(batches, counts, True, skipped)
+        last = keys[-1]
+        with transaction.atomic(using=using):
+            batch_counts, batch_skipped = _archive_batch(model, keys, using, purge, batch_size)
+            for label, deleted in batch_counts.items():
+                counts[label] = counts.get(label, 0) + deleted
+        skipped += batch_skipped
+        batches += 1
+        if progress is not None:
+            progress(batches, counts)
+        if sleep:
+            time.sleep(sleep)
+
+
+def _restore_rows(archive_model, keys, using, tables, counts):
+    """Devolve as linhas da tabela de arquivo para a tabela principal, seguidas dos
+    dependentes arquivados em cascata que referenciam as chaves devolvidas"""
+    model = archive_model.source_model
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    pk = model._meta.pk
+    columns = ', '.join(qn(field.column) for field in model._meta.concrete_fields)
+    with connection.cursor() as cursor:
+        sql = 'INSERT INTO {table} ({columns}) SELECT {columns} FROM {archive} WHERE {pk} IN ({keys})'.format(
+            table=qn(model._meta.db_table), archive=qn(archive_model._meta.db_table), columns=columns,
+            pk=qn(pk.column), keys=', '.join(['%s'] * len(keys)))
+        cursor.execute(sql, [pk.get_db_prep_value(key, connection) for key in keys])
+    archive_model._base_manager.using(using).filter(pk__in=keys).delete()
+    counts[model._meta.label] = counts.get(model._meta.label, 0) + len(keys)
+    for relation in get_dependent_relations(model):
+        child_archive = get_archive_model(relation.related_model)
+        if child_archive._meta.db_table not in tables:
+            continue
+        queryset = child_archive._base_manager.using(using).filter(**{
+            '{}__in'.format(relation.field.attname): keys})
+        # apenas as linhas cujos demais relacionamentos existem na tabela principal
+        for field in relation.related_model._meta.concrete_fields:
+            if field.is_relation and field is not relation.field:
+                targets = field.related_model._base_manager.using(using).values(field.target_field.attname)
+                queryset = queryset.filter(Q(**{'{}__isnull'.format(field.attname): True}) |
+                                           Q(**{'{}__in'.format(field.attname): targets}))
+        child_keys = list(queryset.values_list('pk', flat=True))
+        if child_keys:
+            _restore_rows(child_archive, child_keys, using, tables, counts)
+
+
+class ArchiveQuerySet(models.QuerySet):
+    """QuerySet dos registros arquivados"""
+
+    def restore(self, undelete=False, batch_size=None):
+        """Devolve os registros e os dependentes arquivados em cascata para a tabela principal,
+        na mesma transação, mantendo deleted=True ou reativando-os quando undelete=True
+        (com a restauração em cascata da exclusão lógica, ver soft_delete).
+        A cópia é feita por INSERT ... SELECT, preservando o created_on e o updated_on
+
+        Returns:
+            int -- Quantidade de registros restaurados, sem os dependentes
+        """
+        model = self.model.source_model
+        batch_size = batch_size or ARCHIVE_BATCH_SIZE
+        tables = set(connections[self.db].introspection.table_names())
+        counts = OrderedDict()
+        restored = 0
+        while True:
+            keys = list(self.values_list('pk', flat=True)[:batch_size])
+            if not keys:
+                break
+            with transaction.atomic(using=self.db):
+                _restore_rows(self.model, keys, self.db, tables, counts)
+                if undelete:
+                    soft_delete_cascade(model, keys, using=self.db, deleted=False)
+            restored += len(keys)
+        for label in counts:
+            bump_facet_version(model._meta.apps.get_model(label))
+        return restored
+
+
+class ArchiveDescriptor(object):
+    """Acesso aos registros arquivados a partir da classe do model, ex: Model.objects_archive.all()"""
+
+    def __get__(self, instance, owner):
+        if owner._meta.abstract:
+            raise AttributeError('Models abstratos não possuem arquivo')
+        return get_archive_model(owner)._default_manager
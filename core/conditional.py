@@ -0,0 +1,102 @@
+"""GET condicional (ETag/Last-Modified) a partir do campo updated_on do Base.
+
+Antes de montar a resposta é executada uma única consulta agregada:
+    listagem -- MAX(updated_on) e COUNT(*) da queryset filtrada, apenas no ETag
+    detalhe -- updated_on do registro, no ETag e no Last-Modified
+Quando o cliente envia If-None-Match/If-Modified-Since com os mesmos valores a
+resposta 304 é retornada sem serializar nem renderizar os registros.
+
+O ETag também considera a URL completa (filtros e página), o Accept, o usuário e a
+versão de gravação (ver facets.get_write_version) dos models relacionados, que é alterada a cada
+save/exclusão, assim as colunas e seções dos relacionamentos não ficam desatualizadas.
+Alterações feitas com queryset.update() sem o updated_on não são percebidas.
+"""
+import calendar
+import hashlib
+from functools import lru_cache
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .facets import get_write_version
+
+
+def has_updated_on(model):
+    return any(field.name == 'updated_on' for field in model._meta.concrete_fields)
+
+
+@lru_cache(maxsize=None)
+def get_related_models(model):
+    """Models ligados pelas chaves estrangeiras e pelos relacionamentos do model"""
+    related = {field.related_model for field in model._meta.get_fields()
+               if field.is_relation and field.related_model is not None and field.related_model is not model}
+    return tuple(sorted(related, key=lambda related_model: related_model._meta.label))
+
+
+def build_etag(request, model, *parts):
+    """ETag forte formado pelos valores informados e pelos dados da requisição"""
+    user = getattr(request, 'user', None)
+    values = [model._meta.label, request.get_full_path(), request.META.get('HTTP_ACCEPT', ''),
+              getattr(user, 'pk', None) or '']
+    values += ['{}:{}'.format(related._meta.label, get_write_version(related)) for related in get_related_models(model)]
+    values += parts
+    return '"{}"'.format(hashlib.md5(':'.join('{}'.format(value) for value in values).encode('utf-8')).hexdigest())
+
+
+def list_validators(request, queryset):
+    """ETag da listagem, com MAX(updated_on) e COUNT(*) em uma única consulta.
+    A listagem não utiliza o Last-Modified, pois a remoção de registros não altera o MAX(updated_on)
+
+    Returns:
+        Tuple -- (etag, None) ou None quando o model não possui o updated_on
+    """
+    if not has_updated_on(queryset.model):
+        return None
+    row = queryset.order_by().aggregate(core_last_modified=Max('updated_on'), core_total=Count('pk'))
+    return build_etag(request, queryset.model, row['core_total'], row['core_last_modified']), None
+
+
+def detail_validators(request, queryset, pk):
+    """ETag e Last-Modified do registro, apenas com o updated_on
+
+    Returns:
+        Tuple -- (etag, last_modified) ou None quando o registro não existe ou o model não possui o updated_on
+    """
+    if pk is None or not has_updated_on(queryset.model):
+        return None
+    try:
+        rows = list(queryset.order_by().filter(pk=pk).values_list('updated_on', flat=True)[:1])
+    except (ValueError, ValidationError):
+        # chave inválida, o 404 é retornado pela própria view
+        return None
+    if not rows:
+        return None
+    return build_etag(request, queryset.model, pk, rows[0]), rows[0]
+
+
+def conditional_response(request, validators, handler):
+    """Retorna o 304 quando o cliente já possui a versão atual, caso contrário chama o handler
+    e adiciona os cabeçalhos ETag/Last-Modified na resposta
+
+    Arguments:
+        validators {Tuple} -- (etag, last_modified) ou None para apenas chamar o handler
+        handler {callable} -- Função que monta a resposta completa
+    """
+    if validators is None or request.method not in ('GET', 'HEAD'):
+        return handler()
+    etag, last_modified = validators
+    timestamp = calendar.timegm(last_modified.utctimetuple()) if last_modified is not None else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = handler()
+        if response.status_code != 200:
+            return response
+    if not response.has_header('ETag'):
+        response['ETag'] = etag
+    if timestamp is not None and not response.has_header('Last-Modified'):
+        response['Last-Modified'] = http_date(timestamp)
+    # o navegador guarda a resposta mas sempre confirma com o servidor antes de utilizá-la
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
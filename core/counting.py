@@ -0,0 +1,111 @@
+"""Estratégias para contar os registros das listagens paginadas.
+
+    exact    -- SELECT COUNT(*) a cada requisição (padrão)
+    estimate -- estimativa do planejador do banco (EXPLAIN no PostgreSQL),
+                quando o banco não suporta é utilizado o exact
+    cached   -- SELECT COUNT(*) armazenado em cache pelo tempo do COUNT_CACHE_TTL,
+                a chave é gerada a partir do SQL normalizado da queryset, assim
+                cada combinação de filtros possui a sua contagem
+"""
+import hashlib
+import json
+import logging
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from .settings import COUNT_CACHE_TTL, COUNT_ESTIMATE_THRESHOLD, COUNT_MODE, COUNT_MODES
+
+logger = logging.getLogger(__name__)
+
+COUNT_EXACT = 'exact'
+COUNT_ESTIMATE = 'estimate'
+COUNT_CACHED = 'cached'
+
+
+class CountResult(int):
+    """Inteiro com a informação se a contagem é uma estimativa,
+    no template é exibido como ~N quando estimado"""
+
+    def __new__(cls, value, estimated=False):
+        result = super(CountResult, cls).__new__(cls, value)
+        result.estimated = estimated
+        return result
+
+    def __str__(self):
+        return '~{}'.format(int(self)) if self.estimated else '{}'.format(int(self))
+
+
+def get_count_mode(model, mode=None):
+    """Retorna a estratégia de contagem do model, a informada tem prioridade sobre o settings"""
+    if mode:
+        return mode
+    return COUNT_MODES.get(model._meta.label_lower, COUNT_MODE)
+
+
+def get_count_cache_key(queryset):
+    """Chave do cache gerada a partir do SQL e dos parâmetros da queryset"""
+    sql, params = queryset.query.sql_with_params()
+    digest = hashlib.md5('{}{}'.format(sql, params).encode('utf-8')).hexdigest()
+    return 'core:count:{}:{}'.format(queryset.model._meta.label_lower, digest)
+
+
+def estimate_count(queryset):
+    """Retorna a quantidade de linhas estimada pelo planejador do banco ou None
+    caso o banco não suporte a estimativa"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    try:
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) {}'.format(sql), params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    except Exception as error:
+        logger.error('Erro: %s; No Metodo: %s' % (error, 'estimate_count()'))
+        return None
+
+
+def count_queryset(queryset, mode=None, ttl=None):
+    """Conta os registros da queryset conforme a estratégia informada
+
+    Returns:
+        CountResult
+    """
+    mode = get_count_mode(queryset.model, mode)
+    if mode == COUNT_ESTIMATE:
+        estimate = estimate_count(queryset)
+        # estimativas pequenas não compensam, o COUNT(*) é barato e exato
+        if estimate is not None and estimate >= COUNT_ESTIMATE_THRESHOLD:
+            return CountResult(estimate, estimated=True)
+    elif mode == COUNT_CACHED:
+        key = get_count_cache_key(queryset)
+        value = cache.get(key)
+        if value is None:
+            value = queryset.count()
+            cache.set(key, value, COUNT_CACHE_TTL if ttl is None else ttl)
+        return CountResult(value)
+    return CountResult(queryset.count())
+
+
+class CountingPaginator(Paginator):
+    """Paginator que utiliza a estratégia de contagem configurada
+
+    Keyword Arguments:
+        count_mode {str} -- 'exact', 'estimate' ou 'cached', quando None utiliza o settings
+    """
+
+    def __init__(self, object_list, per_page, count_mode=None, **kwargs):
+        self.count_mode = count_mode
+        super(CountingPaginator, self).__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        if hasattr(self.object_list, 'query'):
+            return count_queryset(self.object_list, self.count_mode)
+        return CountResult(len(self.object_list))
@@ -0,0 +1,222 @@
+"""Exportação em streaming (NDJSON, CSV e XLSX) das listagens e das querysets da API.
+
+Os registros são percorridos com queryset.iterator(chunk_size) e convertidos em linhas
+lote a lote, cada lote é escrito e enviado pelo StreamingHttpResponse antes do próximo
+ser carregado, assim a memória utilizada não depende da quantidade de registros.
+O XLSX é gerado sem dependências externas, o zip é escrito em modo streaming
+(sem seek) e a planilha utiliza textos inline, sem a tabela de textos compartilhados.
+"""
+import csv
+import json
+import zipfile
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import UUID
+from xml.sax.saxutils import escape
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import prefetch_related_objects
+from django.http import StreamingHttpResponse
+from django.utils.functional import Promise
+
+from .settings import EXPORT_CHUNK_SIZE
+
+# Parametro da URL da exportação, ex: ?export=csv
+EXPORT_QUERY_PARAM = 'export'
+
+EXPORT_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def iter_chunks(queryset, chunk_size=None):
+    """Percorre a queryset em lotes de registros com o iterator(), mantendo o prefetch_related,
+    que o iterator() ignora, aplicado em cada lote
+    """
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    prefetch = queryset._prefetch_related_lookups
+    chunk = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) >= chunk_size:
+            if prefetch:
+                prefetch_related_objects(chunk, *prefetch)
+            yield chunk
+            chunk = []
+    if chunk:
+        if prefetch:
+            prefetch_related_objects(chunk, *prefetch)
+        yield chunk
+
+
+# Caracteres iniciais que o Excel/LibreOffice interpretam como fórmula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def format_cell(value):
+    """Converte o valor em um valor escalar para o CSV/XLSX: listas e dicionários (ManyToMany,
+    relacionamentos expandidos) em JSON e os textos iniciados por caracteres de fórmula
+    prefixados com ' (evitando a execução de fórmulas ao abrir o arquivo)
+    """
+    if isinstance(value, (list, tuple, set, dict)):
+        value = json.dumps(list(value) if isinstance(value, set) else value, cls=DjangoJSONEncoder,
+                           ensure_ascii=False)
+    elif isinstance(value, (UUID, Promise)):
+        value = '{}'.format(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _Echo(object):
+    """Arquivo que apenas devolve o que foi escrito, utilizado pelo csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+class _StreamBuffer(object):
+    """Arquivo sem seek onde o zipfile escreve, o conteúdo é retirado a cada lote"""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_ndjson(columns, batches):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for rows in batches:
+        yield ''.join(encoder.encode(dict(zip(columns, row))) + '\n' for row in rows)
+
+
+def stream_csv(labels, batches):
+    writer = csv.writer(_Echo())
+    # BOM para o Excel reconhecer o UTF-8
+    yield '\ufeff' + writer.writerow([format_cell(label) for label in labels])
+    for rows in batches:
+        yield ''.join(writer.writerow(['' if value is None else format_cell(value) for value in row])
+                      for row in rows)
+
+
+def _column_name(index):
+    name = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        name = chr(65 + remainder) + name
+    return name
+
+
+def _xlsx_cell(reference, value):
+    value = format_cell(value)
+    if value is None or value == '':
+        return ''
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return '<c r="{}"><v>{}</v></c>'.format(reference, value)
+    if isinstance(value, (datetime, date, time)):
+        value = value.isoformat()
+    return '<c r="{}" t="inlineStr"><is><t xml:space="preserve">{}</t></is></c>'.format(
+        reference, escape('{}'.format(value)))
+
+
+def _xlsx_row(number, row):
+    return '<row r="{number}">{cells}</row>'.format(number=number, cells=''.join(
+        _xlsx_cell('{}{}'.format(_column_name(index), number), value) for index, value in enumerate(row)))
+
+
+_XLSX_FILES = (
+    ('[Content_Types].xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+     '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+     '<Default Extension="xml" ContentType="application/xml"/>'
+     '<Override PartName="/xl/workbook.xml" '
+     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+     '<Override PartName="/xl/worksheets/sheet1.xml" '
+     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+     '</Types>'),
+    ('_rels/.rels',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" '
+     'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+     'Target="xl/workbook.xml"/></Relationships>'),
+    ('xl/workbook.xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+     'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+     '<sheets><sheet name="Dados" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+    ('xl/_rels/workbook.xml.rels',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" '
+     'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+     'Target="worksheets/sheet1.xml"/></Relationships>'),
+)
+
+
+def stream_xlsx(labels, batches):
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in _XLSX_FILES:
+            workbook.writestr(name, content)
+        with workbook.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                         '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                         '<sheetData>' + _xlsx_row(1, labels)).encode('utf-8'))
+            number = 1
+            for rows in batches:
+                content = []
+                for row in rows:
+                    number += 1
+                    content.append(_xlsx_row(number, row))
+                sheet.write(''.join(content).encode('utf-8'))
+                yield buffer.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
+
+
+EXPORT_WRITERS = {
+    'ndjson': lambda columns, labels, batches: stream_ndjson(columns, batches),
+    'csv': lambda columns, labels, batches: stream_csv(labels, batches),
+    'xlsx': lambda columns, labels, batches: stream_xlsx(labels, batches),
+}
+
+
+def export_response(export_format, columns, labels, batches, filename):
+    """Monta o StreamingHttpResponse da exportação
+
+    Arguments:
+        export_format {str} -- 'ndjson', 'csv' ou 'xlsx'
+        columns {List} -- Nomes das colunas, utilizados como chaves no NDJSON
+        labels {List} -- Títulos das colunas, utilizados no cabeçalho do CSV e do XLSX
+        batches {Iterable} -- Lotes de linhas, cada linha uma lista de valores na ordem das colunas
+        filename {str} -- Nome do arquivo sem a extensão
+
+    Raises:
+        ValueError -- Caso o formato não seja suportado
+    """
+    if export_format not in EXPORT_WRITERS:
+        raise ValueError('Formato de exportação inválido: {}'.format(export_format))
+    response = StreamingHttpResponse(EXPORT_WRITERS[export_format](list(columns), list(labels), batches),
+                                     content_type=EXPORT_CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = 'attachment; filename="{}.{}"'.format(filename, export_format)
+    return response
@@ -0,0 +1,218 @@
+"""Opções dos filtros (list_filter) das views de listagem.
+
+As opções são obtidas com consultas limitadas (FACET_LIMIT) diretamente na tabela,
+sem reexecutar a pesquisa da listagem, opcionalmente com a quantidade de registros
+por valor. O resultado fica em cache (FACET_CACHE_TTL) com a chave formada pela
+versão do model, que é incrementada nas operações em lote do BaseQuerySet (update,
+bulk_create, bulk_update), nas exclusões e no arquivamento. O save de um único
+registro não invalida as opções, que são atualizadas ao expirar o FACET_CACHE_TTL.
+As opções além do limite são carregadas sob demanda pelo autocomplete da listagem
+(parametro facet), paginado e filtrado pelo termo digitado.
+"""
+import hashlib
+import logging
+
+from django.core.cache import cache
+from django.db.models import BooleanField, Count, DateField, ForeignKey, Q
+
+from .search import split_search_fields
+from .settings import FACET_CACHE_TTL, FACET_LIMIT
+
+logger = logging.getLogger(__name__)
+
+FACET_QUERY_PARAM = 'facet'
+FACET_TERM_PARAM = 'term'
+FACET_PAGE_PARAM = 'page'
+
+FACET_VERSION_KEY = 'core:facets:version:{}'
+WRITE_VERSION_KEY = 'core:writes:version:{}'
+
+# Operadores disponíveis nos filtros de data
+DATE_OPERATORS = (
+    {'choice_id': '__exact', 'choice_label': 'Igual'},
+    {'choice_id': '__not_exact', 'choice_label': 'Diferente'},
+    {'choice_id': '__lt', 'choice_label': 'Menor que'},
+    {'choice_id': '__gt', 'choice_label': 'Maior que'},
+    {'choice_id': '__lte', 'choice_label': 'Menor Igual a'},
+    {'choice_id': '__gte', 'choice_label': 'Maior Igual a'},
+)
+
+
+def get_facet_version(model):
+    key = FACET_VERSION_KEY.format(model._meta.label_lower)
+    version = cache.get(key)
+    if version is None:
+        version = 1
+        cache.add(key, version, None)
+    return version
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, None)
+    except Exception as e:
+        logger.error('Erro: %s; No Metodo: %s' % (e, '_bump()'))
+
+
+def get_write_version(model):
+    """Versão alterada a cada gravação do model, inclusive pelo save, utilizada no ETag (ver conditional)"""
+    key = WRITE_VERSION_KEY.format(model._meta.label_lower)
+    version = cache.get(key)
+    if version is None:
+        version = 1
+        cache.add(key, version, None)
+    return version
+
+
+def bump_write_version(model):
+    _bump(WRITE_VERSION_KEY.format(model._meta.label_lower))
+
+
+def bump_facet_version(model):
+    """Invalida as opções dos filtros que dependem do model"""
+    _bump(FACET_VERSION_KEY.format(model._meta.label_lower))
+    bump_write_version(model)
+
+
+def get_facet_type(field):
+    """Tipo do filtro utilizado pelo template"""
+    if isinstance(field, ForeignKey):
+        return 'ForeignKey'
+    if isinstance(field, BooleanField):
+        return 'BooleanFieldModel'
+    if isinstance(field, DateField):
+        return str(type(field))[:-2].split('.')[-1]
+    if field.choices:
+        return 'ChoiceField'
+    return str(type(field))[:-2].split('.')[-1]
+
+
+def _cache_key(model, field, term, offset, limit, with_counts):
+    versions = [get_facet_version(model)]
+    if field.related_model is not None:
+        versions.append(get_facet_version(field.related_model))
+    raw = '{}:{}:{}:{}:{}:{}:{}'.format(model._meta.label_lower, field.name, versions, term, offset, limit,
+                                        int(with_counts))
+    return 'core:facets:{}'.format(hashlib.md5(raw.encode('utf-8')).hexdigest())
+
+
+def _count_by(model, field, values):
+    """Quantidade de registros por valor, em uma única consulta agrupada"""
+    queryset = model._default_manager.order_by()
+    if values is not None:
+        queryset = queryset.filter(**{'{}__in'.format(field.attname): values})
+    return {row[field.attname]: row['total'] for row in
+            queryset.values(field.attname).annotate(total=Count('pk'))}
+
+
+def _related_options(model, field, term, offset, limit, with_counts):
+    related = field.related_model
+    queryset = related._default_manager.complex_filter(field.get_limit_choices_to())
+    if term:
+        # pesquisa nos campos texto do model relacionado
+        text_fields, others = split_search_fields(related, [item.name for item in related._meta.concrete_fields])
+        condition = Q()
+        for text_field in text_fields:
+            condition |= Q(**{'{}__icontains'.format(text_field.name): term})
+        queryset = queryset.filter(condition) if condition else queryset.none()
+    rows = list(queryset[offset:offset + limit + 1])
+    options = [{'choice_id': str(obj.pk), 'choice_label': str(obj)} for obj in rows[:limit]]
+    if with_counts and options:
+        counts = _count_by(model, field, [obj.pk for obj in rows[:limit]])
+        for obj, option in zip(rows, options):
+            option['count'] = counts.get(obj.pk, 0)
+    return options, len(rows) > limit
+
+
+def _choice_options(model, field, term, offset, limit, with_counts):
+    choices = [choice for choice in field.flatchoices
+               if not term or term.lower() in str(choice[1]).lower()]
+    rows = choices[offset:offset + limit + 1]
+    options = [{'choice_id': value, 'choice_label': str(label)} for value, label in rows[:limit]]
+    if with_counts and options:
+        counts = _count_by(model, field, None)
+        for option in options:
+            option['count'] = counts.get(option['choice_id'], 0)
+    return options, len(rows) > limit
+
+
+def _value_options(model, field, term, offset, limit, with_counts):
+    queryset = model._default_manager.filter(**{'{}__isnull'.format(field.attname): False})
+    if term:
+        queryset = queryset.filter(**{'{}__icontains'.format(field.attname): term})
+    if with_counts:
+        queryset = queryset.values(field.attname).annotate(total=Count('pk')).order_by(field.attname)
+        rows = [(row[field.attname], row['total']) for row in queryset[offset:offset + limit + 1]]
+    else:
+        queryset = queryset.order_by(field.attname).values_list(field.attname, flat=True).distinct()
+        rows = [(value, None) for value in queryset[offset:offset + limit + 1]]
+    options = []
+    for value, total in rows[:limit]:
+        option = {'choice_id': value, 'choice_label': '{}'.format(value)}
+        if with_counts:
+            option['count'] = total
+        options.append(option)
+    return options, len(rows) > limit
+
+
+def get_facet_options(model, field, term='', page=1, limit=None, with_counts=False):
+    """Retorna uma página das opções do filtro
+
+    Arguments:
+        model {Model} -- Model da listagem
+        field {Field} -- Campo do list_filter
+
+    Keyword Arguments:
+        term {str} -- Termo digitado no autocomplete (default: {''})
+        page {int} -- Página das opções (default: {1})
+        limit {int} -- Opções por página, quando None utiliza o FACET_LIMIT (default: {None})
+        with_counts {bool} -- Incluir a quantidade de registros por valor (default: {False})
+
+    Returns:
+        Tuple -- (lista de {'choice_id', 'choice_label'[, 'count']}, True se existem mais opções)
+    """
+    if isinstance(field, BooleanField):
+        return [{'choice_id': 'True', 'choice_label': 'True'}, {'choice_id': 'False', 'choice_label': 'False'}], False
+    if isinstance(field, DateField):
+        return list(DATE_OPERATORS), False
+
+    limit = limit or FACET_LIMIT
+    offset = (max(page, 1) - 1) * limit
+    key = _cache_key(model, field, term, offset, limit, with_counts)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    if isinstance(field, ForeignKey):
+        loader = _related_options
+    elif field.choices:
+        loader = _choice_options
+    else:
+        loader = _value_options
+    result = loader(model, field, term, offset, limit, with_counts)
+    cache.set(key, result, FACET_CACHE_TTL)
+    return result
+
+
+def build_facets(model, list_filter, limit=None, with_counts=False):
+    """Monta os filtros exibidos na listagem, na ordem dos campos do model
+
+    Returns:
+        List -- [{nome do campo: {'label', 'list', 'type_filter', 'has_more'}}]
+    """
+    facets = []
+    for field in model._meta.fields:
+        if field.name not in list_filter:
+            continue
+        # variavel para ficar no label do campo
+        label_name = field.verbose_name or ' '.join(str(field.name).split('_')).title()
+        try:
+            options, has_more = get_facet_options(model, field, limit=limit, with_counts=with_counts)
+        except Exception as e:
+            logger.error('Erro: %s; No Metodo: %s' % (e, 'build_facets()'))
+            options, has_more = [], False
+        facets.append({field.name: {'label': label_name, 'list': options, 'type_filter': get_facet_type(field),
+                                    'has_more': has_more}})
+    return facets
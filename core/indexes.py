@@ -0,0 +1,201 @@
+"""Índices parciais (WHERE deleted = false) dos models que herdam do Base.
+
+Todas as consultas feitas pelo BaseManager filtram deleted=False e ordenam pelo
+Meta.ordering, sem índices cada listagem percorre também os registros excluídos.
+Os índices parciais da ordenação e das colunas de filtro comuns (enabled e created_on)
+devem ser declarados no Meta.indexes do model, assim o makemigrations os gera, ex:
+    class Meta:
+        ordering = ['nome']
+        indexes = partial_indexes('app_produto', ordering=['nome'])
+
+O comando index_advisor utiliza as funções deste módulo para propor índices a partir
+do list_filter, search_fields e ordering das views de listagem.
+"""
+import hashlib
+import logging
+from collections import namedtuple
+
+from django.db import connections
+from django.db.models import Index, Q
+
+from .counting import COUNT_ESTIMATE, count_queryset
+
+logger = logging.getLogger(__name__)
+
+# Colunas do Base utilizadas nos filtros comuns das listagens
+SOFT_DELETE_INDEXED_FIELDS = ('enabled', 'created_on')
+
+IndexProposal = namedtuple('IndexProposal', ['model', 'index', 'source', 'reason'])
+
+
+def get_index_name(model, fields, suffix='sd'):
+    """Nome do índice dentro do limite de 30 caracteres do Django, no padrão tabela_sufixo_hash
+
+    Arguments:
+        model {Model|str} -- Model ou nome da tabela (db_table)
+    """
+    table = model if isinstance(model, str) else model._meta.db_table
+    digest = hashlib.md5('{}:{}:{}'.format(table, ','.join(fields), suffix).encode('utf-8')).hexdigest()[:8]
+    return '{}_{}_{}'.format(table[:14].rstrip('_'), suffix, digest)
+
+
+def build_partial_index(model, fields, suffix='sd'):
+    """Índice das colunas restrito aos registros não excluídos"""
+    return Index(fields=list(fields), name=get_index_name(model, fields, suffix), condition=Q(deleted=False))
+
+
+def _indexable_ordering(ordering, pk_names=('pk', 'id')):
+    # a chave primária já possui índice, ordenar apenas por ela não precisa de outro
+    ordering = tuple(item for item in (ordering or []) if isinstance(item, str) and item != '?')
+    if all(item.lstrip('-') in pk_names for item in ordering):
+        return ()
+    return ordering
+
+
+def get_ordering_fields(model):
+    """Campos do Meta.ordering que podem ser indexados (sem '?', expressões e apenas a chave primária)"""
+    return _indexable_ordering(model._meta.ordering, ('pk', model._meta.pk.name))
+
+
+def partial_indexes(table, ordering=(), fields=SOFT_DELETE_INDEXED_FIELDS):
+    """Índices parciais da ordenação e das colunas de filtro para o Meta.indexes do model
+
+    Arguments:
+        table {str} -- Nome da tabela do model (db_table), utilizado nos nomes dos índices
+
+    Keyword Arguments:
+        ordering {List} -- Campos do Meta.ordering (default: {()})
+        fields {Tuple} -- Colunas de filtro indexadas individualmente (default: {SOFT_DELETE_INDEXED_FIELDS})
+
+    Returns:
+        List -- Lista de Index
+    """
+    ordering = _indexable_ordering(ordering)
+    indexes = []
+    if ordering:
+        indexes.append(build_partial_index(table, ordering, 'ord'))
+    for name in fields:
+        if (name,) != tuple(item.lstrip('-') for item in ordering):
+            indexes.append(build_partial_index(table, (name,), name[:3]))
+    return indexes
+
+
+def soft_delete_indexes(model):
+    """Índices parciais recomendados para o model (ver partial_indexes)
+
+    Returns:
+        List -- Lista de Index
+    """
+    names = {field.name for field in model._meta.concrete_fields}
+    if 'deleted' not in names:
+        return []
+    ordering = get_ordering_fields(model)
+    if not all(item.lstrip('-') in names for item in ordering):
+        ordering = ()
+    return partial_indexes(model._meta.db_table, ordering,
+                           tuple(name for name in SOFT_DELETE_INDEXED_FIELDS if name in names))
+
+
+def get_indexed_columns(model):
+    """Conjunto com as primeiras colunas dos índices existentes, declarados no model ou implícitos"""
+    columns = set()
+    for field in model._meta.concrete_fields:
+        if field.primary_key or field.unique or field.db_index:
+            columns.add((field.name,))
+    for index in model._meta.indexes:
+        columns.add(tuple(item.lstrip('-') for item in index.fields[:1]))
+        columns.add(tuple(item.lstrip('-') for item in index.fields))
+    for unique in model._meta.unique_together:
+        columns.add(tuple(unique[:1]))
+    return columns
+
+
+def propose_indexes(model, list_filter=(), search_fields=(), ordering=None):
+    """Propõe os índices parciais para os filtros, pesquisa e ordenação da listagem
+
+    Returns:
+        List -- Lista de IndexProposal com os índices ainda não existentes
+    """
+    from .search import split_search_fields
+
+    indexed = get_indexed_columns(model)
+    proposals = []
+    names = {field.name for field in model._meta.concrete_fields}
+
+    declared = {index.name for index in model._meta.indexes}
+    for index in soft_delete_indexes(model):
+        if index.name not in declared and tuple(index.fields) not in indexed:
+            proposals.append(IndexProposal(model, index, 'base', 'Índice parcial de {} (partial_indexes)'.format(
+                ', '.join(index.fields))))
+            indexed.add(tuple(item.lstrip('-') for item in index.fields))
+
+    ordering = tuple(item for item in (ordering or get_ordering_fields(model)) if item.lstrip('-') in names)
+    if ordering and tuple(item.lstrip('-') for item in ordering) not in indexed:
+        proposals.append(IndexProposal(model, build_partial_index(model, ordering, 'ord'), 'ordering',
+                                       'Ordenação da listagem sem percorrer os registros excluídos'))
+        indexed.add(tuple(item.lstrip('-') for item in ordering))
+
+    for name in list_filter:
+        if name not in names or (name,) in indexed:
+            continue
+        field = model._meta.get_field(name)
+        if field.is_relation:
+            # ForeignKey já possui índice (db_index=True), exceto quando desativado
+            if field.db_index:
+                continue
+            name = field.attname
+        proposals.append(IndexProposal(model, build_partial_index(model, (name,), 'flt'), 'list_filter',
+                                       'Filtro {} restrito aos registros não excluídos'.format(name)))
+        indexed.add((name,))
+
+    text_fields, others = split_search_fields(model, search_fields)
+    for field in text_fields:
+        if (field.name,) in indexed:
+            continue
+        # o icontains não utiliza índices btree, a indicação é criar o índice do backend de pesquisa
+        proposals.append(IndexProposal(model, None, 'search_fields',
+                                       'Pesquisa em {}: utilize o comando search_index (trigram ou postgres)'.format(
+                                           field.name)))
+    return proposals
+
+
+def get_distinct_values(model, column):
+    """Quantidade de valores distintos da coluna estimada pelas estatísticas do PostgreSQL ou None"""
+    connection = connections[model._default_manager.db]
+    if connection.vendor != 'postgresql':
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT n_distinct, (SELECT reltuples FROM pg_class WHERE relname = %s) '
+                           'FROM pg_stats WHERE tablename = %s AND attname = %s',
+                           [model._meta.db_table, model._meta.db_table, column])
+            row = cursor.fetchone()
+        if row is None or row[0] is None:
+            return None
+        n_distinct, reltuples = row
+        # valores negativos indicam a fração de linhas distintas
+        return max(int(-n_distinct * reltuples) if n_distinct < 0 else int(n_distinct), 1)
+    except Exception as error:
+        logger.error('Erro: %s; No Metodo: %s' % (error, 'get_distinct_values()'))
+        return None
+
+
+def estimate_benefit(proposal):
+    """Estimativa da quantidade de linhas lidas sem e com o índice proposto
+
+    Returns:
+        Dict -- {'rows', 'live_rows', 'rows_with_index'}, rows_with_index é None quando não for possível estimar
+    """
+    manager = proposal.model._base_manager
+    rows = count_queryset(manager.all(), COUNT_ESTIMATE)
+    live_rows = count_queryset(manager.filter(deleted=False), COUNT_ESTIMATE)
+    rows_with_index = None
+    if proposal.index is not None:
+        if proposal.source == 'ordering':
+            rows_with_index = int(live_rows)
+        else:
+            column = proposal.model._meta.get_field(proposal.index.fields[0].lstrip('-')).column
+            distinct = get_distinct_values(proposal.model, column)
+            if distinct:
+                rows_with_index = int(live_rows) // distinct
+    return {'rows': int(rows), 'live_rows': int(live_rows), 'rows_with_index': rows_with_index}
@@ -0,0 +1,162 @@
+"""Classificação dos campos dos models utilizada pelo Base.get_all_related_fields.
+
+A classificação (escalar, booleano, arquivo, imagem, ManyToMany, relacionamento reverso,
+genérico e um para um) é feita uma única vez por classe de model e fica congelada
+em uma tupla de FieldDescriptor. A cada chamada são apenas lidos os valores do
+registro, os relacionamentos são retornados como querysets ainda não avaliadas.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import (AutoField, BooleanField, F, FileField, Func, ImageField, IntegerField, ManyToManyField,
+                              ManyToManyRel, ManyToOneRel, OneToOneRel, Subquery)
+
+# Tipos de campo
+FIELD_SCALAR = 'scalar'
+FIELD_BOOLEAN = 'boolean'
+FIELD_FILE = 'file'
+FIELD_IMAGE = 'image'
+FIELD_M2M = 'm2m'
+FIELD_REVERSE = 'reverse'
+FIELD_GENERIC = 'generic'
+FIELD_ONE_TO_ONE = 'one_to_one'
+
+# Tipos que são retornados na lista de relacionamentos (many_fields)
+MANY_KINDS = (FIELD_M2M, FIELD_REVERSE, FIELD_GENERIC)
+
+# Campos ocultos quando o model define o atributo exclude, ver Base.get_exclude_hidden_fields
+HIDDEN_FIELDS = ('enabled', 'deleted')
+
+FIELD_TAGS = {
+    FIELD_IMAGE: '<img width="100px" src="{url}" alt="{nome}" />',
+    FIELD_FILE: '<a  href="{url}" > <i class="fas fa-file"></i> {nome}</a>',
+}
+
+
+class FieldDescriptor(namedtuple('FieldDescriptor', ['kind', 'name', 'label', 'accessor', 'related_model'])):
+    """Campo classificado
+
+    kind -- Tipo do campo (FIELD_*)
+    name -- Nome do campo no _meta
+    label -- Texto exibido nos templates
+    accessor -- Atributo do registro que retorna o valor
+    related_model -- Model relacionado, nos relacionamentos
+    """
+
+    def get_queryset(self, instance):
+        """Queryset (não avaliada) dos registros relacionados"""
+        return getattr(instance, self.accessor).all()
+
+    def get_value(self, instance):
+        if self.kind in MANY_KINDS:
+            return self.get_queryset(instance)
+        if self.kind == FIELD_BOOLEAN:
+            return "Sim" if getattr(instance, self.accessor) else "Nâo"
+        if self.kind in (FIELD_FILE, FIELD_IMAGE):
+            value = getattr(instance, self.accessor)
+            if not value.name:
+                return ''
+            return FIELD_TAGS[self.kind].format(url=value.url, nome=value.name.split('.')[0])
+        return getattr(instance, self.accessor)
+
+
+def _verbose_name(field):
+    return (field.verbose_name if hasattr(field, 'verbose_name') else None) or field.name
+
+
+def _classify(field):
+    """Retorna o FieldDescriptor do campo ou None quando o campo não é exibido"""
+    # Desconsiderando o campo do tipo AutoField e os campos com auto_now_add (datas)
+    if isinstance(field, AutoField) or hasattr(field, "auto_now_add") or hasattr(field, "now_add"):
+        return None
+    if type(field) is ManyToManyField:
+        return FieldDescriptor(FIELD_M2M, field.name, _verbose_name(field), field.name, field.related_model)
+    if type(field) is ManyToOneRel or type(field) is ManyToManyRel:
+        return FieldDescriptor(FIELD_REVERSE, field.name, field.related_model._meta.verbose_name_plural or field.name,
+                               field.get_accessor_name(), field.related_model)
+    if isinstance(field, GenericRelation):
+        return FieldDescriptor(FIELD_GENERIC, field.name, _verbose_name(field), field.name, field.related_model)
+    if isinstance(field, GenericForeignKey):
+        return FieldDescriptor(FIELD_SCALAR, field.name, field.name, field.name, None)
+    if type(field) is OneToOneRel:
+        return FieldDescriptor(FIELD_ONE_TO_ONE, field.name, field.related_model._meta.verbose_name or field.name,
+                               field.get_accessor_name(), field.related_model)
+    if type(field) is BooleanField:
+        return FieldDescriptor(FIELD_BOOLEAN, field.name, _verbose_name(field), field.name, None)
+    if type(field) is ImageField:
+        return FieldDescriptor(FIELD_IMAGE, field.name, _verbose_name(field), field.name, None)
+    if type(field) is FileField:
+        return FieldDescriptor(FIELD_FILE, field.name, _verbose_name(field), field.name, None)
+    return FieldDescriptor(FIELD_SCALAR, field.name, _verbose_name(field), field.name, field.related_model)
+
+
+@lru_cache(maxsize=None)
+def get_field_descriptors(model):
+    """Campos exibidos do model, classificados uma única vez por classe
+
+    Returns:
+        Tuple -- Tupla de FieldDescriptor na ordem do _meta.get_fields
+    """
+    exclude = getattr(model, 'exclude', None)
+    hidden = set(HIDDEN_FIELDS) | set(exclude or ()) if exclude is not None else set()
+    descriptors = []
+    for field in model._meta.get_fields(include_parents=True):
+        if field.name in hidden:
+            continue
+        descriptor = _classify(field)
+        if descriptor is not None:
+            descriptors.append(descriptor)
+    return tuple(descriptors)
+
+
+def get_relation_descriptors(model):
+    """Apenas os relacionamentos exibidos na lista many_fields"""
+    return tuple(descriptor for descriptor in get_field_descriptors(model) if descriptor.kind in MANY_KINDS)
+
+
+def read_fields(instance):
+    """Lê os valores do registro a partir da classificação do model
+
+    Returns:
+        Tuple -- (lista de (label, valor) dos campos, lista de (label, queryset) dos relacionamentos)
+    """
+    object_list = []
+    many_fields = []
+    for descriptor in get_field_descriptors(type(instance)):
+        try:
+            value = descriptor.get_value(instance)
+        except ObjectDoesNotExist:
+            # OneToOne reverso sem registro relacionado
+            continue
+        if descriptor.kind in MANY_KINDS:
+            many_fields.append((descriptor.label, value))
+        else:
+            object_list.append((descriptor.label, value))
+    return object_list, many_fields
+
+
+def count_relations(instance, descriptors=None):
+    """Quantidade de registros de cada relacionamento em uma única consulta, com uma
+    subconsulta COUNT por relacionamento (sem JOIN entre eles, evitando o produto cartesiano)
+
+    Keyword Arguments:
+        descriptors {Tuple} -- Relacionamentos contados, quando None todos os do many_fields (default: {None})
+
+    Returns:
+        Dict -- {nome do relacionamento: quantidade}
+    """
+    model = type(instance)
+    descriptors = get_relation_descriptors(model) if descriptors is None else descriptors
+    if not descriptors:
+        return {}
+    subqueries = {}
+    for index, descriptor in enumerate(descriptors):
+        # COUNT como Func não é agregação, assim a subconsulta não recebe GROUP BY
+        queryset = descriptor.get_queryset(instance).order_by().annotate(
+            _count=Func(F('pk'), function='COUNT', output_field=IntegerField())).values('_count')
+        # alias próprio, o nome do relacionamento conflita com os campos do model
+        subqueries['_related_{}'.format(index)] = Subquery(queryset, output_field=IntegerField())
+    row = model._base_manager.using(instance._state.db).filter(pk=instance.pk).values(**subqueries).get()
+    return {descriptor.name: row['_related_{}'.format(index)] or 0 for index, descriptor in enumerate(descriptors)}
@@ -0,0 +1,203 @@
+"""Funções auxiliares utilizadas pelo BaseListView para montar as linhas
+exibidas na listagem sem executar consultas por célula.
+"""
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime
+
+import pytz
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import DateField, DateTimeField
+
+
+def has_fk_attr(classe=None, attr=None):
+    try:
+        classe.objects.values(attr)
+    except Exception as e:
+        return False
+    return True
+
+
+def materialize_lookups(model, objects, lookups):
+    """Resolve em uma única consulta todos os campos com '__' do list_display
+    para os objetos da página atual
+
+    Arguments:
+        model {Model} -- Model da listagem
+        objects {Iterable} -- Objetos da página que será renderizada
+        lookups {Iterable} -- Campos no formato 'relacionamento__campo'
+
+    Returns:
+        Dict -- {pk: {lookup: 'valor formatado'}} com os valores de cada objeto,
+                quando o relacionamento retorna mais de um valor eles são unidos por ', '
+    """
+    lookups = tuple(lookups)
+    pks = [obj.pk for obj in objects]
+    if not lookups or not pks:
+        return {}
+
+    # Agrupando os valores por pk e por lookup, mantendo a ordem de chegada
+    # e descartando os valores repetidos gerados pelos JOINs
+    grouped = {}
+    for row in model._default_manager.filter(pk__in=pks).values('pk', *lookups):
+        row_values = grouped.setdefault(row['pk'], OrderedDict((lookup, OrderedDict()) for lookup in lookups))
+        for lookup in lookups:
+            if row[lookup] is not None:
+                row_values[lookup]["{}".format(row[lookup])] = None
+
+    return {pk: {lookup: ', '.join(values) for lookup, values in row_values.items()}
+            for pk, row_values in grouped.items()}
+
+
+# Cache das colunas compiladas por classe de view e list_display.
+# Como a chave é a própria classe, ao recarregar o código uma nova entrada é criada.
+_compiled_list_displays = {}
+
+CompiledListDisplay = namedtuple('CompiledListDisplay', ['columns', 'lookups'])
+
+
+def _format_choice(display):
+    def formatter(obj, value):
+        return "{}".format(getattr(obj, display)())
+
+    return formatter
+
+
+def _format_datetime():
+    # O timezone e o formato são resolvidos uma única vez na compilação
+    tz = pytz.timezone(settings.TIME_ZONE)
+    date_format = settings.DATETIME_INPUT_FORMATS[0] or "%d/%m/%Y %H:%M"
+
+    def formatter(obj, value):
+        return "{}".format(tz.normalize(value).strftime(date_format))
+
+    return formatter
+
+
+def _format_date():
+    date_format = settings.DATE_INPUT_FORMATS[0] or "%d/%m/%Y"
+
+    def formatter(obj, value):
+        return "{}".format(value.strftime(date_format))
+
+    return formatter
+
+
+def _format_many(obj, value):
+    # pega uma string feita com o str de cada objeto da lista
+    return ', '.join('{}'.format(sub_obj) for sub_obj in value.all())
+
+
+def _format_str(obj, value):
+    return "{}".format(value)
+
+
+def _format_dynamic():
+    """Formatador para atributos que não são campos do model (properties, métodos, relacionamentos reversos),
+    nesse caso o tipo só é conhecido em tempo de execução"""
+    format_datetime = _format_datetime()
+    format_date = _format_date()
+
+    def formatter(obj, value):
+        if type(value) == datetime:
+            return format_datetime(obj, value)
+        if type(value) == date:
+            return format_date(obj, value)
+        if hasattr(value, 'all'):
+            return _format_many(obj, value)
+        return _format_str(obj, value)
+
+    return formatter
+
+
+def _attribute_column(name, formatter):
+    def render(view, obj, lookups):
+        value = getattr(obj, name)
+        # no caso de campos None ele coloca para aparecer vazio
+        if value is None:
+            return ""
+        return formatter(obj, value)
+
+    return render
+
+
+def _lookup_column(name):
+    def render(view, obj, lookups):
+        return lookups.get(name, "")
+
+    return render
+
+
+def _str_column(view, obj, lookups):
+    return "{}".format(obj)
+
+
+def _view_method_column(name):
+    def render(view, obj, lookups):
+        return getattr(view, name)(obj)
+
+    return render
+
+
+def _compile_column(view_class, model, name):
+    """Escolhe a função de renderização da coluna conforme o tipo do campo
+
+    Returns:
+        Tuple -- (função de renderização, True se a coluna é um lookup com '__') ou None
+    """
+    if '__' in name and name != '__str__' and has_fk_attr(model, name):
+        return _lookup_column(name), True
+    if name != '__str__' and hasattr(model, name):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            field = None
+        display = 'get_{nome}_display'.format(nome=name)
+        if hasattr(model, display):
+            formatter = _format_choice(display)
+        elif field is None or not field.concrete:
+            formatter = _format_dynamic()
+        elif isinstance(field, DateTimeField):
+            formatter = _format_datetime()
+        elif isinstance(field, DateField):
+            formatter = _format_date()
+        elif field.many_to_many:
+            formatter = _format_many
+        else:
+            formatter = _format_str
+        return _attribute_column(name, formatter), False
+    if name == '__str__':
+        return _str_column, False
+    if getattr(view_class, name, None):
+        # função feita na view e usada no display
+        return _view_method_column(name), False
+    return None
+
+
+def compile_list_display(view_class, model, list_display):
+    """Compila o list_display da view em uma tupla de colunas (nome, função de renderização)
+
+    Arguments:
+        view_class {Class} -- Classe da view de listagem
+        model {Model} -- Model da listagem
+        list_display {Iterable} -- Campos já validados pelo get_list_display
+
+    Returns:
+        CompiledListDisplay -- Colunas e os lookups que devem ser materializados pelo materialize_lookups
+    """
+    key = (view_class, model, tuple(list_display))
+    compiled = _compiled_list_displays.get(key)
+    if compiled is None:
+        columns = []
+        lookups = []
+        for name in list_display:
+            column = _compile_column(view_class, model, name)
+            if column is None:
+                continue
+            render, is_lookup = column
+            columns.append((name, render))
+            if is_lookup:
+                lookups.append(name)
+        compiled = CompiledListDisplay(tuple(columns), tuple(lookups))
+        _compiled_list_displays[key] = compiled
+    return compiled
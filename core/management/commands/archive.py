@@ -0,0 +1,120 @@
+"""Manager responsible for moving the soft-deleted rows to the archive tables
+or removing them permanently, in bounded and resumable batches
+"""
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from nuvols.core.archive import archive_deleted, get_archivable
+from nuvols.core.management.commands.utils import Utils
+from nuvols.core.soft_delete import is_soft_deletable
+
+
+class Command(BaseCommand):
+    help = "Manager responsible for moving the soft-deleted rows older than the configured age to the archive " \
+           "tables or removing them permanently"
+
+    def add_arguments(self, parser):
+        parser.add_argument('App', type=str)
+        parser.add_argument('Model', type=str, nargs='?')
+
+        parser.add_argument(
+            '--days',
+            dest='days',
+            type=int,
+            default=None,
+            help='Idade mínima em dias dos registros excluídos (padrão: ARCHIVE_AFTER_DAYS)'
+        )
+        parser.add_argument(
+            '--purge',
+            action='store_true',
+            dest='purge',
+            help='Remover definitivamente sem arquivar'
+        )
+        parser.add_argument(
+            '--batch',
+            dest='batch',
+            type=int,
+            default=None,
+            help='Registros por lote (padrão: ARCHIVE_BATCH_SIZE)'
+        )
+        parser.add_argument(
+            '--sleep',
+            dest='sleep',
+            type=float,
+            default=None,
+            help='Pausa em segundos entre os lotes (padrão: ARCHIVE_SLEEP)'
+        )
+        parser.add_argument(
+            '--max-batches',
+            dest='max_batches',
+            type=int,
+            default=None,
+            help='Quantidade máxima de lotes por model nesta execução'
+        )
+        parser.add_argument(
+            '--time-limit',
+            dest='time_limit',
+            type=float,
+            default=None,
+            help='Tempo máximo em segundos por model nesta execução'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            dest='dry_run',
+            help='Apenas informar a quantidade de registros que seriam processados'
+        )
+        parser.add_argument(
+            '--database',
+            dest='database',
+            default='default',
+            help='Banco de dados utilizado'
+        )
+
+    def handle(self, *args, **options):
+        app = options['App'].strip().lower()
+        try:
+            app_config = apps.get_app_config(app)
+        except LookupError:
+            Utils.show_message("Você deve colocar sua app no INSTALLED_APPS do settings.")
+            return
+        if options['Model']:
+            try:
+                models = [app_config.get_model(options['Model'].strip())]
+            except LookupError as error:
+                Utils.show_message(f"Model informado não encontrado: {error}")
+                return
+        else:
+            models = [model for model in app_config.get_models() if is_soft_deletable(model)]
+
+        action = 'Removendo' if options['purge'] else 'Arquivando'
+        for model in models:
+            if not is_soft_deletable(model):
+                Utils.show_message(f"O model {model.__name__} não possui exclusão lógica.")
+                continue
+            if options['dry_run']:
+                total = get_archivable(model, options['days'], options['database']).count()
+                Utils.show_message(f"{model.__name__}: {total} registros excluídos seriam processados.")
+                continue
+
+            Utils.show_message(f"{action} os registros excluídos do model {model.__name__}")
+            try:
+                result = archive_deleted(
+                    model, days=options['days'], purge=options['purge'], batch_size=options['batch'],
+                    sleep=options['sleep'], max_batches=options['max_batches'], time_limit=options['time_limit'],
+                    using=options['database'],
+                    progress=lambda batch, counts: Utils.show_message(
+                        f"  lote {batch}: {', '.join(f'{label}={total}' for label, total in counts.items())}"))
+            except Exception as error:
+                Utils.show_message(f"Error in archive ({model.__name__}): {error}")
+                continue
+            if result.skipped:
+                Utils.show_message(f"{model.__name__}: {result.skipped} registro(s) ignorado(s), a remoção alcançaria "
+                                   f"registros ativos.")
+            if result.finished:
+                Utils.show_message(f"{model.__name__}: concluído em {result.batches} lote(s).")
+            else:
+                Utils.show_message(f"{model.__name__}: interrompido após {result.batches} lote(s), execute novamente "
+                                   f"para continuar.")
+        Utils.show_message("Processo concluído.")
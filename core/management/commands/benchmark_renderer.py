@@ -0,0 +1,92 @@
+"""Manager responsible for comparing the default JSON renderer/parser of the Django Rest Framework
+with the FastJSONRenderer/FastJSONParser on a PaginacaoCustomizada page of the model
+"""
+
+import io
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.serializers import ModelSerializer
+from rest_framework.test import APIRequestFactory
+
+from nuvols.core.management.commands.utils import Utils
+from nuvols.core.models import PaginacaoCustomizada
+from nuvols.core.renderers import FastJSONParser, FastJSONRenderer, is_fast_json_available
+
+
+class Command(BaseCommand):
+    help = "Manager responsible for comparing the default JSON renderer and parser of the Django Rest Framework " \
+           "with the FastJSONRenderer and FastJSONParser on a paginated response of the model"
+
+    def add_arguments(self, parser):
+        parser.add_argument('App', type=str)
+        parser.add_argument('Model', type=str)
+
+        parser.add_argument(
+            '--page-size',
+            dest='page_size',
+            type=int,
+            default=1000,
+            help='Quantidade de registros da página (page_size da PaginacaoCustomizada)'
+        )
+        parser.add_argument(
+            '--repeat',
+            dest='repeat',
+            type=int,
+            default=100,
+            help='Quantidade de vezes que a página é renderizada e lida'
+        )
+
+    @staticmethod
+    def __page(model, page_size):
+        """Method to build the response data of the first page of the model
+
+        Returns:
+            Dict -- Data returned by the PaginacaoCustomizada.get_paginated_response
+        """
+        meta = type('Meta', (), {'model': model, 'fields': '__all__'})
+        serializer_class = type('{}BenchmarkSerializer'.format(model.__name__), (ModelSerializer,), {'Meta': meta})
+        request = Request(APIRequestFactory().get('/', {'page_size': page_size}))
+        paginator = PaginacaoCustomizada()
+        page = paginator.paginate_queryset(model._default_manager.order_by('pk'), request)
+        data = serializer_class(page, many=True, context={'request': request}).data
+        return paginator.get_paginated_response(data).data
+
+    @staticmethod
+    def __time(function, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            function()
+        return time.perf_counter() - started
+
+    def handle(self, *args, **options):
+        try:
+            model = apps.get_model(options['App'].strip(), options['Model'].strip())
+        except LookupError as error:
+            Utils.show_message(f"Model informado não encontrado: {error}")
+            return
+        if not is_fast_json_available():
+            Utils.show_message("O orjson não está instalado, o FastJSONRenderer utilizará o json padrão.")
+
+        data = self.__page(model, max(options['page_size'], 1))
+        repeat = max(options['repeat'], 1)
+        content = JSONRenderer().render(data)
+        Utils.show_message(f"Página com {len(data['results'])} registros ({len(content) / 1024:.1f} KB), "
+                           f"{repeat} repetições")
+
+        results = {}
+        for name, renderer, parser in (('JSONRenderer', JSONRenderer(), JSONParser()),
+                                       ('FastJSONRenderer', FastJSONRenderer(), FastJSONParser())):
+            render = self.__time(lambda: renderer.render(data), repeat)
+            parse = self.__time(lambda: parser.parse(io.BytesIO(content)), repeat)
+            results[name] = (render, parse)
+            Utils.show_message(f"{name}: render {repeat / render:.0f} páginas/s, parse {repeat / parse:.0f} páginas/s")
+
+        (render, parse), (fast_render, fast_parse) = results['JSONRenderer'], results['FastJSONRenderer']
+        Utils.show_message(f"FastJSONRenderer x JSONRenderer: render {render / fast_render:.2f}x, "
+                           f"parse {parse / fast_parse:.2f}x")
+        Utils.show_message("Processo concluído.")
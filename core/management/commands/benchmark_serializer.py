@@ -0,0 +1,92 @@
+"""Manager responsible for comparing the validation throughput of the Serializador
+and the stock ModelSerializer of the Django Rest Framework on a list payload
+"""
+
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from rest_framework.serializers import ModelSerializer
+
+from nuvols.core.management.commands.utils import Utils
+from nuvols.core.rest_framework import Serializador
+
+
+class Command(BaseCommand):
+    help = "Manager responsible for comparing the validation throughput of the Serializador and the stock " \
+           "ModelSerializer (many=True) on a payload built from the existing records of the model"
+
+    def add_arguments(self, parser):
+        parser.add_argument('App', type=str)
+        parser.add_argument('Model', type=str)
+
+        parser.add_argument(
+            '--items',
+            dest='items',
+            type=int,
+            default=10000,
+            help='Quantidade de itens do payload'
+        )
+        parser.add_argument(
+            '--rounds',
+            dest='rounds',
+            type=int,
+            default=3,
+            help='Quantidade de execuções de cada serializer, é considerada a mais rápida'
+        )
+
+    @staticmethod
+    def __serializer_class(base, model):
+        meta = type('Meta', (), {'model': model, 'fields': '__all__'})
+        return type('{}{}'.format(model.__name__, base.__name__), (base,), {'Meta': meta})
+
+    def __payload(self, model, items):
+        """Method to build the payload repeating the serialized records of the model
+
+        Returns:
+            List -- List of dicts or None when the model has no records
+        """
+        serializer_class = self.__serializer_class(ModelSerializer, model)
+        records = serializer_class(model._default_manager.all()[:min(items, 1000)], many=True).data
+        if not records:
+            return None
+        return [dict(records[index % len(records)]) for index in range(items)]
+
+    @staticmethod
+    def __run(serializer_class, payload, rounds):
+        best = None
+        valid = 0
+        for _ in range(max(rounds, 1)):
+            serializer = serializer_class(data=payload, many=True)
+            started = time.perf_counter()
+            serializer.is_valid()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+            valid = sum(1 for errors in serializer.errors if not errors) if serializer.errors else len(payload)
+        return best, valid
+
+    def handle(self, *args, **options):
+        try:
+            model = apps.get_model(options['App'].strip(), options['Model'].strip())
+        except LookupError as error:
+            Utils.show_message(f"Model informado não encontrado: {error}")
+            return
+        payload = self.__payload(model, max(options['items'], 1))
+        if payload is None:
+            Utils.show_message(f"O model {model.__name__} não possui registros para montar o payload.")
+            return
+
+        Utils.show_message(f"Validando {len(payload)} itens do model {model.__name__}")
+        results = []
+        for base in (ModelSerializer, Serializador):
+            try:
+                elapsed, valid = self.__run(self.__serializer_class(base, model), payload, options['rounds'])
+                results.append(elapsed)
+                Utils.show_message(f"{base.__name__}: {elapsed:.2f}s, {len(payload) / elapsed:.0f} itens/s, "
+                                   f"{valid} itens válidos")
+            except Exception as error:
+                Utils.show_message(f"Error in benchmark_serializer ({base.__name__}): {error}")
+
+        if len(results) == 2:
+            Utils.show_message(f"Serializador x ModelSerializer: {results[0] / results[1]:.2f}x itens/s")
+        Utils.show_message("Processo concluído.")
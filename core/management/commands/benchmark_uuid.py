@@ -0,0 +1,114 @@
+"""Manager responsible for comparing the insert throughput and the primary key index size
+of random (uuid4) and time-ordered (uuid7) keys on a synthetic table
+"""
+
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from nuvols.core.management.commands.utils import Utils
+from nuvols.core.uuids import uuid7
+
+
+class Command(BaseCommand):
+    help = "Manager responsible for comparing the insert throughput and the primary key index size of uuid4 " \
+           "and uuid7 keys on a synthetic table"
+
+    GENERATORS = (('uuid4', uuid.uuid4), ('uuid7', uuid7))
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            dest='rows',
+            type=int,
+            default=1000000,
+            help='Quantidade de registros inseridos em cada tabela'
+        )
+        parser.add_argument(
+            '--batch',
+            dest='batch',
+            type=int,
+            default=5000,
+            help='Quantidade de registros por transação'
+        )
+        parser.add_argument(
+            '--database',
+            dest='database',
+            default='default',
+            help='Banco de dados utilizado no benchmark'
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            dest='keep',
+            help='Manter as tabelas sintéticas ao final'
+        )
+
+    @staticmethod
+    def __index_size(connection, table):
+        """Method to retrieve the size in bytes of the primary key index
+
+        Returns:
+            int -- Size in bytes or None when the database does not provide it
+        """
+        try:
+            with connection.cursor() as cursor:
+                if connection.vendor == 'postgresql':
+                    cursor.execute("SELECT pg_relation_size(%s)", ['{}_pkey'.format(table)])
+                elif connection.vendor == 'sqlite':
+                    cursor.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = %s",
+                                   ['sqlite_autoindex_{}_1'.format(table)])
+                else:
+                    return None
+                return cursor.fetchone()[0]
+        except Exception:
+            return None
+
+    def __run(self, connection, table, generator, rows, batch):
+        qn = connection.ops.quote_name
+        column_type = 'uuid' if connection.vendor == 'postgresql' else 'char(32)'
+        as_value = str if connection.vendor == 'postgresql' else (lambda value: value.hex)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {qn(table)}")
+            cursor.execute(f"CREATE TABLE {qn(table)} (id {column_type} PRIMARY KEY, deleted boolean NOT NULL, "
+                           f"payload varchar(64) NOT NULL)")
+        sql = f"INSERT INTO {qn(table)} (id, deleted, payload) VALUES (%s, %s, %s)"
+        started = time.perf_counter()
+        for start in range(0, rows, batch):
+            values = [(as_value(generator()), False, 'registro {}'.format(start + index))
+                      for index in range(min(batch, rows - start))]
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.executemany(sql, values)
+        elapsed = time.perf_counter() - started
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {qn(table)}")
+        return elapsed, self.__index_size(connection, table)
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        rows, batch = options['rows'], max(options['batch'], 1)
+        Utils.show_message(f"Inserindo {rows} registros por tabela em lotes de {batch} ({connection.vendor})")
+        results = []
+        for name, generator in self.GENERATORS:
+            table = 'core_benchmark_{}'.format(name)
+            try:
+                elapsed, size = self.__run(connection, table, generator, rows, batch)
+                results.append((name, elapsed, size))
+                Utils.show_message(f"{name}: {elapsed:.2f}s, {rows / elapsed:.0f} inserções/s, índice da chave: "
+                                   f"{'{:.1f} MB'.format(size / 1048576) if size else 'n/d'}")
+            except Exception as error:
+                Utils.show_message(f"Error in benchmark_uuid ({name}): {error}")
+            finally:
+                if not options['keep']:
+                    with connection.cursor() as cursor:
+                        cursor.execute(f"DROP TABLE IF EXISTS {connection.ops.quote_name(table)}")
+
+        if len(results) == 2:
+            (_, time4, size4), (_, time7, size7) = results
+            Utils.show_message(f"uuid7 x uuid4: {time4 / time7:.2f}x inserções/s")
+            if size4 and size7:
+                Utils.show_message(f"uuid7 x uuid4: índice {size7 / size4:.0%} do tamanho")
+        Utils.show_message("Processo concluído.")
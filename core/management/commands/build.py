@@ -7,6 +7,7 @@ import os
 from pathlib import Path
 from nuvols.core.management.commands.utils import Utils
 from django.apps import apps
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from django.urls import resolve, reverse
 from bs4 import BeautifulSoup
@@ -120,6 +121,12 @@ class Command(BaseCommand):
             dest='format',
             help='Aplicar PEP8 nos arquivos'
         )
+        parser.add_argument(
+            '--indexes',
+            action='store_true',
+            dest='indexes',
+            help='Propor os índices parciais a partir do list_filter, search_fields e ordering da listagem'
+        )
 
     def __get_verbose_name(self, app_name=None, model_name=None):
         """
@@ -960,6 +967,9 @@ class Command(BaseCommand):
         elif options['format']:
             self.__apply_pep()
             return
+        elif options['indexes']:
+            call_command('index_advisor', self.app_lower, self.model)
+            return
         else:
             self.__manage_form()
             self.__manage_views()
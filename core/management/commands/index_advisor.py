@@ -0,0 +1,119 @@
+"""Manager responsible for inspecting the list_filter, search_fields and ordering of the
+list views and proposing (or creating) the partial indexes of the models
+"""
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.urls import resolve, reverse
+
+from nuvols.core.indexes import estimate_benefit, get_ordering_fields, propose_indexes
+from nuvols.core.management.commands.utils import Utils
+
+
+class Command(BaseCommand):
+    help = "Manager responsible for inspecting the list views and proposing or creating the partial indexes " \
+           "of the models with a report of the estimated benefit"
+
+    def add_arguments(self, parser):
+        parser.add_argument('App', type=str)
+        parser.add_argument('Model', type=str, nargs='?')
+
+        parser.add_argument(
+            '--sql',
+            action='store_true',
+            dest='sql',
+            help='Exibir o SQL dos índices propostos'
+        )
+        parser.add_argument(
+            '--create',
+            action='store_true',
+            dest='create',
+            help='Criar os índices propostos no banco de dados'
+        )
+        parser.add_argument(
+            '--database',
+            dest='database',
+            default='default',
+            help='Banco de dados analisado'
+        )
+
+    @staticmethod
+    def __get_list_view(model):
+        """Method to retrieve the list view class of the model
+
+        Returns:
+            Class -- List view class or None
+        """
+        try:
+            list_view = '{}:{}-list'.format(model._meta.app_label.lower(), model._meta.model_name.lower())
+            return resolve(reverse(list_view)).func.view_class
+        except Exception:
+            return None
+
+    @staticmethod
+    def __format_benefit(benefit):
+        if benefit['rows_with_index'] is None:
+            return "{} linhas ({} não excluídas)".format(benefit['rows'], benefit['live_rows'])
+        return "{} linhas lidas sem o índice, ~{} com o índice".format(benefit['rows'], benefit['rows_with_index'])
+
+    def handle(self, *args, **options):
+        app = options['App'].strip().lower()
+        try:
+            app_config = apps.get_app_config(app)
+        except LookupError:
+            Utils.show_message("Você deve colocar sua app no INSTALLED_APPS do settings.")
+            return
+        if options['Model']:
+            try:
+                models = [app_config.get_model(options['Model'].strip())]
+            except LookupError as error:
+                Utils.show_message(f"Model informado não encontrado: {error}")
+                return
+        else:
+            models = list(app_config.get_models())
+
+        connection = connections[options['database']]
+        for model in models:
+            view_class = self.__get_list_view(model)
+            if view_class is None:
+                Utils.show_message(f"View de listagem não encontrada para o model {model.__name__}, "
+                                   f"analisando apenas o Meta.ordering.")
+            proposals = propose_indexes(
+                model,
+                list_filter=getattr(view_class, 'list_filter', None) or (),
+                search_fields=getattr(view_class, 'search_fields', None) or (),
+                ordering=getattr(view_class, 'keyset_ordering', None))
+            if not proposals:
+                Utils.show_message(f"O model {model.__name__} não precisa de novos índices.")
+                continue
+
+            Utils.show_message(f"Índices propostos para o model {model.__name__}:")
+            if any(proposal.source == 'base' for proposal in proposals):
+                ordering = list(get_ordering_fields(model))
+                Utils.show_message("  Declare no Meta do model (from nuvols.core.indexes import partial_indexes):")
+                Utils.show_message(f"    indexes = partial_indexes('{model._meta.db_table}', ordering={ordering!r})")
+            for proposal in proposals:
+                if proposal.index is None:
+                    Utils.show_message(f"  [{proposal.source}] {proposal.reason}")
+                    continue
+                try:
+                    benefit = self.__format_benefit(estimate_benefit(proposal))
+                except Exception as error:
+                    benefit = f"não foi possível estimar ({error})"
+                Utils.show_message(f"  [{proposal.source}] {proposal.reason}: {benefit}")
+                Utils.show_message(f"    models.Index(fields={proposal.index.fields!r}, name='{proposal.index.name}', "
+                                   f"condition=models.Q(deleted=False)),")
+                if options['sql']:
+                    with connection.schema_editor(collect_sql=True) as schema_editor:
+                        Utils.show_message(f"    {proposal.index.create_sql(model, schema_editor)};")
+                if options['create']:
+                    try:
+                        with connection.schema_editor() as schema_editor:
+                            schema_editor.add_index(model, proposal.index)
+                        Utils.show_message(f"    Índice {proposal.index.name} criado.")
+                    except Exception as error:
+                        Utils.show_message(f"    Error in index_advisor ({proposal.index.name}): {error}")
+        if options['create']:
+            Utils.show_message("Adicione os índices criados no Meta.indexes dos models para mantê-los nas migrations.")
+        Utils.show_message("Processo concluído.")
@@ -0,0 +1,210 @@
+"""Manager responsible for building and refreshing the search indexes used by the
+search backends (postgres, trigram and sqlite) from the search_fields of the list views.
+The schema changes are written as a migration (RunSQL with the reverse SQL) of the app,
+applied by migrate like any other schema change
+"""
+import importlib
+import os
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connections, migrations
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+from django.urls import resolve, reverse
+
+from nuvols.core.management.commands.utils import Utils
+from nuvols.core.search import PostgresSearchBackend, SQLiteSearchBackend, regconfig_literal, split_search_fields
+from nuvols.core.settings import SEARCH_BACKEND
+
+
+class Command(BaseCommand):
+    help = "Manager responsible for writing the migrations that build and refresh the search indexes from the " \
+           "search_fields of the list views"
+
+    def add_arguments(self, parser):
+        parser.add_argument('App', type=str)
+        parser.add_argument('Model', type=str, nargs='?')
+
+        parser.add_argument(
+            '--backend',
+            dest='backend',
+            default=None,
+            help='Backend do índice: postgres, trigram ou sqlite (padrão: SEARCH_BACKEND ou o banco utilizado)'
+        )
+        parser.add_argument(
+            '--fields',
+            dest='fields',
+            default=None,
+            help='Campos separados por vírgula, substitui o search_fields da view de listagem'
+        )
+        parser.add_argument(
+            '--drop',
+            action='store_true',
+            dest='drop',
+            help='Apenas remover o índice'
+        )
+        parser.add_argument(
+            '--database',
+            dest='database',
+            default='default',
+            help='Banco de dados utilizado para escolher o backend padrão'
+        )
+
+    @staticmethod
+    def __get_search_fields(model):
+        """Method to retrieve the search_fields of the model list view
+
+        Returns:
+            List -- search_fields configured in the list view or an empty list
+        """
+        try:
+            list_view = '{}:{}-list'.format(model._meta.app_label.lower(), model._meta.model_name.lower())
+            return list(resolve(reverse(list_view)).func.view_class.search_fields)
+        except Exception as error:
+            Utils.show_message(f"View de listagem não encontrada para o model {model.__name__}: {error}")
+            return []
+
+    def __get_backend(self, connection, backend):
+        backend = backend or SEARCH_BACKEND
+        if backend in ('postgres', 'trigram', 'sqlite'):
+            return backend
+        return {'postgresql': 'postgres', 'sqlite': 'sqlite'}.get(connection.vendor)
+
+    @staticmethod
+    def __postgres(qn, model, fields):
+        """SQL to create and to drop the generated tsvector column and its GIN index
+
+        Returns:
+            Tuple -- (create statements, drop statements)
+        """
+        table = qn(model._meta.db_table)
+        column = qn(PostgresSearchBackend.column)
+        index = qn('{}_search_vector_gin'.format(model._meta.db_table))
+        drop = [f"DROP INDEX IF EXISTS {index}", f"ALTER TABLE {table} DROP COLUMN IF EXISTS {column}"]
+        document = " || ' ' || ".join(f"coalesce({qn(field.column)}::text, '')" for field in fields)
+        # Coluna gerada, o PostgreSQL mantém o tsvector atualizado a cada INSERT/UPDATE
+        create = drop + [
+            f"ALTER TABLE {table} ADD COLUMN {column} tsvector GENERATED ALWAYS AS "
+            f"(to_tsvector({regconfig_literal()}, {document})) STORED",
+            f"CREATE INDEX {index} ON {table} USING gin ({column})",
+        ]
+        return create, drop
+
+    @staticmethod
+    def __trigram(qn, model, fields):
+        """SQL to create and to drop the pg_trgm GIN indexes of the fields
+
+        Returns:
+            Tuple -- (create statements, drop statements)
+        """
+        table = qn(model._meta.db_table)
+        indexes = [(qn('{}_{}_trgm'.format(model._meta.db_table, field.column)), field) for field in fields]
+        drop = [f"DROP INDEX IF EXISTS {index}" for index, field in indexes]
+        # Mesma expressão gerada pelo icontains do Django, assim o índice é utilizado
+        create = ["CREATE EXTENSION IF NOT EXISTS pg_trgm"] + drop + [
+            f"CREATE INDEX {index} ON {table} USING gin (UPPER({qn(field.column)}::text) gin_trgm_ops)"
+            for index, field in indexes]
+        return create, drop
+
+    @staticmethod
+    def __sqlite(qn, model, fields):
+        """SQL to create and to drop the FTS5 virtual table and its triggers
+
+        Returns:
+            Tuple -- (create statements, drop statements)
+        """
+        table_name = model._meta.db_table
+        table = qn(table_name)
+        fts = qn(table_name + SQLiteSearchBackend.suffix)
+        pk = qn(model._meta.pk.column)
+        drop = [f"DROP TRIGGER IF EXISTS {qn(f'{table_name}_fts_{trigger}')}" for trigger in ('ai', 'ad', 'au')]
+        drop.append(f"DROP TABLE IF EXISTS {fts}")
+        columns = ', '.join(qn(field.column) for field in fields)
+        new_values = ', '.join(f"new.{qn(field.column)}" for field in fields)
+        create = drop + [
+            f"CREATE VIRTUAL TABLE {fts} USING fts5(pk UNINDEXED, {columns})",
+            f"INSERT INTO {fts} (pk, {columns}) SELECT {pk}, {columns} FROM {table}",
+            # Gatilhos para manter a tabela virtual sincronizada com a tabela do model
+            f"CREATE TRIGGER {qn(f'{table_name}_fts_ai')} AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts} (pk, {columns}) VALUES (new.{pk}, {new_values}); END",
+            f"CREATE TRIGGER {qn(f'{table_name}_fts_ad')} AFTER DELETE ON {table} BEGIN "
+            f"DELETE FROM {fts} WHERE pk = old.{pk}; END",
+            f"CREATE TRIGGER {qn(f'{table_name}_fts_au')} AFTER UPDATE ON {table} BEGIN "
+            f"DELETE FROM {fts} WHERE pk = old.{pk}; "
+            f"INSERT INTO {fts} (pk, {columns}) VALUES (new.{pk}, {new_values}); END",
+        ]
+        return create, drop
+
+    @staticmethod
+    def __write_migration(app_config, name, sql, reverse_sql):
+        """Method to write the RunSQL migration after the last migration of the app
+
+        Returns:
+            String -- Path of the migration file
+        """
+        # as migrations escritas nesta execução também são lidas do disco
+        importlib.invalidate_caches()
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        leaves = loader.graph.leaf_nodes(app_config.label)
+        number = max([MigrationAutodetector.parse_number(leaf[1]) or 0 for leaf in leaves] or [0]) + 1
+        migration = type('Migration', (migrations.Migration,), {
+            'dependencies': leaves,
+            'operations': [migrations.RunSQL(sql, reverse_sql)],
+        })('{:04d}_{}'.format(number, name), app_config.label)
+        writer = MigrationWriter(migration)
+        directory = os.path.dirname(writer.path)
+        os.makedirs(directory, exist_ok=True)
+        if not os.path.isfile(os.path.join(directory, '__init__.py')):
+            open(os.path.join(directory, '__init__.py'), 'w').close()
+        with open(writer.path, 'w', encoding='utf-8') as migration_file:
+            migration_file.write(writer.as_string())
+        return writer.path
+
+    def handle(self, *args, **options):
+        app = options['App'].strip().lower()
+        if apps.is_installed(app) is False and app not in [config.label for config in apps.get_app_configs()]:
+            Utils.show_message("Você deve colocar sua app no INSTALLED_APPS do settings.")
+            return
+        app_config = apps.get_app_config(app)
+        if options['Model']:
+            try:
+                models = [app_config.get_model(options['Model'].strip())]
+            except LookupError as error:
+                Utils.show_message(f"Model informado não encontrado: {error}")
+                return
+        else:
+            models = list(app_config.get_models())
+
+        connection = connections[options['database']]
+        backend = self.__get_backend(connection, options['backend'])
+        if backend is None:
+            Utils.show_message(f"O banco {connection.vendor} não possui backend de pesquisa indexado.")
+            return
+
+        for model in models:
+            if options['fields']:
+                search_fields = [field.strip() for field in options['fields'].split(',') if field.strip()]
+            else:
+                search_fields = self.__get_search_fields(model)
+            fields, others = split_search_fields(model, search_fields)
+            if not fields:
+                Utils.show_message(f"O model {model.__name__} não possui campos texto no search_fields.")
+                continue
+            if others:
+                Utils.show_message(f"Os campos {', '.join(others)} do model {model.__name__} continuam sendo "
+                                   f"pesquisados com icontains.")
+            Utils.show_message(f"{'Removendo' if options['drop'] else 'Gerando'} o índice {backend} do model "
+                               f"{model.__name__} com os campos {', '.join(field.name for field in fields)}")
+            try:
+                method = {'postgres': self.__postgres, 'trigram': self.__trigram, 'sqlite': self.__sqlite}[backend]
+                create, drop = method(connection.ops.quote_name, model, fields)
+                # a remoção é revertida recriando o índice e a criação removendo-o
+                sql, reverse_sql = (drop, create) if options['drop'] else (create, drop)
+                name = '{}_{}_search_{}'.format('drop' if options['drop'] else 'create', model._meta.model_name, backend)
+                path = self.__write_migration(app_config, name, sql, reverse_sql)
+                Utils.show_message(f"Migration gerada em {path}")
+            except Exception as error:
+                Utils.show_message(f"Error in search_index ({model.__name__}): {error}")
+        Utils.show_message("Processo concluído, execute o comando manage.py migrate para aplicar os índices.")
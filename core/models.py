@@ -1,14 +1,19 @@
-import uuid
+from collections import OrderedDict
+from functools import partial
 
-from django.contrib.auth import get_permission_codename
-from django.contrib.contenttypes.fields import GenericForeignKey, GenericRel
 from django.db import models
 from django.db import transaction
-from django.db.models import (AutoField, ManyToManyField, ManyToOneRel, ManyToManyRel, OneToOneRel, BooleanField,
-                              FileField, ImageField)
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
 
-from .settings import use_default_manager
+from .archive import ArchiveDescriptor
+from .counting import CountingPaginator
+from .facets import bump_facet_version, bump_write_version
+from .introspection import read_fields
+from .permissions import get_permission_resolver
+from .settings import SOFT_DELETE_CHUNK_SIZE, use_default_manager
+from .soft_delete import iter_key_chunks, merge_counts, set_lock_timeout, soft_delete_cascade
+from .uuids import default_uuid
 
 models.options.DEFAULT_NAMES += ('fk_fields_modal', 'fields_display', 'fk_inlines')
 
@@ -18,14 +23,103 @@ class PaginacaoCustomizada(PageNumberPagination):
         O padrão da paginação são 10 itens, caso queira
         alterar o valor basta passar na URL o parametro
         page_size = X
+        A estratégia de contagem pode ser definida na viewset
+        com o atributo count_mode ('exact', 'estimate' ou 'cached')
     """
 
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 100000
+    count_mode = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.django_paginator_class = partial(
+            CountingPaginator, count_mode=getattr(view, 'count_mode', None) or self.count_mode)
+        return super(PaginacaoCustomizada, self).paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        count = self.page.paginator.count
+        return Response(OrderedDict([
+            ('count', int(count)),
+            ('count_estimated', getattr(count, 'estimated', False)),
+            ('count_display', '{}'.format(count)),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+
+class BaseQuerySet(models.QuerySet):
+    """QuerySet com as operações em lote da exclusão lógica.
+    As operações são executadas em lotes (chunk_size) com uma transação
+    por lote, evitando bloqueios longos em tabelas grandes, quando
+    chunk_size for None utiliza o SOFT_DELETE_CHUNK_SIZE do settings
+    e quando for 0 executa em um único lote.
+    """
+
+    def _run_in_chunks(self, operation, chunk_size=None):
+        chunk_size = SOFT_DELETE_CHUNK_SIZE if chunk_size is None else chunk_size
+        counts = OrderedDict()
+        for keys in iter_key_chunks(self, chunk_size):
+            with transaction.atomic(using=self.db):
+                set_lock_timeout(self.db)
+                merge_counts(counts, operation(keys))
+        return sum(counts.values()), dict(counts)
+
+    def update(self, **kwargs):
+        rows = super(BaseQuerySet, self).update(**kwargs)
+        # as opções dos filtros que utilizam o model são recarregadas
+        bump_facet_version(self.model)
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super(BaseQuerySet, self).bulk_create(objs, *args, **kwargs)
+        bump_facet_version(self.model)
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        rows = super(BaseQuerySet, self).bulk_update(objs, fields, *args, **kwargs)
+        bump_facet_version(self.model)
+        return rows
+
+    def soft_delete(self, cascade=True, chunk_size=None):
+        """Marca os registros como deleted = True e enabled = False
+
+        Returns:
+            Tuple -- (total de registros alterados, {label do model: quantidade})
+        """
+        return self._run_in_chunks(
+            lambda keys: soft_delete_cascade(self.model, keys, using=self.db, cascade=cascade), chunk_size)
+
+    def restore(self, cascade=True, chunk_size=None):
+        """Restaura os registros excluídos logicamente, deve ser chamado
+        a partir do objects_all, já que o BaseManager não retorna os registros excluídos
+
+        Returns:
+            Tuple -- (total de registros alterados, {label do model: quantidade})
+        """
+        return self._run_in_chunks(
+            lambda keys: soft_delete_cascade(self.model, keys, using=self.db, deleted=False, cascade=cascade),
+            chunk_size)
 
+    def hard_purge(self, only_deleted=True, chunk_size=None):
+        """Remove fisicamente os registros do banco de dados, por padrão apenas os
+        já marcados como deleted, deve ser chamado a partir do objects_all
 
-class BaseManager(models.Manager):
+        Returns:
+            Tuple -- (total de registros removidos, {label do model: quantidade})
+        """
+        queryset = self.filter(deleted=True) if only_deleted else self
+
+        def purge(keys):
+            deleted, counts = self.model._base_manager.using(self.db).filter(pk__in=keys).delete()
+            bump_facet_version(self.model)
+            return counts
+
+        return queryset._run_in_chunks(purge, chunk_size)
+
+
+class BaseManager(models.Manager.from_queryset(BaseQuerySet)):
     """Sobrescrevendo o Manager padrão. Nesse Manager 
     os registros não são apagados do banco de dados
     apenas desativados, atribuindo ao campo deleted = True e
@@ -50,8 +144,11 @@ class Base(models.Model):
     para herdar os métodos e atributos
     objects_all [Manager auxiliar para retornar todos os registro
                  mesmo que o use_default_manager esteja como True]
+    objects_archive [Manager dos registros arquivados, com o restore()
+                     para devolvê-los à tabela principal]
     """
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # uuid4 ou, com o PRIMARY_KEY_UUID_VERSION = 7, ordenado pelo tempo
+    id = models.UUIDField(primary_key=True, default=default_uuid, editable=False)
     enabled = models.BooleanField('Ativo', default=True)
     deleted = models.BooleanField(default=False)
     created_on = models.DateTimeField(auto_now_add=True)
@@ -61,109 +158,58 @@ class Base(models.Model):
     if use_default_manager is False:
         objects = BaseManager()
     else:
-        objects = models.Manager()
+        objects = BaseQuerySet.as_manager()
 
     # Manager auxiliar para retornar todos os registro indepentende
     # da configuraçao do use_default_manager
-    objects_all = models.Manager()
+    objects_all = BaseQuerySet.as_manager()
+
+    # Manager dos registros movidos para a tabela de arquivo pelo comando archive
+    objects_archive = ArchiveDescriptor()
 
     def get_all_related_fields(self):
         """Método para retornar todos os campos que fazem referência ao 
-        registro que está sendo manipulado
+        registro que está sendo manipulado.
+        A classificação dos campos é feita uma única vez por model (ver introspection),
+        aqui são apenas lidos os valores do registro
         
         Returns:
             [Listas] -- [São retornadas duas listas a primeira com
                          os campos 'comuns' e a segunda lista os campos que 
-                         possuem relacionamento ManyToMany ou ForeignKey]
+                         possuem relacionamento ManyToMany ou ForeignKey,
+                         com as querysets ainda não avaliadas]
         """
+        return read_fields(self)
 
-        try:
-            # Lista para retornar os campos que não são de relacionamento
-            object_list = []
-
-            # Lista para retornar os campos com relacionamento
-            many_fields = []
-
-            for field in self._meta.get_fields(include_parents=True):
-                # Verificando se existe o atributo exclude no atributo que está sendo analisado
-                if hasattr(self, 'exclude'):
-                    if field.name in Base().get_exclude_hidden_fields() or field.name in self.exclude:
-                        continue
-                # Desconsiderando o campo do tipo AutoField da análise
-                if isinstance(field, AutoField):
-                    continue
-                # Desconsiderando os campos com atributos auto_now_add ou now_add da análise
-                if hasattr(field, "auto_now_add") or hasattr(field, "now_add"):
-                    continue
-
-                # Verificando o tipo do relacionamento entre os campos
-                if type(field) is ManyToManyField:
-                    many_fields.append((
-                        field.verbose_name or field.name,
-                        self.__getattribute__(field.name).all() or None
-                    ))
-                elif type(field) is ManyToOneRel or type(field) is ManyToManyRel:
-                    many_fields.append((field.related_model._meta.verbose_name_plural or field.name,
-                                        self.__getattribute__(
-                                            (field.related_name or '{}_set'.format(field.name))
-                                        )))
-                elif type(field) is GenericRel or type(field) is GenericForeignKey:
-                    many_fields.append(((field.verbose_name if hasattr(field, 'verbose_name') else None) or field.name,
-                                        self.object.__getattribute__(field.name)))
-                elif type(field) is OneToOneRel:
-                    try:
-                        object_list.append((field.related_model._meta.verbose_name or field.name,
-                                            self.object.__getattribute__(field.name)))
-                    except Exception:
-                        pass
-                elif type(field) is BooleanField:
-                    object_list.append(((field.verbose_name if hasattr(field, 'verbose_name') else None) or field.name,
-                                        "Sim" if self.__getattribute__(field.name) else "Nâo"))
-                elif type(field) is ImageField or type(field) is FileField:
-                    tag = ''
-                    if self.__getattribute__(field.name).name:
-                        if type(field) is ImageField:
-                            tag = '<img width="100px" src="{url}" alt="{nome}" />'
-                        elif type(field) is FileField:
-                            tag = '<a  href="{url}" > <i class="fas fa-file"></i> {nome}</a>'
-                        if tag:
-                            tag = tag.format(url=self.__getattribute__(field.name).url,
-                                             nome=self.__getattribute__(field.name).name.split('.')[0])
-
-                    object_list.append(((field.verbose_name if hasattr(field, 'verbose_name') else None) or field.name,
-                                        tag))
-                else:
-                    object_list.append(((field.verbose_name if hasattr(field, 'verbose_name') else None) or field.name,
-                                        self.__getattribute__(field.name)))
-
-        finally:
-            # Retornando as listas
-            return object_list, many_fields
+    def save(self, *args, **kwargs):
+        super(Base, self).save(*args, **kwargs)
+        # apenas o ETag das respostas é invalidado, as opções dos filtros expiram pelo FACET_CACHE_TTL
+        bump_write_version(self.__class__)
 
     def delete(self, using='default', keep_parents=False):
         """Sobrescrevendo o método para marcar os campos
         deleted como True e enabled como False. Assim o
         item não é excluído do banco de dados.
+        Os registros relacionados são marcados com um UPDATE
+        por tabela, sem carregar os registros.
+
+        Returns:
+            Tuple -- (total de registros alterados, {label do model: quantidade})
         """
         # Verificando se deve ser utilizado o manager costumizado
         if use_default_manager is False:
 
             # Iniciando uma transação para garantir a integridade dos dados
-            with transaction.atomic():
-
-                # Recuperando as listas com os campos do objeto
-                object_list, many_fields = self.get_all_related_fields()
-
-                # Percorrendo todos os campos que possuem relacionamento com o objeto
-                for obj, values in many_fields:
-                    if values is not None and values.all():
-                        values.all().update(deleted=True, enabled=False)
-                # Atualizando o registro 
-                self.deleted = True
-                self.enabled = False
-                self.save(update_fields=['deleted', 'enabled'])
+            with transaction.atomic(using=using):
+                counts = soft_delete_cascade(self.__class__, [self.pk], using=using)
+            # Atualizando o registro em memória
+            self.deleted = True
+            self.enabled = False
+            return sum(counts.values()), dict(counts)
         else:
-            super(Base, self).delete()
+            deleted = super(Base, self).delete(using=using, keep_parents=keep_parents)
+            bump_facet_version(self.__class__)
+            return deleted
 
     class Meta:
         """ Configure abstract class """
@@ -181,9 +227,7 @@ class Base(models.Model):
         Returns True if the given request has permission to add an object.
         Can be overridden by the user in subclasses.
         """
-        opts = self._meta
-        codename = get_permission_codename('add', opts)
-        return request.user.has_perm("%s.%s" % (opts.app_label, codename))
+        return get_permission_resolver(request).has_model_perm('add', self)
 
     def has_change_permission(self, request, obj=None):
         """
@@ -195,9 +239,7 @@ class Base(models.Model):
         model instance. If `obj` is None, this should return True if the given
         request has permission to change *any* object of the given type.
         """
-        opts = self._meta
-        codename = get_permission_codename('change', opts)
-        return request.user.has_perm("%s.%s" % (opts.app_label, codename))
+        return get_permission_resolver(request).has_model_perm('change', self)
 
     def has_delete_permission(self, request, obj=None):
         """
@@ -209,9 +251,7 @@ class Base(models.Model):
         model instance. If `obj` is None, this should return True if the given
         request has permission to delete *any* object of the given type.
         """
-        opts = self._meta
-        codename = get_permission_codename('delete', opts)
-        return request.user.has_perm("%s.%s" % (opts.app_label, codename))
+        return get_permission_resolver(request).has_model_perm('delete', self)
 
     def __str__(self):
         return self.updated_on.strftime('%d/%m/%Y %H:%M:%S')
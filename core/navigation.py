@@ -0,0 +1,118 @@
+"""Estrutura de navegação (menu) com as apps e models do projeto.
+
+A estrutura é montada uma única vez, no primeiro uso, e fica congelada em memória.
+A cada requisição ela é apenas filtrada conforme o conjunto de permissões do usuário,
+filtragem que também é memorizada por conjunto de permissões.
+"""
+import logging
+import threading
+from functools import lru_cache
+from types import MappingProxyType
+
+from django.apps import apps
+
+logger = logging.getLogger(__name__)
+
+# Apps que não aparecem no menu
+IGNORED_APPS = ('django', 'rest_framework', 'core', 'ckeditor', 'corsheaders')
+
+_navigation = None
+_lock = threading.Lock()
+
+
+def build_navigation():
+    """Percorre as apps instaladas montando a estrutura do menu
+
+    Returns:
+        Tuple -- Tupla imutável com as apps e seus models
+    """
+    _apps = []
+    for app in apps.get_app_configs():
+        if any(ignored in app.name.lower() for ignored in IGNORED_APPS):
+            continue
+        _models = []
+        for model in app.get_models():
+            _models.append(MappingProxyType({
+                'name_model': model._meta.verbose_name,
+                'url_list_model': '/{app}/{model}/'.format(
+                    app=model._meta.app_label,
+                    model=model._meta.model_name),
+                'path_url': '{app}:{model}-list'.format(
+                    app=model._meta.app_label.lower(),
+                    model=model._meta.model_name.lower()),
+                'real_name_model': model._meta.model_name,
+                'app_label': model._meta.app_label,
+            }))
+        # Apps sem models não possuem as urls de index
+        if not _models:
+            continue
+        _apps.append(MappingProxyType({
+            'name_app': '%s' % app.verbose_name,
+            'models_app': tuple(_models),
+            'index_url_app': '{}:{}-index'.format(app.label, app.label),
+            'real_name_app': app.name,
+            'real_name_model': _models[-1]['real_name_model'],
+            'app_label': app.label,
+        }))
+    return tuple(_apps)
+
+
+def get_navigation():
+    """Retorna a estrutura do menu, montando-a no primeiro uso"""
+    global _navigation
+    if _navigation is None:
+        with _lock:
+            if _navigation is None:
+                _navigation = build_navigation()
+    return _navigation
+
+
+def warm_navigation_cache():
+    """Monta a estrutura do menu antecipadamente, ex: no ready() da app ou nos testes"""
+    return get_navigation()
+
+
+def clear_navigation_cache():
+    """Descarta a estrutura do menu e as filtragens por permissão"""
+    global _navigation
+    with _lock:
+        _navigation = None
+    _filter_navigation.cache_clear()
+
+
+def _has_model_permission(permissions, model):
+    prefix = '{}.'.format(model['app_label'])
+    return any('{}{}_{}'.format(prefix, action, model['real_name_model']) in permissions
+               for action in ('view', 'add', 'change', 'delete'))
+
+
+@lru_cache(maxsize=256)
+def _filter_navigation(permissions):
+    _apps = []
+    for app in get_navigation():
+        _models = tuple(model for model in app['models_app'] if _has_model_permission(permissions, model))
+        if not _models:
+            continue
+        if len(_models) == len(app['models_app']):
+            _apps.append(app)
+        else:
+            filtered = dict(app)
+            filtered['models_app'] = _models
+            _apps.append(MappingProxyType(filtered))
+    return tuple(_apps)
+
+
+def get_apps_for_user(user, permissions=None):
+    """Retorna as apps e models que o usuário tem acesso
+
+    Arguments:
+        user {User} -- Usuário da requisição
+
+    Keyword Arguments:
+        permissions {frozenset} -- Permissões do usuário já carregadas (default: {None})
+    """
+    if user is None or not user.is_authenticated or not user.is_active:
+        return ()
+    if permissions is None:
+        permissions = frozenset(user.get_all_permissions())
+    return _filter_navigation(frozenset(permissions))
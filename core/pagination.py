@@ -0,0 +1,243 @@
+"""Paginação por cursor (keyset/seek) utilizada pelas views de listagem e pela API.
+
+Ao contrário da paginação por OFFSET, a próxima página é obtida filtrando a partir
+dos valores de ordenação do último registro da página atual, assim o custo de cada
+página é constante independente da profundidade.
+O cursor trafega como um token opaco no parâmetro 'cursor' da URL.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .uuids import is_time_ordered
+
+CURSOR_QUERY_PARAM = 'cursor'
+
+
+def get_keyset_field(model, name):
+    """Retorna o campo do model utilizado na ordenação do cursor, apenas os campos
+    do próprio model (ex: 'nome' ou 'cliente'), os campos relacionados (ex: 'cliente__nome') não
+
+    Raises:
+        ImproperlyConfigured -- Caso o campo não exista ou não seja do próprio model
+    """
+    if name == 'pk':
+        return model._meta.pk
+    try:
+        field = model._meta.get_field(name) if '__' not in name else None
+    except FieldDoesNotExist:
+        field = None
+    if field is None or not getattr(field, 'concrete', False) or field.many_to_many:
+        raise ImproperlyConfigured(
+            "A ordenação por cursor do model {} aceita apenas os campos do próprio model, "
+            "'{}' não é válido".format(model._meta.label, name))
+    return field
+
+
+def is_keyset_ordering(model, ordering):
+    try:
+        for item in ordering:
+            get_keyset_field(model, item.lstrip('-'))
+    except ImproperlyConfigured:
+        return False
+    return True
+
+
+def get_keyset_ordering(model, ordering=None):
+    """Retorna a ordenação utilizada pelo cursor
+
+    Caso não seja informada utiliza o Meta.ordering do model, quando este for
+    diferente do padrão do Base (['id'], que é aleatório com o uuid4) e possuir
+    apenas campos do próprio model, ou ('-created_on', 'id').
+    """
+    if ordering:
+        return tuple(ordering)
+    meta_ordering = [item for item in (model._meta.ordering or []) if isinstance(item, str) and item != '?']
+    if meta_ordering and meta_ordering == list(model._meta.ordering) and (meta_ordering != ['id'] or
+                                                                         is_time_ordered()):
+        if is_keyset_ordering(model, meta_ordering):
+            return tuple(meta_ordering)
+    try:
+        model._meta.get_field('created_on')
+        return '-created_on', 'id'
+    except FieldDoesNotExist:
+        return 'pk',
+
+
+class KeysetPage(object):
+    """Página retornada pelo Keyset, compatível com o uso do page_obj nos templates"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class Keyset(object):
+    """Paginador por cursor sobre uma ordenação com desempate único
+
+    Arguments:
+        model {Model} -- Model paginado
+        ordering {Iterable} -- Campos da ordenação, ex: ('-created_on', 'id')
+
+    Raises:
+        ImproperlyConfigured -- Caso a ordenação possua campos relacionados ou inexistentes
+    """
+
+    def __init__(self, model, ordering):
+        self.model = model
+        fields = []
+        for item in ordering:
+            field = get_keyset_field(model, item.lstrip('-'))
+            fields.append((field, item.startswith('-')))
+        # Garantindo que o último campo seja único para não perder registros entre as páginas
+        if not any(field.primary_key for field, descending in fields):
+            fields.append((model._meta.pk, fields[-1][1] if fields else False))
+        self.fields = tuple(fields)
+
+    def encode(self, obj, reverse=False):
+        values = [field.value_to_string(obj) for field, descending in self.fields]
+        token = json.dumps({'v': values, 'r': int(reverse)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(token.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode(self, token):
+        """Retorna os valores e a direção do cursor
+
+        Raises:
+            ValueError -- Caso o cursor seja inválido
+        """
+        try:
+            token = base64.urlsafe_b64decode((token + '=' * (-len(token) % 4)).encode('ascii'))
+            data = json.loads(token.decode('utf-8'))
+            values = [field.to_python(value) for (field, descending), value in zip(self.fields, data['v'])]
+            if len(values) != len(self.fields):
+                raise ValueError('Quantidade de valores diferente da ordenação')
+            return values, bool(data.get('r'))
+        except Exception as error:
+            raise ValueError('Cursor inválido: {}'.format(error))
+
+    def order(self, queryset, reverse=False):
+        return queryset.order_by(*['{}{}'.format('-' if descending != reverse else '', field.attname)
+                                   for field, descending in self.fields])
+
+    def seek(self, queryset, values, reverse=False):
+        """Filtra os registros posteriores (ou anteriores quando reverse) aos valores informados"""
+        condition = Q()
+        for index, (field, descending) in enumerate(self.fields):
+            lookup = 'lt' if descending != reverse else 'gt'
+            current = Q(**{'{}__{}'.format(field.attname, lookup): values[index]})
+            for previous_index, (previous_field, previous_descending) in enumerate(self.fields[:index]):
+                current &= Q(**{previous_field.attname: values[previous_index]})
+            condition |= current
+        return queryset.filter(condition)
+
+    def paginate(self, queryset, page_size, cursor=None):
+        """Retorna a página a partir do cursor informado
+
+        Raises:
+            ValueError -- Caso o cursor seja inválido
+        """
+        values, reverse = self.decode(cursor) if cursor else (None, False)
+        queryset = self.order(queryset, reverse)
+        if values is not None:
+            queryset = self.seek(queryset, values, reverse)
+        # Buscando um registro a mais para saber se existe outra página
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, cursor is not None
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode(rows[-1]) if has_next and rows else None,
+            previous_cursor=self.encode(rows[0], reverse=True) if has_previous and rows else None,
+        )
+
+
+class PaginacaoKeyset(BasePagination):
+    """Classe para configurar a paginação por cursor da API
+        Recomendada para tabelas grandes, os links next e previous
+        carregam o cursor no parametro cursor. O tamanho da página
+        pode ser alterado passando na URL o parametro page_size = X
+        A ordenação pode ser definida na viewset com o atributo keyset_ordering
+    """
+
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = CURSOR_QUERY_PARAM
+    ordering = None
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        ordering = get_keyset_ordering(queryset.model, getattr(view, 'keyset_ordering', None) or self.ordering)
+        try:
+            self.page = Keyset(queryset.model, ordering).paginate(
+                queryset, self.get_page_size(request), request.query_params.get(self.cursor_query_param))
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        return list(self.page)
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(request.query_params[self.page_size_query_param], strict=True,
+                                     cutoff=self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self.get_link(self.page.next_cursor)
+
+    def get_previous_link(self):
+        return self.get_link(self.page.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,111 @@
+"""Resolução das permissões do usuário com cache por requisição.
+
+O conjunto completo de permissões do usuário é carregado uma única vez por
+requisição em um frozenset, e as views, os models (Base.has_*_permission) e os
+filtros de template respondem a partir dele.
+Opcionalmente (PERMISSION_CACHE_TTL) o conjunto fica em cache entre requisições,
+com a chave formada pelo id do usuário e pela versão das permissões, que é
+incrementada sempre que permissões ou grupos são alterados.
+"""
+import logging
+
+from django.contrib.auth import get_permission_codename
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete
+
+from .settings import PERMISSION_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+PERMISSION_VERSION_KEY = 'core:permissions:version'
+
+
+def get_permission_version():
+    version = cache.get(PERMISSION_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(PERMISSION_VERSION_KEY, version, None)
+    return version
+
+
+def bump_permission_version():
+    """Invalida o cache de permissões de todos os usuários"""
+    try:
+        cache.incr(PERMISSION_VERSION_KEY)
+    except ValueError:
+        cache.set(PERMISSION_VERSION_KEY, 2, None)
+
+
+class PermissionResolver(object):
+    """Resolve as permissões de um usuário a partir do conjunto carregado uma única vez
+
+    Arguments:
+        user {User} -- Usuário da requisição
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._permissions = None
+
+    @property
+    def permissions(self):
+        if self._permissions is None:
+            self._permissions = self.load_permissions()
+        return self._permissions
+
+    def load_permissions(self):
+        user = self.user
+        if user is None or not user.is_active or not user.is_authenticated:
+            return frozenset()
+        if not PERMISSION_CACHE_TTL or user.pk is None:
+            return frozenset(user.get_all_permissions())
+        key = 'core:permissions:{}:{}'.format(user.pk, get_permission_version())
+        permissions = cache.get(key)
+        if permissions is None:
+            permissions = frozenset(user.get_all_permissions())
+            cache.set(key, permissions, PERMISSION_CACHE_TTL)
+        return permissions
+
+    def has_perm(self, perm):
+        user = self.user
+        if user is None or not user.is_active:
+            return False
+        if user.is_superuser:
+            return True
+        return perm in self.permissions
+
+    def has_model_perm(self, action, model):
+        """Verifica a permissão da ação (add, change, delete, view) no model informado"""
+        opts = model._meta
+        return self.has_perm('%s.%s' % (opts.app_label, get_permission_codename(action, opts)))
+
+
+def get_permission_resolver(request):
+    """Retorna o resolvedor de permissões da requisição, criando-o no primeiro uso"""
+    resolver = getattr(request, '_permission_resolver', None)
+    user = getattr(request, 'user', None)
+    if resolver is None or resolver.user is not user:
+        resolver = PermissionResolver(user)
+        try:
+            request._permission_resolver = resolver
+        except AttributeError:
+            pass
+    return resolver
+
+
+def _permissions_m2m_changed(sender, instance, model, **kwargs):
+    from django.contrib.auth.models import Group, Permission
+
+    if issubclass(model, (Group, Permission)) or isinstance(instance, (Group, Permission)):
+        bump_permission_version()
+
+
+def _permissions_deleted(sender, **kwargs):
+    from django.contrib.auth.models import Group, Permission
+
+    if issubclass(sender, (Group, Permission)):
+        bump_permission_version()
+
+
+m2m_changed.connect(_permissions_m2m_changed, dispatch_uid='core_permissions_m2m_changed')
+post_delete.connect(_permissions_deleted, dispatch_uid='core_permissions_deleted')
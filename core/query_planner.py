@@ -0,0 +1,184 @@
+"""Planejador das otimizações de consulta (select_related, prefetch_related e only)
+utilizadas pelas views de listagem, detalhe e exclusão.
+
+O plano é calculado a partir do list_display da view, das opções
+fields_display e fk_inlines do Meta do model e do próprio _meta, sendo
+armazenado por classe de view para não ser recalculado a cada requisição.
+"""
+import logging
+from collections import namedtuple
+
+from django.core.exceptions import FieldDoesNotExist
+
+logger = logging.getLogger(__name__)
+
+# Cache dos planos por classe de view
+_query_plans = {}
+
+
+class QueryPlan(namedtuple('QueryPlan', ['select_related', 'prefetch_related', 'only'])):
+    """Plano de consulta imutável
+
+    Attributes:
+        select_related {Tuple} -- Relacionamentos resolvidos com JOIN
+        prefetch_related {Tuple} -- Relacionamentos carregados em consulta separada
+        only {Tuple} -- Colunas carregadas, quando vazio todas são carregadas
+    """
+
+    def apply(self, queryset):
+        """Aplica o plano na queryset informada"""
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        if self.only:
+            queryset = queryset.only(*self.only)
+        return queryset
+
+    def describe(self):
+        """Retorna o plano em formato texto para depuração"""
+        return 'select_related={}; prefetch_related={}; only={}'.format(
+            list(self.select_related), list(self.prefetch_related), list(self.only) or 'todas as colunas')
+
+
+EMPTY_PLAN = QueryPlan((), (), ())
+
+
+def split_lookup(model, lookup):
+    """Percorre o lookup (ex: pai__avo__nome) separando a parte que pode ser
+    resolvida com select_related da parte que precisa de prefetch_related
+
+    Returns:
+        Tuple -- (caminho_select_related, caminho_prefetch_related), ambos podem ser None
+    """
+    select_path = []
+    opts = model._meta
+    parts = lookup.split('__')
+    for index, name in enumerate(parts):
+        try:
+            field = opts.get_field(name)
+        except FieldDoesNotExist:
+            break
+        if not field.is_relation or field.related_model is None:
+            break
+        if field.many_to_many or field.one_to_many:
+            # a partir de um relacionamento multivalorado só é possível utilizar o prefetch
+            prefetch_path = select_path + [name]
+            for sub_name in parts[index + 1:]:
+                try:
+                    sub_field = field.related_model._meta.get_field(sub_name)
+                except FieldDoesNotExist:
+                    break
+                if not sub_field.is_relation or sub_field.related_model is None:
+                    break
+                prefetch_path.append(sub_name)
+                field = sub_field
+            return '__'.join(select_path) or None, '__'.join(prefetch_path)
+        select_path.append(name)
+        opts = field.related_model._meta
+    return '__'.join(select_path) or None, None
+
+
+def build_query_plan(model, fields=(), prefetch=(), restrict_columns=False):
+    """Monta o plano de consulta do model para os campos que serão exibidos
+
+    Arguments:
+        model {Model} -- Model que será consultado
+        fields {Iterable} -- Campos ou lookups exibidos (ex: list_display)
+        prefetch {Iterable} -- Relacionamentos que devem ser sempre carregados via prefetch
+
+    Keyword Arguments:
+        restrict_columns {bool} -- Quando True e todos os campos forem colunas do model,
+                                   gera a lista do only() (default: {False})
+
+    Returns:
+        QueryPlan
+    """
+    select_related = []
+    prefetch_related = []
+    only = ['pk']
+    for name in fields:
+        if name in ('pk', 'id'):
+            continue
+        select_path, prefetch_path = split_lookup(model, name)
+        if select_path and select_path not in select_related:
+            select_related.append(select_path)
+        if prefetch_path and prefetch_path not in prefetch_related:
+            prefetch_related.append(prefetch_path)
+        if restrict_columns and only is not None:
+            try:
+                field = model._meta.get_field(name.split('__')[0])
+            except FieldDoesNotExist:
+                # __str__, properties e métodos da view podem usar qualquer coluna
+                only = None
+                continue
+            if field.concrete and not field.many_to_many and field.name not in only:
+                only.append(field.name)
+
+    for name in prefetch:
+        if name not in prefetch_related:
+            prefetch_related.append(name)
+
+    # Os relacionamentos que vão por select_related precisam estar carregados no only()
+    if only is not None:
+        for path in select_related:
+            if path.split('__')[0] not in only:
+                only.append(path.split('__')[0])
+
+    return QueryPlan(tuple(select_related), tuple(prefetch_related),
+                     tuple(only) if restrict_columns and only else ())
+
+
+def detail_query_plan(model):
+    """Plano utilizado pelas views de detalhe e exclusão, que exibem todos os
+    campos do model através do Base.get_all_related_fields"""
+    select_related = [field.name for field in model._meta.get_fields()
+                      if field.concrete and (field.many_to_one or field.one_to_one) and field.related_model]
+    prefetch_related = [field.name for field in model._meta.many_to_many]
+    for name in getattr(model._meta, 'fk_inlines', None) or ():
+        if name not in prefetch_related:
+            prefetch_related.append(name)
+    return QueryPlan(tuple(select_related), tuple(prefetch_related), ())
+
+
+class QueryPlanMixin(object):
+    """Mixin para as views aplicarem o plano de consulta na queryset.
+
+    Para alterar o plano basta sobrescrever o método build_query_plan na view.
+    Para depurar o plano escolhido basta atribuir debug_query_plan = True
+    ou chamar o método explain_query_plan.
+    """
+
+    debug_query_plan = False
+
+    def build_query_plan(self):
+        """Hook para montar o plano da view, deve retornar um QueryPlan"""
+        return detail_query_plan(self.model)
+
+    def get_query_plan(self):
+        """Retorna o plano da view, calculado apenas uma vez por classe"""
+        key = (self.__class__, self.model)
+        plan = _query_plans.get(key)
+        if plan is None:
+            try:
+                plan = self.build_query_plan()
+            except Exception as error:
+                logger.error('Erro: %s; No Metodo: %s' % (error, 'QueryPlanMixin.get_query_plan()'))
+                plan = EMPTY_PLAN
+            _query_plans[key] = plan
+            if self.debug_query_plan:
+                logger.debug('%s: %s' % (self.__class__.__name__, plan.describe()))
+        return plan
+
+    def apply_query_plan(self, queryset):
+        return self.get_query_plan().apply(queryset)
+
+    @classmethod
+    def explain_query_plan(cls):
+        """Retorna o plano de consulta da view em formato texto"""
+        return cls().get_query_plan().describe()
+
+
+def clear_query_plans():
+    """Limpa o cache dos planos, utilizado nos testes e ao recarregar o código"""
+    _query_plans.clear()
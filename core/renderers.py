@@ -0,0 +1,73 @@
+"""Renderer e parser JSON rápidos para a API.
+
+Utilizam o orjson quando instalado e, na ausência dele, o json da biblioteca padrão
+através do JSONRenderer/JSONParser do Django Rest Framework, com o mesmo resultado.
+O orjson trata nativamente os UUIDs das chaves do Base, as datas são formatadas pelo
+encoder do DRF (mesmo formato do renderer padrão) assim como os Decimals e os demais
+tipos que o orjson não conhece.
+
+Para utilizar basta configurar no settings do projeto:
+    REST_FRAMEWORK = {
+        'DEFAULT_RENDERER_CLASSES': ['nuvols.core.renderers.FastJSONRenderer', ...],
+        'DEFAULT_PARSER_CLASSES': ['nuvols.core.renderers.FastJSONParser', ...],
+    }
+"""
+import codecs
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Encoder do DRF utilizado para os tipos que o orjson não serializa (datas, Decimal, lazy strings, querysets)
+_encoder = JSONEncoder()
+
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME if orjson is not None else 0
+
+
+def is_fast_json_available():
+    return orjson is not None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer que utiliza o orjson, mantendo o formato do renderer padrão.
+    Com indentação (ex: Accept: application/json; indent=4) ou sem o orjson utiliza o renderer padrão
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super(FastJSONRenderer, self).render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_encoder.default, option=ORJSON_OPTIONS)
+        except TypeError:
+            # chaves que não são texto, entre outros casos que apenas o json padrão aceita
+            return super(FastJSONRenderer, self).render(data, accepted_media_type, renderer_context)
+        # mesmo tratamento do renderer padrão para os separadores de linha do JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser que utiliza o orjson, sem o orjson utiliza o parser padrão"""
+
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super(FastJSONParser, self).parse(stream, media_type, parser_context)
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            data = stream.read()
+            if codecs.lookup(encoding).name != 'utf-8':
+                data = data.decode(encoding)
+            return orjson.loads(data)
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -1,12 +1,222 @@
-from collections import OrderedDict
+from collections import OrderedDict, namedtuple
 from collections.abc import Mapping
 
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured, ValidationError as DjangoValidationError
+from django.db import IntegrityError, router, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
-from rest_framework.fields import get_error_detail, set_value
-from rest_framework.serializers import ModelSerializer
+from rest_framework.fields import SkipField, get_error_detail, set_value
+from rest_framework.generics import GenericAPIView
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.serializers import ListSerializer, ModelSerializer
+from rest_framework.settings import api_settings
+
+from .conditional import conditional_response, detail_validators, list_validators
+from .counting import COUNT_EXACT, get_count_mode
+from .export import EXPORT_WRITERS, export_response, iter_chunks
+from .facets import bump_facet_version
+from .pagination import PaginacaoKeyset
+from .query_planner import split_lookup
+from .settings import BULK_WRITE_CHUNK_SIZE, BULK_WRITE_MAX_ITEMS
+from .sync import SYNC_CURSOR_PARAM, SYNC_PAGE_SIZE_PARAM, SYNC_SINCE_PARAM, get_changes, parse_since
+
+
+# Ganchos validate_<campo> de cada classe de serializer, obtidos uma única vez por classe e conjunto de campos
+_validation_hooks = {}
+
+ValidationStep = namedtuple('ValidationStep', ['field_name', 'get_value', 'run_validation', 'hook', 'source_attrs'])
+
+
+def get_validation_hooks(serializer_class, field_names):
+    """Ganchos validate_<campo> definidos na classe, na ordem dos campos
+
+    Returns:
+        Tuple -- Tupla de (nome do campo, função ou None)
+    """
+    key = (serializer_class, field_names)
+    hooks = _validation_hooks.get(key)
+    if hooks is None:
+        hooks = tuple((name, getattr(serializer_class, 'validate_' + name, None)) for name in field_names)
+        _validation_hooks[key] = hooks
+    return hooks
+
+
+# Parametros da URL das respostas parciais, ex: ?fields=id,nome,cliente.nome&expand=cliente
+FIELDS_QUERY_PARAM = 'fields'
+EXPAND_QUERY_PARAM = 'expand'
+
+
+def parse_field_paths(value):
+    """Converte o valor do parametro (ex: 'nome,cliente.cidade') em caminhos (('nome',), ('cliente', 'cidade'))"""
+    if not value:
+        return ()
+    return tuple(tuple(part for part in item.strip().split('.') if part) for item in value.split(',') if item.strip())
+
+
+def get_sparse_params(request):
+    """Campos e expansões solicitados na URL, apenas nas requisições de leitura
+
+    Returns:
+        Tuple -- (campos, expansões), os campos são None quando o parametro não foi informado
+    """
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return None, ()
+    params = request.query_params
+    fields = parse_field_paths(params.get(FIELDS_QUERY_PARAM)) if FIELDS_QUERY_PARAM in params else None
+    return fields, parse_field_paths(params.get(EXPAND_QUERY_PARAM))
+
+
+def _sub_paths(paths, name):
+    return tuple(path[1:] for path in paths if path[0] == name and len(path) > 1)
+
+
+def get_expandable_fields(serializer_class):
+    """Relacionamentos que podem ser expandidos, com o serializer de cada um (Meta.expandable_fields)"""
+    meta = getattr(serializer_class, 'Meta', None)
+    return getattr(meta, 'expandable_fields', None) or {}
+
+
+def filter_expand(serializer_class, expand):
+    """Mantém apenas as expansões declaradas no Meta.expandable_fields de cada nível,
+    os caminhos são cortados no primeiro relacionamento não declarado
+
+    Returns:
+        Tuple -- Caminhos das expansões permitidas
+    """
+    allowed = []
+    for path in expand:
+        current, accepted = serializer_class, []
+        for name in path:
+            expandable = get_expandable_fields(current)
+            if name not in expandable:
+                break
+            accepted.append(name)
+            current = expandable[name]
+        if accepted and tuple(accepted) not in allowed:
+            allowed.append(tuple(accepted))
+    return tuple(allowed)
+
+
+def apply_sparse_fields(queryset, fields, expand):
+    """Aplica na queryset o only() dos campos solicitados e o select_related/prefetch_related das expansões
+
+    Arguments:
+        fields {Tuple} -- Caminhos dos campos, None para todos os campos
+        expand {Tuple} -- Caminhos dos relacionamentos expandidos
+    """
+    model = queryset.model
+    select_related, prefetch_related = [], []
+    for path in expand:
+        select_path, prefetch_path = split_lookup(model, '__'.join(path))
+        if select_path and select_path not in select_related:
+            select_related.append(select_path)
+        if prefetch_path and prefetch_path not in prefetch_related:
+            prefetch_related.append(prefetch_path)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+    if fields is None:
+        return queryset
+
+    columns = [model._meta.pk.name]
+    for name in OrderedDict.fromkeys([path[0] for path in fields] + [path[0] for path in expand]):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # campos calculados do serializer podem usar qualquer coluna
+            return queryset
+        if field.concrete and not field.many_to_many and field.name not in columns:
+            columns.append(field.name)
+    return queryset.only(*columns)
 
 
 class Serializador(ModelSerializer):
+    """ModelSerializer padrão do sistema
+
+    Nas requisições de leitura trata os parametros ?fields= (campos retornados) e ?expand=
+    (relacionamentos retornados como objetos em vez do id), ambos aceitam caminhos separados
+    por ponto para os relacionamentos expandidos, ex: ?fields=id,cliente.nome&expand=cliente.
+    Apenas os relacionamentos declarados no Meta.expandable_fields, com o serializer de cada um,
+    podem ser expandidos, ex: expandable_fields = {'cliente': ClienteSerializer}, assim os campos
+    expostos dos models relacionados (ex: User) são sempre escolhidos explicitamente
+    """
+
+    def __init__(self, *args, **kwargs):
+        # campos e expansões informados diretamente, utilizados nos relacionamentos expandidos
+        self._sparse_fields = kwargs.pop('sparse_fields', None)
+        self._sparse_expand = kwargs.pop('sparse_expand', None)
+        super(Serializador, self).__init__(*args, **kwargs)
+
+    def get_sparse_options(self):
+        """Campos e expansões aplicados no serializer, os parametros da URL valem apenas para o serializer da view
+
+        Returns:
+            Tuple -- (caminhos dos campos ou None para todos, caminhos das expansões)
+        """
+        if self._sparse_fields is not None or self._sparse_expand is not None:
+            return self._sparse_fields, self._sparse_expand or ()
+        parent = getattr(self, 'parent', None)
+        if isinstance(parent, ListSerializer):
+            parent = getattr(parent, 'parent', None)
+        if parent is not None:
+            return None, ()
+        return get_sparse_params(self.context.get('request'))
+
+    def get_expanded_field(self, name, field, fields, expand):
+        serializer_class = get_expandable_fields(type(self))[name]
+        kwargs = {
+            'read_only': True,
+            'many': field.many_to_many or field.one_to_many,
+        }
+        if issubclass(serializer_class, Serializador):
+            kwargs['sparse_fields'] = (_sub_paths(fields, name) or None) if fields is not None else None
+            kwargs['sparse_expand'] = _sub_paths(expand, name)
+        if hasattr(field, 'get_accessor_name') and field.get_accessor_name() != name:
+            # relacionamento reverso, o atributo do registro é o accessor (ex: pedido_set)
+            kwargs['source'] = field.get_accessor_name()
+        if not kwargs['many'] and getattr(field, 'null', False):
+            kwargs['allow_null'] = True
+        return serializer_class(**kwargs)
+
+    def get_fields(self):
+        fields = super(Serializador, self).get_fields()
+        requested, expand = self.get_sparse_options()
+        expand = filter_expand(type(self), expand)
+        expanded = []
+        for name in OrderedDict.fromkeys(path[0] for path in expand):
+            try:
+                field = self.Meta.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if not field.is_relation or field.related_model is None:
+                continue
+            fields[name] = self.get_expanded_field(name, field, requested, expand)
+            expanded.append(name)
+        if requested is None:
+            return fields
+        names = {path[0] for path in requested}.union(expanded)
+        return OrderedDict((name, field) for name, field in fields.items() if name in names)
+
+    def get_validation_plan(self):
+        """Plano de validação compilado: campos graváveis, validação, gancho validate_<campo> e source_attrs.
+        Os ganchos são obtidos uma única vez por classe e o plano é montado uma única vez por instância,
+        no many=True o mesmo serializer filho valida todos os itens da lista
+        """
+        plan = getattr(self, '_validation_plan', None)
+        if plan is None:
+            fields = list(self._writable_fields)
+            hooks = get_validation_hooks(type(self), tuple(field.field_name for field in fields))
+            plan = tuple(
+                ValidationStep(field.field_name, field.get_value, field.run_validation,
+                               getattr(self, 'validate_' + name) if hook is not None else None, field.source_attrs)
+                for field, (name, hook) in zip(fields, hooks))
+            self._validation_plan = plan
+        return plan
+
     def to_internal_value(self, data):
         """
             Para padronizar o retorno das mensagem que vem do padrão do Django.
@@ -22,28 +232,366 @@ class Serializador(ModelSerializer):
 
         ret = OrderedDict()
         errors = OrderedDict()
-        fields = self._writable_fields
 
-        for field in fields:
-            validate_method = getattr(self, 'validate_' + field.field_name, None)
-            primitive_value = field.get_value(data)
+        for field_name, get_value, run_validation, validate_method, source_attrs in self.get_validation_plan():
             try:
-                validated_value = field.run_validation(primitive_value)
+                validated_value = run_validation(get_value(data))
                 if validate_method is not None:
                     validated_value = validate_method(validated_value)
             except ValidationError as exc:
                 # errors[field.field_name] = exc.detail
                 # Padrão definido para retorno do error
-                errors["error_message"] = {field.field_name: exc.detail}
+                errors["error_message"] = {field_name: exc.detail}
 
             except DjangoValidationError as exc:
-                errors[field.field_name] = get_error_detail(exc)
+                errors[field_name] = get_error_detail(exc)
             except SkipField:
                 pass
             else:
-                set_value(ret, field.source_attrs, validated_value)
+                set_value(ret, source_attrs, validated_value)
 
         if errors:
             raise ValidationError(errors)
 
         return ret
+
+
+class BulkDeleteMixin(object):
+    """Mixin para as viewsets que adiciona a rota bulk-delete (POST),
+    os registros são marcados como excluídos pelo BaseQuerySet.soft_delete em lotes.
+    Os registros são informados pela lista 'ids' no corpo da requisição, os filtros da
+    viewset (filter_queryset) apenas restringem os registros que podem ser excluídos
+    """
+
+    # Quantidade de registros por transação, quando None utiliza o SOFT_DELETE_CHUNK_SIZE do settings
+    bulk_delete_chunk_size = None
+
+    @action(detail=False, methods=['post'], url_path='bulk-delete')
+    def bulk_delete(self, request, *args, **kwargs):
+        ids = request.data.get('ids') if isinstance(request.data, Mapping) else None
+        if not ids or not isinstance(ids, list):
+            # evitando a exclusão de todos os registros por engano, parametros da URL
+            # (ex: ?format=json) não restringem a queryset
+            return Response({'error_message': 'Informe a lista de ids dos registros.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(pk__in=ids)
+            total, counts = queryset.soft_delete(chunk_size=self.bulk_delete_chunk_size)
+        except (DjangoValidationError, ValueError) as exc:
+            return Response({'error_message': get_error_detail(exc) if isinstance(exc, DjangoValidationError)
+                            else str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(OrderedDict([
+            ('deleted', counts.get(queryset.model._meta.label, 0)),
+            ('total', total),
+            ('counts', counts),
+        ]))
+
+
+class BulkWriteMixin(object):
+    """Mixin para as viewsets que adiciona as rotas de escrita em lote:
+        POST bulk-create/ -- lista de registros novos
+        POST bulk-upsert/ -- lista de registros, atualiza os que possuem o id de um registro existente e cria os demais
+        PATCH bulk-update/ -- lista de alterações parciais, cada item com o id do registro
+
+    A lista pode ser enviada diretamente no corpo da requisição ou na chave 'items'.
+    Todos os itens são validados pelo serializer da viewset e gravados com bulk_create/bulk_update
+    em lotes, dentro de uma única transação. Quando algum item é inválido nada é gravado e os
+    erros são retornados por item no padrão do Serializador: [{'index': 0, 'error_message': {...}}]
+    """
+
+    # Registros por comando, quando None utiliza o BULK_WRITE_CHUNK_SIZE do settings
+    bulk_chunk_size = None
+    # Registros por requisição, quando None utiliza o BULK_WRITE_MAX_ITEMS do settings
+    bulk_max_items = None
+
+    @action(detail=False, methods=['post'], url_path='bulk-create')
+    def bulk_create(self, request, *args, **kwargs):
+        return self.bulk_write(request.data, create=True, update=False)
+
+    @action(detail=False, methods=['post'], url_path='bulk-upsert')
+    def bulk_upsert(self, request, *args, **kwargs):
+        return self.bulk_write(request.data, create=True, update=True)
+
+    @action(detail=False, methods=['patch'], url_path='bulk-update')
+    def bulk_partial_update(self, request, *args, **kwargs):
+        return self.bulk_write(request.data, create=False, update=True, partial=True)
+
+    @staticmethod
+    def __error(index, detail):
+        if isinstance(detail, Mapping) and 'error_message' in detail:
+            detail = detail['error_message']
+        return OrderedDict([('index', index), ('error_message', detail)])
+
+    def __get_items(self, data):
+        items = data.get('items') if isinstance(data, Mapping) else data
+        if not isinstance(items, list) or not items:
+            return None, 'Informe a lista de registros.'
+        max_items = BULK_WRITE_MAX_ITEMS if self.bulk_max_items is None else self.bulk_max_items
+        if max_items and len(items) > max_items:
+            return None, 'Quantidade máxima de {} registros por requisição.'.format(max_items)
+        return items, None
+
+    def __get_keys(self, items, pk, errors):
+        """Chaves informadas nos itens, convertidas para o tipo da chave primária"""
+        keys = {}
+        for index, item in enumerate(items):
+            if not isinstance(item, Mapping) or item.get(pk.name) in (None, ''):
+                continue
+            try:
+                keys[index] = pk.to_python(item.get(pk.name))
+            except DjangoValidationError as exc:
+                errors.append(self.__error(index, {pk.name: get_error_detail(exc)}))
+        return keys
+
+    @staticmethod
+    def __get_unavailable(model, keys, concrete_names):
+        """Chaves que já existem na tabela, com a mensagem de erro de cada uma"""
+        if not keys:
+            return {}
+        rows = model._base_manager.filter(pk__in=keys)
+        if 'deleted' in concrete_names:
+            return {key: 'Registro excluído.' if deleted else 'Registro já existe.'
+                    for key, deleted in rows.values_list('pk', 'deleted')}
+        return {key: 'Registro já existe.' for key in rows.values_list('pk', flat=True)}
+
+    def bulk_write(self, data, create=True, update=False, partial=False):
+        """Valida e grava a lista de registros
+
+        Keyword Arguments:
+            create {bool} -- Criar os itens sem id ou com id inexistente (default: {True})
+            update {bool} -- Atualizar os itens com o id de um registro existente (default: {False})
+            partial {bool} -- Validação parcial dos itens atualizados (default: {False})
+        """
+        items, message = self.__get_items(data)
+        if items is None:
+            return Response({'error_message': message}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.get_queryset()
+        model = queryset.model
+        pk = model._meta.pk
+        errors = []
+        keys = self.__get_keys(items, pk, errors)
+        # registros existentes carregados em uma única consulta
+        existing = queryset.in_bulk(set(keys.values())) if update and keys else {}
+        concrete_names = {field.name for field in model._meta.concrete_fields}
+        # chaves já utilizadas por registros fora da queryset (ex: excluídos logicamente), que não podem
+        # ser criados novamente nem são restaurados pela gravação em lote
+        unavailable = self.__get_unavailable(model, set(keys.values()) - set(existing), concrete_names)
+        m2m_names = {field.name for field in model._meta.many_to_many}
+
+        created, updated, written, relations, seen = [], [], [], [], set()
+        update_fields = set()
+        for index, item in enumerate(items):
+            key = keys.get(index)
+            if key is not None and key in seen:
+                errors.append(self.__error(index, {pk.name: ['Registro repetido na lista.']}))
+                continue
+            seen.add(key)
+            if key in unavailable:
+                errors.append(self.__error(index, {pk.name: [unavailable[key]]}))
+                continue
+            instance = existing.get(key)
+            if instance is None and not create:
+                errors.append(self.__error(index, {pk.name: ['Registro não encontrado.']}))
+                continue
+            if instance is not None:
+                serializer = self.get_serializer(instance, data=item, partial=partial)
+            else:
+                serializer = self.get_serializer(data=item)
+            if not serializer.is_valid():
+                errors.append(self.__error(index, serializer.errors))
+                continue
+            if errors:
+                # com algum erro nada é gravado, os demais itens são apenas validados
+                continue
+
+            values = {name: value for name, value in serializer.validated_data.items() if name in concrete_names}
+            if instance is not None:
+                for name, value in values.items():
+                    setattr(instance, name, value)
+                update_fields.update(values)
+                updated.append(instance)
+            else:
+                instance = model(**values)
+                if key is not None:
+                    instance.pk = key
+                created.append(instance)
+            written.append(instance)
+            m2m = {name: value for name, value in serializer.validated_data.items() if name in m2m_names}
+            if m2m:
+                relations.append((instance, m2m))
+
+        if errors:
+            return Response(OrderedDict([
+                ('error_message', '{} registro(s) inválido(s).'.format(len(errors))),
+                ('errors', errors),
+            ]), status=status.HTTP_400_BAD_REQUEST)
+
+        using = router.db_for_write(model)
+        chunk_size = self.bulk_chunk_size or BULK_WRITE_CHUNK_SIZE
+        manager = model._base_manager.db_manager(using)
+        try:
+            with transaction.atomic(using=using):
+                if created:
+                    manager.bulk_create(created, batch_size=chunk_size)
+                if updated and update_fields:
+                    # o bulk_update não dispara o auto_now, o updated_on é atualizado manualmente
+                    if 'updated_on' in concrete_names:
+                        now = timezone.now()
+                        for instance in updated:
+                            instance.updated_on = now
+                        update_fields.add('updated_on')
+                    manager.bulk_update(updated, sorted(update_fields), batch_size=chunk_size)
+                for instance, m2m in relations:
+                    for name, value in m2m.items():
+                        getattr(instance, name).set(value)
+        except IntegrityError as exc:
+            # valores únicos repetidos ou chaves estrangeiras removidas durante a gravação
+            return Response({'error_message': 'Não foi possível gravar os registros: {}'.format(exc)},
+                            status=status.HTTP_400_BAD_REQUEST)
+        bump_facet_version(model)
+        return Response(OrderedDict([
+            ('created', len(created)),
+            ('updated', len(updated)),
+            ('ids', [instance.pk for instance in written]),
+        ]), status=status.HTTP_201_CREATED if created and not updated else status.HTTP_200_OK)
+
+
+class SparseFieldsMixin(object):
+    """Mixin para as viewsets de leitura aplicarem na queryset o ?fields= e o ?expand=
+    tratados pelo Serializador: only() das colunas solicitadas e select_related/prefetch_related
+    dos relacionamentos expandidos, evitando as consultas por registro
+    """
+
+    def get_queryset(self):
+        queryset = super(SparseFieldsMixin, self).get_queryset()
+        fields, expand = get_sparse_params(self.request)
+        return apply_sparse_fields(queryset, fields, filter_expand(self.get_serializer_class(), expand))
+
+
+class ExportMixin(object):
+    """Mixin para as viewsets que adiciona a rota export/<formato>/ (GET), ex: export/csv/?search=abc
+    Os registros filtrados pela viewset são exportados em streaming (ndjson, csv ou xlsx),
+    serializados em lotes pelo serializer da viewset, sem a paginação
+    """
+
+    # Registros por lote, quando None utiliza o EXPORT_CHUNK_SIZE do settings
+    export_chunk_size = None
+
+    @action(detail=False, methods=['get'], url_path=r'export/(?P<export_format>ndjson|csv|xlsx)')
+    def export(self, request, export_format=None, *args, **kwargs):
+        if export_format not in EXPORT_WRITERS:
+            return Response({'error_message': 'Formato de exportação inválido.'}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = self.filter_queryset(self.get_queryset())
+        fields = [(name, field) for name, field in self.get_serializer().fields.items() if not field.write_only]
+        columns = [name for name, field in fields]
+
+        def batches():
+            for chunk in iter_chunks(queryset, self.export_chunk_size):
+                data = self.get_serializer(chunk, many=True).data
+                yield [[item.get(name) for name in columns] for item in data]
+
+        return export_response(export_format, columns, ['{}'.format(field.label or name) for name, field in fields],
+                               batches(), queryset.model._meta.model_name)
+
+
+class ConditionalGetMixin(object):
+    """Mixin para as viewsets responderem 304 quando o cliente já possui a versão atual,
+    ETag da listagem com MAX(updated_on) e COUNT dos registros filtrados e ETag/Last-Modified
+    do registro com o updated_on, calculados antes da serialização (ver conditional).
+    O ETag da listagem é utilizado apenas com o count_mode 'exact' e com a paginação que conta os registros
+    """
+
+    def use_conditional_list(self, queryset):
+        """O ETag da listagem executa um COUNT(*) exato, utilizado apenas quando a paginação também
+        conta os registros com exatidão, assim as tabelas grandes (estimate/cached) não pagam a contagem
+        e a paginação por cursor, que não conta os registros, não passa a contá-los
+        """
+        if isinstance(self.paginator, (CursorPagination, PaginacaoKeyset)):
+            return False
+        mode = getattr(self, 'count_mode', None) or getattr(self.paginator, 'count_mode', None)
+        return get_count_mode(queryset.model, mode) == COUNT_EXACT
+
+    def __list(self, queryset):
+        # mesmo processamento do ListModelMixin.list, com a queryset já filtrada
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(queryset, many=True).data)
+
+    def list(self, request, *args, **kwargs):
+        # a queryset filtrada é montada uma única vez, para o ETag e para a página
+        queryset = self.filter_queryset(self.get_queryset())
+        validators = list_validators(request, queryset) if self.use_conditional_list(queryset) else None
+        return conditional_response(request, validators, lambda: self.__list(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        validators = None
+        if self.lookup_field in ('pk', self.get_queryset().model._meta.pk.name):
+            validators = detail_validators(request, self.filter_queryset(self.get_queryset()),
+                                           self.kwargs.get(self.lookup_url_kwarg or self.lookup_field))
+        return conditional_response(request, validators,
+                                    lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs))
+
+
+# Mixins do core que sobrescrevem o get_queryset sem restringir os registros
+SYNC_UNSCOPED_MIXINS = (SparseFieldsMixin,)
+
+
+class SyncMixin(object):
+    """Mixin para as viewsets que adiciona a rota changes/ (GET) da sincronização incremental
+    dos clientes offline, ex: changes/?since=2020-01-01T00:00:00Z e depois changes/?cursor=<cursor>
+    Retorna os registros alterados serializados pelo serializer da viewset em 'upserts', as chaves
+    dos registros excluídos em 'deleted', o 'cursor' da próxima requisição e 'more' enquanto
+    existirem mais páginas (ver sync)
+    """
+
+    # Registros por página, quando None utiliza o SYNC_PAGE_SIZE do settings
+    sync_page_size = None
+
+    def __has_scoped_queryset(self):
+        """Indica se a viewset restringe os registros além da exclusão lógica, pelo get_queryset
+        sobrescrito ou pelos filtros do atributo queryset"""
+        for cls in type(self).__mro__:
+            if cls is GenericAPIView:
+                break
+            if 'get_queryset' in cls.__dict__ and cls not in SYNC_UNSCOPED_MIXINS:
+                return True
+        queryset = getattr(self, 'queryset', None)
+        if queryset is None:
+            return False
+        default = queryset.model._default_manager.all()
+        return len(queryset.query.where.children) != len(default.query.where.children)
+
+    def get_sync_queryset(self):
+        """Registros sincronizados, incluindo os excluídos logicamente para gerar os tombstones.
+        Deve ser sobrescrito quando a viewset restringe os registros (ex: por usuário), aplicando
+        a mesma restrição no objects_all
+
+        Raises:
+            ImproperlyConfigured -- Caso a viewset restrinja os registros e o método não tenha sido sobrescrito
+        """
+        if self.__has_scoped_queryset():
+            raise ImproperlyConfigured(
+                '{} restringe os registros no get_queryset/queryset, sobrescreva o get_sync_queryset com a mesma '
+                'restrição para a rota changes/'.format(type(self).__name__))
+        model = self.get_queryset().model
+        manager = getattr(model, 'objects_all', model._base_manager)
+        return manager.all()
+
+    @action(detail=False, methods=['get'], url_path='changes')
+    def changes(self, request, *args, **kwargs):
+        since, cursor = request.query_params.get(SYNC_SINCE_PARAM), request.query_params.get(SYNC_CURSOR_PARAM)
+        try:
+            page_size = int(request.query_params.get(SYNC_PAGE_SIZE_PARAM) or 0) or self.sync_page_size
+            page = get_changes(self.get_sync_queryset(), since=parse_since(since) if since and not cursor else None,
+                               cursor=cursor, page_size=page_size)
+        except (DjangoValidationError, ValueError) as exc:
+            return Response({'error_message': get_error_detail(exc) if isinstance(exc, DjangoValidationError)
+                            else str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(OrderedDict([
+            ('upserts', self.get_serializer(page.upserts, many=True).data),
+            ('deleted', page.deleted),
+            ('cursor', page.cursor),
+            ('more', page.more),
+        ]))
@@ -0,0 +1,351 @@
+"""Pesquisa (parametro q) das views de listagem e da API.
+
+O search_fields da view é compilado uma única vez por classe em um plano
+validado, indicando para cada campo o tipo de busca que será realizada.
+A cada requisição o termo digitado pelo usuário é apenas associado ao plano.
+
+A pesquisa é feita por um backend configurável (SEARCH_BACKEND no settings ou
+search_backend na view):
+    default -- icontains em cada campo do search_fields
+    postgres -- full-text search com a coluna tsvector indexada com GIN
+    trigram -- icontains indexado com pg_trgm e ordenado pela similaridade
+    sqlite -- tabela virtual FTS5, para uso local e nos testes
+Os índices dos backends postgres, trigram e sqlite são gerados pelo comando
+manage.py search_index como uma migration (RunSQL) da app, aplicada pelo migrate.
+"""
+import logging
+import re
+from collections import namedtuple
+from unicodedata import normalize
+
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.db.models import BooleanField, CharField, FloatField, Q, TextField
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from rest_framework.filters import BaseFilterBackend
+from django.db.models.fields.related_descriptors import ForwardManyToOneDescriptor, ManyToManyDescriptor
+from django.db.models.query_utils import DeferredAttribute
+
+from .settings import SEARCH_BACKEND, SEARCH_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Tipos de busca
+SEARCH_ICONTAINS = 'icontains'
+SEARCH_PK = 'pk'
+SEARCH_CONTENT_TYPE = 'content_type'
+SEARCH_GENERIC = 'generic'
+SEARCH_EXACT = 'exact'
+
+# Cache dos planos por classe de view
+_search_plans = {}
+
+SearchTerm = namedtuple('SearchTerm', ['kind', 'field'])
+
+# Nome válido de configuração do full-text search do PostgreSQL (ex: portuguese, pg_catalog.simple)
+REGCONFIG_PATTERN = re.compile(r'^[a-z_][a-z0-9_]*(\.[a-z_][a-z0-9_]*)?$')
+
+# Cache das colunas e tabelas dos índices que já foram encontradas no banco
+_index_objects = set()
+
+
+def regconfig_literal(config=None):
+    """Literal SQL da configuração do full-text search, validada para ser escrita diretamente no SQL
+    (o %s::regconfig depende da interpolação feita no cliente pelo psycopg2)
+
+    Raises:
+        ImproperlyConfigured -- Caso o SEARCH_CONFIG não seja um nome de configuração válido
+    """
+    config = SEARCH_CONFIG if config is None else config
+    if not REGCONFIG_PATTERN.match(config or ''):
+        raise ImproperlyConfigured('SEARCH_CONFIG inválido: {!r}'.format(config))
+    return "'{}'::regconfig".format(config)
+
+
+def check_search_index(connection, table, column=None):
+    """Verifica se a tabela (e a coluna) do índice gerado pelo comando search_index existe no banco
+
+    Raises:
+        ImproperlyConfigured -- Caso o índice ainda não tenha sido gerado
+    """
+    key = (connection.alias, table, column)
+    if key in _index_objects:
+        return
+    with connection.cursor() as cursor:
+        if column is None:
+            found = table in connection.introspection.table_names(cursor)
+        else:
+            found = column in [info.name for info in connection.introspection.get_table_description(cursor, table)]
+    if not found:
+        message = 'Índice de pesquisa não encontrado ({}{}), execute o comando manage.py search_index e o migrate'.format(
+            table, '.{}'.format(column) if column else '')
+        logger.error('Erro: %s; No Metodo: %s' % (message, 'check_search_index()'))
+        raise ImproperlyConfigured(message)
+    _index_objects.add(key)
+
+
+def _is_valid_lookup(model, lookup):
+    """Verifica uma única vez, na compilação, se o lookup é aceito pelo ORM"""
+    try:
+        model._default_manager.filter(**{lookup: ''})
+        return True
+    except Exception:
+        return False
+
+
+def _compile_term(model, field):
+    if not field:
+        return None
+    if _is_valid_lookup(model, '%s__icontains' % field):
+        return SearchTerm(SEARCH_ICONTAINS, field)
+    if hasattr(model, field) and (field in ['pk', 'id'] or field.split('__')[-1] in ['pk', 'id']):
+        # se for um atributo de relacionamento só aceita número
+        return SearchTerm(SEARCH_PK, field)
+    # olha se é um atributo normal
+    if hasattr(model, field) and type(getattr(model, field)) == DeferredAttribute:
+        return SearchTerm(SEARCH_ICONTAINS, field)
+    # resolve a opção de buscar pelo name do model quando usa GenericForeignKey com o atributo content_type no modelo
+    if ('content_type' == field.split('__')[0] and hasattr(model, 'content_type') and
+            type(getattr(model, 'content_type')) == ForwardManyToOneDescriptor and
+            hasattr(ContentType, field.replace('content_type__', ''))):
+        return SearchTerm(SEARCH_CONTENT_TYPE, field)
+    if ('content_object' == field.split('__')[0] and hasattr(model, 'content_object') and
+            type(getattr(model, 'content_object')) == GenericForeignKey):
+        return SearchTerm(SEARCH_GENERIC, field.replace('content_object__', ''))
+    if hasattr(model, field) and type(getattr(model, field)) != ManyToManyDescriptor:
+        return SearchTerm(SEARCH_EXACT, field)
+    logger.error('Erro: campo de pesquisa inválido %s; No Metodo: %s' % (field, 'compile_search()'))
+    return None
+
+
+class SearchPlan(namedtuple('SearchPlan', ['model', 'terms'])):
+    """Plano de pesquisa compilado a partir do search_fields"""
+
+    def bind(self, queryset, term):
+        """Associa o termo pesquisado ao plano
+
+        Returns:
+            Q -- Condição a ser aplicada na queryset
+        """
+        query_params = Q()
+        for search in self.terms:
+            if search.kind == SEARCH_ICONTAINS:
+                query_params |= Q(**{'%s__icontains' % search.field: term})
+            elif search.kind == SEARCH_PK:
+                if term.isnumeric():
+                    query_params |= Q(**{search.field: term})
+            elif search.kind == SEARCH_CONTENT_TYPE:
+                query_params |= Q(**{'%s__icontains' % search.field: self._normalize_content_type(term)})
+            elif search.kind == SEARCH_GENERIC:
+                query_params |= self._bind_generic(queryset, search.field, term)
+            elif search.kind == SEARCH_EXACT:
+                query_params |= Q(**{search.field: term})
+        return query_params
+
+    @staticmethod
+    def _normalize_content_type(term):
+        try:
+            return normalize('NFKD', term.replace(" ", '').lower()).encode('ASCII', 'ignore').decode('ASCII')
+        except Exception as erro_tipo:
+            logger.error('Erro: %s; No Metodo: %s' % (erro_tipo, 'SearchPlan._normalize_content_type()'))
+            return term
+
+    @staticmethod
+    def _bind_generic(queryset, field_name, term):
+        """Busca nos objetos genéricos (GenericForeignKey) usados pelo model"""
+        query_params = Q()
+        try:
+            list_object = queryset.values('content_type_id').distinct()
+            for obj in ContentType.objects.filter(id__in=list_object):
+                try:
+                    # pega os ids dos objetos filtrados
+                    list_id_object = list(obj.model_class()._default_manager.filter(
+                        **{field_name: term}).values_list('pk', flat=True))
+                    if list_id_object:
+                        query_params |= Q(content_type_id=obj.id, object_id__in=list_id_object)
+                except Exception as erro_content:
+                    logger.error('Erro: %s; No Metodo: %s' % (erro_content, 'SearchPlan._bind_generic()'))
+        except Exception as e:
+            logger.error('Erro: %s; No Metodo: %s' % (e, 'SearchPlan._bind_generic()'))
+        return query_params
+
+
+def compile_search(view_class, model, search_fields):
+    """Compila o search_fields da view, o resultado fica em cache por classe
+
+    Returns:
+        SearchPlan
+    """
+    key = (view_class, model, tuple(search_fields))
+    plan = _search_plans.get(key)
+    if plan is None:
+        terms = (_compile_term(model, field) for field in search_fields)
+        plan = SearchPlan(model, tuple(term for term in terms if term is not None))
+        _search_plans[key] = plan
+    return plan
+
+
+def split_search_fields(model, search_fields):
+    """Separa os campos texto do próprio model, que podem ser indexados,
+    dos demais campos (relacionamentos, numéricos, etc)
+
+    Returns:
+        Tuple -- (campos indexáveis, demais campos)
+    """
+    local, others = [], []
+    for name in search_fields:
+        try:
+            field = model._meta.get_field(name) if '__' not in name else None
+        except Exception:
+            field = None
+        if field is not None and field.concrete and isinstance(field, (CharField, TextField)):
+            local.append(field)
+        else:
+            others.append(name)
+    return tuple(local), tuple(others)
+
+
+class BaseSearchBackend(object):
+    """Backend de pesquisa, as subclasses devem implementar o método search"""
+
+    def search(self, queryset, term, search_fields, view_class=None):
+        """Filtra a queryset pelo termo pesquisado
+
+        Returns:
+            QuerySet -- Filtrada e, quando o backend suportar, ordenada pela relevância (search_rank)
+        """
+        raise NotImplementedError
+
+    def search_fallback(self, queryset, term, search_fields, view_class=None):
+        """Condição icontains para os campos que não entram no índice"""
+        if not search_fields:
+            return Q()
+        return compile_search(view_class, queryset.model, search_fields).bind(queryset, term)
+
+    def filter_match(self, queryset, term, others, view_class=None):
+        """Registros encontrados pelo índice (anotação search_match) ou pelo icontains dos demais campos.
+        Os dois ramos são subconsultas separadas pela chave primária, o OR entre o índice e o
+        icontains no mesmo WHERE impede o uso do índice e força a leitura sequencial da tabela
+        """
+        fallback = self.search_fallback(queryset, term, others, view_class)
+        if not fallback:
+            return queryset.filter(search_match=True)
+        return queryset.filter(Q(pk__in=queryset.filter(search_match=True).values('pk')) |
+                               Q(pk__in=queryset.filter(fallback).values('pk')))
+
+
+class DefaultSearchBackend(BaseSearchBackend):
+    """icontains em cada campo do search_fields"""
+
+    def search(self, queryset, term, search_fields, view_class=None):
+        return queryset.filter(self.search_fallback(queryset, term, search_fields, view_class))
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """Full-text search na coluna tsvector gerada pelo comando search_index,
+    os resultados são ordenados pelo ts_rank"""
+
+    column = 'search_vector'
+
+    def search(self, queryset, term, search_fields, view_class=None):
+        local, others = split_search_fields(queryset.model, search_fields)
+        if not local:
+            return DefaultSearchBackend().search(queryset, term, search_fields, view_class)
+        connection = connections[queryset.db]
+        check_search_index(connection, queryset.model._meta.db_table, self.column)
+        qn = connection.ops.quote_name
+        vector = '{}.{}'.format(qn(queryset.model._meta.db_table), qn(self.column))
+        query = 'plainto_tsquery({}, %s)'.format(regconfig_literal())
+        params = (term,)
+        queryset = queryset.annotate(
+            search_match=RawSQL('{} @@ {}'.format(vector, query), params, output_field=BooleanField()),
+            search_rank=RawSQL('ts_rank({}, {})'.format(vector, query), params, output_field=FloatField()),
+        )
+        return self.filter_match(queryset, term, others, view_class).order_by('-search_rank')
+
+
+class TrigramSearchBackend(BaseSearchBackend):
+    """icontains acelerado pelos índices GIN do pg_trgm criados pelo comando search_index,
+    os resultados são ordenados pela similaridade"""
+
+    def search(self, queryset, term, search_fields, view_class=None):
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        queryset = queryset.filter(self.search_fallback(queryset, term, search_fields, view_class))
+        local, others = split_search_fields(queryset.model, search_fields)
+        if not local:
+            return queryset
+        rank = TrigramSimilarity(local[0].name, term)
+        for field in local[1:]:
+            rank = rank + TrigramSimilarity(field.name, term)
+        return queryset.annotate(search_rank=rank).order_by('-search_rank')
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """Pesquisa na tabela virtual FTS5 criada pelo comando search_index,
+    os resultados são ordenados pelo bm25"""
+
+    suffix = '_fts'
+
+    @staticmethod
+    def match_expression(term):
+        # cada palavra vira um prefixo entre aspas, evitando a sintaxe de consulta do FTS5
+        words = ['"{}"*'.format(word.replace('"', '""')) for word in term.split()]
+        return ' '.join(words)
+
+    def search(self, queryset, term, search_fields, view_class=None):
+        local, others = split_search_fields(queryset.model, search_fields)
+        match = self.match_expression(term)
+        if not local or not match:
+            return DefaultSearchBackend().search(queryset, term, search_fields, view_class)
+        opts = queryset.model._meta
+        connection = connections[queryset.db]
+        check_search_index(connection, opts.db_table + self.suffix)
+        qn = connection.ops.quote_name
+        fts = qn(opts.db_table + self.suffix)
+        pk = '{}.{}'.format(qn(opts.db_table), qn(opts.pk.column))
+        queryset = queryset.annotate(
+            search_match=RawSQL('{pk} IN (SELECT pk FROM {fts} WHERE {fts} MATCH %s)'.format(pk=pk, fts=fts),
+                                (match,), output_field=BooleanField()),
+            search_rank=RawSQL('(SELECT -bm25({fts}) FROM {fts} WHERE {fts} MATCH %s AND {fts}.pk = {pk})'.format(
+                pk=pk, fts=fts), (match,), output_field=FloatField()),
+        )
+        return self.filter_match(queryset, term, others, view_class).order_by('-search_rank')
+
+
+SEARCH_BACKENDS = {
+    'default': DefaultSearchBackend,
+    'postgres': PostgresSearchBackend,
+    'trigram': TrigramSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+}
+
+_search_backends = {}
+
+
+def get_search_backend(name=None):
+    """Retorna a instância do backend pelo apelido ou pelo caminho da classe"""
+    name = name or SEARCH_BACKEND
+    backend = _search_backends.get(name)
+    if backend is None:
+        backend_class = SEARCH_BACKENDS.get(name) or import_string(name)
+        backend = _search_backends[name] = backend_class()
+    return backend
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """Filtro da API que utiliza o backend de pesquisa configurado,
+    o termo é passado no parametro search e os campos no search_fields da viewset"""
+
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '').strip()
+        search_fields = [field.lstrip('^=@$') for field in getattr(view, 'search_fields', None) or []]
+        if not term or not search_fields:
+            return queryset
+        backend = get_search_backend(getattr(view, 'search_backend', None))
+        return backend.search(queryset, term, search_fields, view.__class__)
@@ -67,3 +67,187 @@ try:
     LOGOUT_REDIRECT_URL = settings.LOGOUT_REDIRECT_URL
 except expression as identifier:
     pass
+
+# Estratégia padrão para contar os registros das listagens e da API
+# 'exact' (COUNT(*)), 'estimate' (estimativa do planejador do banco) ou 'cached' (COUNT(*) em cache)
+try:
+    from django.conf import settings
+
+    COUNT_MODE = settings.COUNT_MODE
+except:
+    COUNT_MODE = 'exact'
+
+# Estratégia por model, ex: {'app_label.model_name': 'estimate'}
+try:
+    from django.conf import settings
+
+    COUNT_MODES = settings.COUNT_MODES
+except:
+    COUNT_MODES = {}
+
+# Tempo em segundos que o COUNT(*) fica em cache no modo 'cached'
+try:
+    from django.conf import settings
+
+    COUNT_CACHE_TTL = settings.COUNT_CACHE_TTL
+except:
+    COUNT_CACHE_TTL = 300
+
+# Abaixo dessa quantidade a estimativa é descartada e é realizado o COUNT(*)
+try:
+    from django.conf import settings
+
+    COUNT_ESTIMATE_THRESHOLD = settings.COUNT_ESTIMATE_THRESHOLD
+except:
+    COUNT_ESTIMATE_THRESHOLD = 10000
+
+# Tempo em segundos que o conjunto de permissões do usuário fica em cache entre requisições
+# Quando 0 as permissões são carregadas uma vez por requisição
+try:
+    from django.conf import settings
+
+    PERMISSION_CACHE_TTL = settings.PERMISSION_CACHE_TTL
+except:
+    PERMISSION_CACHE_TTL = 0
+
+# Backend da pesquisa das listagens e da API: 'default' (icontains), 'postgres' (tsvector/GIN),
+# 'trigram' (pg_trgm), 'sqlite' (FTS5) ou o caminho de uma classe
+try:
+    from django.conf import settings
+
+    SEARCH_BACKEND = settings.SEARCH_BACKEND
+except:
+    SEARCH_BACKEND = 'default'
+
+# Configuração de idioma utilizada pelo full-text search do PostgreSQL
+try:
+    from django.conf import settings
+
+    SEARCH_CONFIG = settings.SEARCH_CONFIG
+except:
+    SEARCH_CONFIG = 'portuguese'
+
+# Tempo em segundos que as opções dos filtros (list_filter) ficam em cache, a chave do cache
+# contém a versão do model, incrementada pelas operações em lote (update, bulk_create, bulk_update),
+# exclusões e arquivamento, o save de um único registro aparece nas opções ao expirar este tempo
+try:
+    from django.conf import settings
+
+    FACET_CACHE_TTL = settings.FACET_CACHE_TTL
+except:
+    FACET_CACHE_TTL = 300
+
+# Quantidade máxima de opções carregadas por filtro, as demais são obtidas pelo autocomplete
+try:
+    from django.conf import settings
+
+    FACET_LIMIT = settings.FACET_LIMIT
+except:
+    FACET_LIMIT = 50
+
+# Quantidade de registros por transação nas operações em lote (soft_delete, restore, hard_purge),
+# transações menores evitam bloqueios longos em tabelas grandes
+try:
+    from django.conf import settings
+
+    SOFT_DELETE_CHUNK_SIZE = settings.SOFT_DELETE_CHUNK_SIZE
+except:
+    SOFT_DELETE_CHUNK_SIZE = 1000
+
+# Tempo máximo em milissegundos aguardando um bloqueio em cada lote (apenas PostgreSQL), 0 desativa
+try:
+    from django.conf import settings
+
+    SOFT_DELETE_LOCK_TIMEOUT = settings.SOFT_DELETE_LOCK_TIMEOUT
+except:
+    SOFT_DELETE_LOCK_TIMEOUT = 5000
+
+# Versão do UUID utilizado como chave primária do Base: 4 (aleatório, padrão) ou 7 (ordenado pelo tempo),
+# o UUID 7 mantém as inserções no final do índice e torna a ordenação por id cronológica
+try:
+    from django.conf import settings
+
+    PRIMARY_KEY_UUID_VERSION = settings.PRIMARY_KEY_UUID_VERSION
+except:
+    PRIMARY_KEY_UUID_VERSION = 4
+
+# Idade mínima em dias (pelo updated_on) dos registros excluídos logicamente para serem arquivados ou removidos
+try:
+    from django.conf import settings
+
+    ARCHIVE_AFTER_DAYS = settings.ARCHIVE_AFTER_DAYS
+except:
+    ARCHIVE_AFTER_DAYS = 90
+
+# Quantidade de registros por lote (transação) do arquivamento
+try:
+    from django.conf import settings
+
+    ARCHIVE_BATCH_SIZE = settings.ARCHIVE_BATCH_SIZE
+except:
+    ARCHIVE_BATCH_SIZE = 500
+
+# Pausa em segundos entre os lotes do arquivamento, reduzindo a carga no banco
+try:
+    from django.conf import settings
+
+    ARCHIVE_SLEEP = settings.ARCHIVE_SLEEP
+except:
+    ARCHIVE_SLEEP = 0
+
+# Quantidade de registros por página nas seções de relacionamentos das páginas de detalhe e exclusão
+try:
+    from django.conf import settings
+
+    RELATED_PAGE_SIZE = settings.RELATED_PAGE_SIZE
+except:
+    RELATED_PAGE_SIZE = 10
+
+# Contagem máxima por tabela na prévia da exclusão, acima dela é exibido "mais de N" (0 para contar tudo)
+try:
+    from django.conf import settings
+
+    DELETE_IMPACT_LIMIT = settings.DELETE_IMPACT_LIMIT
+except:
+    DELETE_IMPACT_LIMIT = 1000
+
+# Quantidade de registros por comando do bulk_create/bulk_update das rotas de escrita em lote da API
+try:
+    from django.conf import settings
+
+    BULK_WRITE_CHUNK_SIZE = settings.BULK_WRITE_CHUNK_SIZE
+except:
+    BULK_WRITE_CHUNK_SIZE = 1000
+
+# Quantidade máxima de registros por requisição nas rotas de escrita em lote da API (0 sem limite)
+try:
+    from django.conf import settings
+
+    BULK_WRITE_MAX_ITEMS = settings.BULK_WRITE_MAX_ITEMS
+except:
+    BULK_WRITE_MAX_ITEMS = 10000
+
+# Quantidade de registros por lote (iterator chunk_size) das exportações em streaming
+try:
+    from django.conf import settings
+
+    EXPORT_CHUNK_SIZE = settings.EXPORT_CHUNK_SIZE
+except:
+    EXPORT_CHUNK_SIZE = 2000
+
+# Quantidade de registros por página da rota changes/ da sincronização incremental
+try:
+    from django.conf import settings
+
+    SYNC_PAGE_SIZE = settings.SYNC_PAGE_SIZE
+except:
+    SYNC_PAGE_SIZE = 500
+
+# Segundos em que os registros alterados recentemente ficam fora da sincronização incremental,
+# aguardando a confirmação das transações em andamento
+try:
+    from django.conf import settings
+
+    SYNC_LAG_SECONDS = settings.SYNC_LAG_SECONDS
+except:
+    SYNC_LAG_SECONDS = 5
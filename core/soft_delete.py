@@ -0,0 +1,286 @@
+"""Exclusão lógica (deleted=True, enabled=False) em cascata sem carregar registros.
+
+O grafo da cascata é obtido do _meta uma única vez por model e, para cada tabela
+relacionada, é executado um único UPDATE filtrado por subconsulta a partir das chaves
+do nível anterior. A recursão segue apenas os models que herdam do Base (que possuem
+os campos deleted e enabled) através dos relacionamentos reversos (ForeignKey/OneToOne
+apontando para o registro excluído), os demais relacionamentos (ManyToMany e
+GenericRelation) são atualizados apenas no primeiro nível, como no Base.delete original.
+
+Todos os registros alterados por uma operação recebem o mesmo updated_on, assim a
+restauração devolve apenas os registros relacionados excluídos na mesma operação que
+o registro restaurado, os excluídos separadamente continuam excluídos.
+"""
+import logging
+from collections import OrderedDict, namedtuple
+from functools import lru_cache, reduce
+from operator import or_
+
+from django.contrib.contenttypes.fields import GenericRelation
+from django.db import connections
+from django.db.models import ManyToManyField, ManyToManyRel, ManyToOneRel, Q
+from django.utils import timezone
+
+from .facets import bump_facet_version
+from .settings import SOFT_DELETE_LOCK_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Profundidade máxima da recursão, evitando laços em relacionamentos circulares
+CASCADE_MAX_DEPTH = 10
+
+# Tipos de relacionamento da cascata
+CASCADE_CHILD = 'child'
+CASCADE_M2M = 'm2m'
+CASCADE_M2M_REVERSE = 'm2m_reverse'
+CASCADE_GENERIC = 'generic'
+
+
+# Registro da prévia da exclusão: model, quantidade de registros e se a contagem atingiu o limite
+ImpactItem = namedtuple('ImpactItem', ['model', 'count', 'capped'])
+
+
+def is_soft_deletable(model):
+    """Verifica se o model possui os campos da exclusão lógica do Base"""
+    names = {field.name for field in model._meta.concrete_fields}
+    return 'deleted' in names and 'enabled' in names
+
+
+class CascadeEdge(namedtuple('CascadeEdge', ['kind', 'model', 'field'])):
+    """Relacionamento do grafo da cascata
+
+    kind -- Tipo do relacionamento (CASCADE_*)
+    model -- Model relacionado que será atualizado
+    field -- Campo (ou relacionamento reverso) que liga os dois models
+    """
+
+    def related_keys(self, parent_model, parent_keys, using):
+        """Subconsulta com as chaves dos registros relacionados às chaves do nível anterior"""
+        manager = self.model._base_manager.db_manager(using)
+        if self.kind == CASCADE_CHILD:
+            return manager.filter(**{'{}__in'.format(self.field.field.attname): parent_keys}).values('pk')
+        if self.kind == CASCADE_M2M:
+            through = self.field.remote_field.through._base_manager.db_manager(using)
+            return through.filter(**{'{}__in'.format(self.field.m2m_field_name()): parent_keys}).values(
+                self.field.m2m_reverse_field_name())
+        if self.kind == CASCADE_M2M_REVERSE:
+            through = self.field.through._base_manager.db_manager(using)
+            return through.filter(**{'{}__in'.format(self.field.field.m2m_reverse_field_name()): parent_keys}).values(
+                self.field.field.m2m_field_name())
+        if self.kind == CASCADE_GENERIC:
+            from django.contrib.contenttypes.models import ContentType
+
+            content_type = ContentType.objects.db_manager(using).get_for_model(
+                parent_model, for_concrete_model=self.field.for_concrete_model)
+            return manager.filter(**{
+                self.field.content_type_field_name: content_type,
+                '{}__in'.format(self.field.object_id_field_name): parent_keys,
+            }).values('pk')
+        raise ValueError('Tipo de relacionamento inválido: {}'.format(self.kind))
+
+
+@lru_cache(maxsize=None)
+def get_cascade_graph(model):
+    """Relacionamentos que devem ser atualizados quando um registro do model é excluído
+
+    Returns:
+        Tuple -- Tupla de CascadeEdge
+    """
+    excluded = set(getattr(model, 'exclude', None) or ())
+    edges = []
+    for field in model._meta.get_fields(include_parents=True):
+        if field.name in excluded or field.related_model is None or not is_soft_deletable(field.related_model):
+            continue
+        if isinstance(field, GenericRelation):
+            edges.append(CascadeEdge(CASCADE_GENERIC, field.related_model, field))
+        elif isinstance(field, ManyToManyField):
+            edges.append(CascadeEdge(CASCADE_M2M, field.related_model, field))
+        elif isinstance(field, ManyToManyRel):
+            edges.append(CascadeEdge(CASCADE_M2M_REVERSE, field.related_model, field))
+        elif isinstance(field, ManyToOneRel):
+            # ManyToOneRel e OneToOneRel, os registros filhos
+            edges.append(CascadeEdge(CASCADE_CHILD, field.related_model, field))
+    return tuple(edges)
+
+
+def has_updated_on(model):
+    return any(field.name == 'updated_on' for field in model._meta.concrete_fields)
+
+
+def _mark(model, keys, deleted, using, now):
+    values = {'deleted': deleted, 'enabled': not deleted}
+    # o update não dispara o auto_now, o updated_on é atualizado manualmente
+    if has_updated_on(model):
+        values['updated_on'] = now
+    return model._base_manager.db_manager(using).filter(pk__in=keys).exclude(
+        deleted=deleted).update(**values)
+
+
+def follows_edge(edge, depth):
+    """Os relacionamentos ManyToMany e GenericRelation são seguidos apenas no primeiro nível,
+    os registros compartilhados (ex: produtos de um pedido) não são alterados pelos níveis seguintes"""
+    return edge.kind == CASCADE_CHILD or depth == 1
+
+
+def _restorable_keys(edge, model, keys, related_keys, using):
+    """Na restauração apenas os registros excluídos na mesma operação (mesmo updated_on) do registro pai"""
+    if not has_updated_on(model) or not has_updated_on(edge.model):
+        return related_keys
+    stamps = model._base_manager.db_manager(using).filter(pk__in=keys).values('updated_on')
+    return edge.model._base_manager.db_manager(using).filter(
+        pk__in=related_keys, updated_on__in=stamps).values('pk')
+
+
+def _cascade(model, keys, deleted, using, counts, depth, path, now):
+    for edge in get_cascade_graph(model):
+        if not follows_edge(edge, depth):
+            continue
+        related_keys = edge.related_keys(model, keys, using)
+        if deleted:
+            affected = _mark(edge.model, related_keys, deleted, using, now)
+        else:
+            # na restauração os filhos são restaurados antes do pai, enquanto o updated_on
+            # do pai ainda é o da exclusão
+            related_keys = _restorable_keys(edge, model, keys, related_keys, using)
+            affected = None
+        # apenas os registros filhos são percorridos recursivamente, nos relacionamentos
+        # circulares a recursão só continua enquanto houver registros alterados
+        recurse = edge.kind == CASCADE_CHILD and depth < CASCADE_MAX_DEPTH
+        if recurse and edge.model in path:
+            recurse = bool(affected) if deleted else edge.model._base_manager.db_manager(using).filter(
+                pk__in=related_keys, deleted=True).exists()
+        if recurse:
+            _cascade(edge.model, related_keys, deleted, using, counts, depth + 1, path + (edge.model,), now)
+        if not deleted:
+            affected = _mark(edge.model, related_keys, deleted, using, now)
+        if affected:
+            counts[edge.model._meta.label] = counts.get(edge.model._meta.label, 0) + affected
+
+
+def soft_delete_cascade(model, keys, using='default', deleted=True, cascade=True):
+    """Marca os registros (e os relacionados) como excluídos, ou os restaura quando deleted=False
+
+    Deve ser chamado dentro de uma transação. Quando keys for uma queryset ela não deve
+    filtrar pelo campo deleted, pois é reavaliada como subconsulta após o primeiro UPDATE.
+
+    Arguments:
+        model {Model} -- Model dos registros
+        keys {Iterable|QuerySet} -- Chaves dos registros, lista ou queryset com values('pk')
+
+    Keyword Arguments:
+        using {str} -- Banco de dados (default: {'default'})
+        deleted {bool} -- True para excluir e False para restaurar (default: {True})
+        cascade {bool} -- Atualizar também os registros relacionados (default: {True})
+
+    Returns:
+        OrderedDict -- {label do model: quantidade de registros alterados}
+    """
+    counts = OrderedDict()
+    now = timezone.now()
+    if deleted:
+        affected = _mark(model, keys, deleted, using, now)
+        if cascade:
+            _cascade(model, keys, deleted, using, counts, 1, (model,), now)
+    else:
+        # os relacionados são restaurados primeiro, comparando com o updated_on da exclusão
+        if cascade:
+            _cascade(model, keys, deleted, using, counts, 1, (model,), now)
+        affected = _mark(model, keys, deleted, using, now)
+    if affected:
+        counts[model._meta.label] = counts.get(model._meta.label, 0) + affected
+        counts.move_to_end(model._meta.label, last=False)
+    for label in counts:
+        bump_facet_version(model._meta.apps.get_model(label))
+    return counts
+
+
+def _has_affected(model, keys, using, limit):
+    """Indica se o nível possui registros que seriam alterados, com a consulta limitada ao limit"""
+    queryset = model._base_manager.db_manager(using).filter(pk__in=keys).exclude(deleted=True).values('pk')
+    if limit:
+        count = queryset[:limit + 1].count()
+        # acima do limite a prévia já marca o model como capped, não é necessário descer mais
+        return 0 < count <= limit
+    return queryset.exists()
+
+
+def _collect_impact(model, keys, using, subqueries, depth, path, limit):
+    for edge in get_cascade_graph(model):
+        if not follows_edge(edge, depth):
+            continue
+        related_keys = edge.related_keys(model, keys, using)
+        subqueries.setdefault(edge.model, []).append(related_keys)
+        # mesma regra de recursão do _cascade, nos relacionamentos circulares (ex: parent do próprio model)
+        # a recursão só continua enquanto o nível possuir registros que seriam alterados
+        if edge.kind != CASCADE_CHILD or depth >= CASCADE_MAX_DEPTH:
+            continue
+        if edge.model in path and not _has_affected(edge.model, related_keys, using, limit):
+            continue
+        _collect_impact(edge.model, related_keys, using, subqueries, depth + 1, path + (edge.model,), limit)
+
+
+def delete_impact(model, keys, using='default', limit=None):
+    """Prévia da exclusão lógica em cascata, sem alterar nem carregar os registros.
+    O grafo da cascata é percorrido montando as subconsultas das chaves e é executado
+    um único COUNT por tabela, com as subconsultas de todos os caminhos que chegam ao model.
+
+    Arguments:
+        model {Model} -- Model dos registros
+        keys {Iterable|QuerySet} -- Chaves dos registros, lista ou queryset com values('pk')
+
+    Keyword Arguments:
+        using {str} -- Banco de dados (default: {'default'})
+        limit {int} -- Contagem máxima por tabela, acima dele o item é marcado como capped (default: {None})
+
+    Returns:
+        List -- Lista de ImpactItem, apenas dos models com registros afetados
+    """
+    subqueries = OrderedDict([(model, [keys])])
+    _collect_impact(model, keys, using, subqueries, 1, (model,), limit)
+    impact = []
+    for related_model, related_keys in subqueries.items():
+        queryset = related_model._base_manager.db_manager(using).filter(
+            reduce(or_, (Q(pk__in=item) for item in related_keys))).exclude(deleted=True)
+        if limit:
+            count = queryset.values('pk')[:limit + 1].count()
+            item = ImpactItem(related_model, min(count, limit), count > limit)
+        else:
+            item = ImpactItem(related_model, queryset.count(), False)
+        if item.count:
+            impact.append(item)
+    return impact
+
+
+def iter_key_chunks(queryset, chunk_size):
+    """Percorre as chaves da queryset em lotes, paginando pela chave primária
+
+    Quando chunk_size for 0 todas as chaves são retornadas em um único lote.
+    Apenas as chaves são carregadas, nunca os registros.
+    """
+    keys = queryset.order_by('pk').values_list('pk', flat=True)
+    if not chunk_size:
+        chunk = list(keys)
+        if chunk:
+            yield chunk
+        return
+    last = None
+    while True:
+        chunk = list((keys if last is None else keys.filter(pk__gt=last))[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+
+
+def set_lock_timeout(using):
+    """Limita o tempo de espera por bloqueios na transação atual (apenas PostgreSQL)"""
+    connection = connections[using]
+    if SOFT_DELETE_LOCK_TIMEOUT and connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL lock_timeout = %s', ['{}ms'.format(int(SOFT_DELETE_LOCK_TIMEOUT))])
+
+
+def merge_counts(total, counts):
+    for label, affected in counts.items():
+        total[label] = total.get(label, 0) + affected
+    return total
@@ -0,0 +1,103 @@
+"""Sincronização incremental (delta) pelo updated_on para os clientes offline.
+
+A rota changes/ das viewsets retorna, em páginas ordenadas por (updated_on, pk), os
+registros alterados desde a última sincronização: os registros ativos em 'upserts' e as
+chaves dos excluídos logicamente em 'deleted' (tombstones). Cada página retorna o
+'cursor' da posição do último registro, o cliente guarda o cursor ao final da
+sincronização e o envia na próxima, ex:
+    changes/?since=2020-01-01T00:00:00Z  -- primeira sincronização a partir de uma data
+    changes/?cursor=<cursor>             -- próximas páginas e próximas sincronizações
+
+Os registros alterados nos últimos SYNC_LAG_SECONDS segundos só são retornados na
+próxima sincronização, evitando perder as transações que ainda não foram confirmadas
+com um updated_on anterior ao do último registro enviado.
+Os registros removidos definitivamente (ver archive) não geram tombstones, por isso o
+ARCHIVE_AFTER_DAYS deve ser maior que o intervalo máximo entre as sincronizações.
+"""
+import base64
+import json
+from collections import namedtuple
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .settings import SYNC_LAG_SECONDS, SYNC_PAGE_SIZE
+
+# Parametros da URL da sincronização
+SYNC_SINCE_PARAM = 'since'
+SYNC_CURSOR_PARAM = 'cursor'
+SYNC_PAGE_SIZE_PARAM = 'page_size'
+SYNC_MAX_PAGE_SIZE = 5000
+
+SyncPage = namedtuple('SyncPage', ['upserts', 'deleted', 'cursor', 'more'])
+
+
+def encode_cursor(updated_on, pk):
+    value = json.dumps([updated_on.isoformat(), '{}'.format(pk)])
+    return base64.urlsafe_b64encode(value.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Converte o cursor em (updated_on, pk)
+
+    Raises:
+        ValueError -- Caso o cursor seja inválido
+    """
+    try:
+        updated_on, pk = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError('Cursor inválido')
+    return parse_since(updated_on), pk
+
+
+def parse_since(value):
+    """Converte o parametro since (data ISO 8601) em datetime com timezone
+
+    Raises:
+        ValueError -- Caso a data seja inválida
+    """
+    since = parse_datetime(value or '')
+    if since is None:
+        raise ValueError('Data inválida: {}'.format(value))
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since, timezone.utc)
+    return since
+
+
+def get_changes(queryset, since=None, cursor=None, page_size=None):
+    """Página dos registros alterados após o since ou após a posição do cursor
+
+    Arguments:
+        queryset {QuerySet} -- Registros sincronizados, incluindo os excluídos logicamente (ex: objects_all)
+
+    Keyword Arguments:
+        since {datetime} -- Data inicial, ignorada quando o cursor é informado (default: {None})
+        cursor {str} -- Cursor retornado pela página anterior (default: {None})
+        page_size {int} -- Registros por página, quando None utiliza o SYNC_PAGE_SIZE do settings (default: {None})
+
+    Returns:
+        SyncPage -- Registros ativos, chaves dos excluídos, cursor da última posição e se existem mais registros
+    """
+    page_size = max(min(page_size or SYNC_PAGE_SIZE, SYNC_MAX_PAGE_SIZE), 1)
+    queryset = queryset.filter(updated_on__lt=timezone.now() - timedelta(seconds=SYNC_LAG_SECONDS))
+    if cursor:
+        last_updated_on, last_pk = decode_cursor(cursor)
+        if last_pk == '':
+            # cursor de uma sincronização sem alterações, apenas com a data
+            queryset = queryset.filter(updated_on__gt=last_updated_on)
+        else:
+            queryset = queryset.filter(Q(updated_on__gt=last_updated_on) |
+                                       Q(updated_on=last_updated_on, pk__gt=last_pk))
+    elif since is not None:
+        queryset = queryset.filter(updated_on__gt=since)
+    rows = list(queryset.order_by('updated_on', 'pk')[:page_size + 1])
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    if rows:
+        cursor = encode_cursor(rows[-1].updated_on, rows[-1].pk)
+    elif not cursor and since is not None:
+        # nenhuma alteração, o cliente continua a partir da mesma data
+        cursor = encode_cursor(since, '')
+    return SyncPage([row for row in rows if not row.deleted], [row.pk for row in rows if row.deleted], cursor, more)
@@ -1,7 +1,11 @@
 
+from functools import lru_cache
+
 from django import template
 import pprint
 
+from ..permissions import get_permission_resolver
+
 register = template.Library()
 
 @register.simple_tag(takes_context=True)
@@ -39,6 +43,20 @@ def get_many_to_many(obj, object_list):
 
     return manytomany
 
+def _get_model_permission(model, action):
+    """Monta o nome da permissão a partir do item do menu (get_apps)"""
+    if model.get('app_label') and model.get('real_name_model'):
+        return '{}.{}_{}'.format(model.get('app_label'), action, model.get('real_name_model'))
+    return _parse_model_permission(model.get('path_url'), action)
+
+
+@lru_cache(maxsize=1024)
+def _parse_model_permission(path_url, action):
+    __app, __model = path_url.split(":")
+    __model = __model.split("-")[0]
+    return f"{__app}.{action}_{__model}"
+
+
 @register.filter()
 def has_add_permission(model=None, request=None):
     """
@@ -57,11 +75,8 @@ def has_view_permission(model=None, request=None):
     Verifica se o usuário tem a permissão de adicionar, no model passado
     ex: {if model|has_add_permission:request %}
     """
-    __app, __model = model.get('path_url').split(":")
-    __model = __model.split("-")[0]
-    __permission = f"{__app}.view_{__model}"
     if model and request:
-        return request.user.has_perm(__permission)
+        return get_permission_resolver(request).has_perm(_get_model_permission(model, 'view'))
     else:
         return False
 
@@ -72,11 +87,8 @@ def has_change_permission(model=None, request=None):
     Verifica se o usuario tem a permissão de alterar, no model passado
     ex: {if model|has_change_permission:request %}
     """
-    __app, __model = model.get('path_url').split(":")
-    __model = __model.split("-")[0]
-    __permission = f"{__app}.change_{__model}"
     if model and request:
-        return request.user.has_perm(__permission)
+        return get_permission_resolver(request).has_perm(_get_model_permission(model, 'change'))
     else:
         return False
 
@@ -87,10 +99,7 @@ def has_delete_permission(model=None, request=None):
     Verifica se o usuario tem a permissão de deletar, no model passado
     ex: {if model|has_delete_permission:request %}
     """
-    __app, __model = model.get('path_url').split(":")
-    __model = __model.split("-")[0]
-    __permission = f"{__app}.delete_{__model}"
     if model and request:
-        return request.user.has_perm(__permission)
+        return get_permission_resolver(request).has_perm(_get_model_permission(model, 'delete'))
     else:
         return False
@@ -1,3 +1,442 @@
-from django.test import TestCase
+import io
+import uuid
+import zipfile
+from datetime import timedelta
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, models
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.serializers import ModelSerializer
+from rest_framework.test import APIRequestFactory
+from rest_framework.viewsets import ModelViewSet
+
+from .archive import archive_deleted, ensure_archive_tables, get_archive_model
+from .export import format_cell, stream_csv, stream_xlsx
+from .facets import get_facet_options, get_facet_version, get_write_version
+from .models import Base, PaginacaoCustomizada
+from .pagination import Keyset, PaginacaoKeyset
+from .rest_framework import BulkWriteMixin, ConditionalGetMixin, SyncMixin
+from .uuids import rekey_uuid7, uuid7_to_datetime
+from .soft_delete import delete_impact
+
+
+class Categoria(Base):
+    nome = models.CharField(max_length=100)
+    parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE)
+
+    class Meta:
+        app_label = 'core'
+
+
+class Cliente(Base):
+    nome = models.CharField(max_length=100)
+
+    class Meta:
+        app_label = 'core'
+
+
+class Produto(Base):
+    nome = models.CharField(max_length=100)
+    categoria = models.ForeignKey(Categoria, null=True, blank=True, on_delete=models.CASCADE)
+
+    class Meta:
+        app_label = 'core'
+
+
+class Pedido(Base):
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE)
+    produtos = models.ManyToManyField(Produto, blank=True)
+
+    class Meta:
+        app_label = 'core'
+
+
+TEST_MODELS = (Categoria, Cliente, Produto, Pedido)
+
+
+class ModelsTestCase(TestCase):
+    """Cria as tabelas dos models de teste, o core não possui migrations dos models"""
+
+    # Models com as tabelas de arquivo, criadas fora da transação do TestCase (SQLite)
+    archived_models = ()
+
+    @classmethod
+    def setUpClass(cls):
+        with connection.schema_editor() as editor:
+            for model in TEST_MODELS:
+                editor.create_model(model)
+        for model in cls.archived_models:
+            ensure_archive_tables(model)
+        super(ModelsTestCase, cls).setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super(ModelsTestCase, cls).tearDownClass()
+        with connection.schema_editor() as editor:
+            for model in reversed(TEST_MODELS):
+                editor.delete_model(model)
+
+
+class CascadeDataTestCase(ModelsTestCase):
+    def setUp(self):
+        self.categoria = Categoria.objects.create(nome='Bebidas')
+        self.produto = Produto.objects.create(nome='Café', categoria=self.categoria)
+        self.cliente = Cliente.objects.create(nome='Maria')
+        self.outro_cliente = Cliente.objects.create(nome='João')
+        self.pedido = Pedido.objects.create(cliente=self.cliente)
+        self.outro_pedido = Pedido.objects.create(cliente=self.outro_cliente)
+        self.pedido.produtos.add(self.produto)
+        self.outro_pedido.produtos.add(self.produto)
+
+    def assertDeleted(self, obj, deleted=True):
+        self.assertEqual(obj.__class__.objects_all.get(pk=obj.pk).deleted, deleted)
+
+
+class SoftDeleteCascadeTestCase(CascadeDataTestCase):
+    def test_delete_cascades_children(self):
+        self.cliente.delete()
+        self.assertDeleted(self.cliente)
+        self.assertDeleted(self.pedido)
+        self.assertDeleted(self.outro_pedido, False)
+
+    def test_delete_does_not_follow_m2m_below_first_level(self):
+        # Cliente -> Pedido (filho) -> Produto (ManyToMany), o produto é compartilhado com outros pedidos
+        self.cliente.delete()
+        self.assertDeleted(self.produto, False)
+
+    def test_delete_follows_m2m_on_first_level(self):
+        self.pedido.delete()
+        self.assertDeleted(self.produto)
+
+    def test_restore_does_not_follow_m2m_below_first_level(self):
+        self.cliente.delete()
+        self.categoria.delete()
+        # Categoria -> Produto (filho) -> Pedido (ManyToMany reverso), o cliente do pedido continua excluído
+        Categoria.objects_all.filter(pk=self.categoria.pk).restore()
+        self.assertDeleted(self.categoria, False)
+        self.assertDeleted(self.produto, False)
+        self.assertDeleted(self.pedido)
+
+    def test_restore_keeps_rows_deleted_separately(self):
+        self.produto.delete()
+        self.categoria.delete()
+        Categoria.objects_all.filter(pk=self.categoria.pk).restore()
+        self.assertDeleted(self.categoria, False)
+        self.assertDeleted(self.produto)
+
+    def test_restore_cascades_children_deleted_together(self):
+        self.cliente.delete()
+        total, counts = Cliente.objects_all.filter(pk=self.cliente.pk).restore()
+        self.assertDeleted(self.cliente, False)
+        self.assertDeleted(self.pedido, False)
+        self.assertEqual(counts, {'core.Cliente': 1, 'core.Pedido': 1})
+
+
+class DeleteImpactTestCase(CascadeDataTestCase):
+    def impact(self, obj):
+        return {item.model: item.count for item in delete_impact(obj.__class__, [obj.pk])}
+
+    def test_impact_does_not_follow_m2m_below_first_level(self):
+        self.assertEqual(self.impact(self.cliente), {Cliente: 1, Pedido: 1})
+
+    def test_impact_matches_delete(self):
+        impact = self.impact(self.categoria)
+        total, counts = Categoria.objects_all.filter(pk=self.categoria.pk).soft_delete()
+        self.assertEqual({model._meta.label: count for model, count in impact.items()}, counts)
+
+
+class ClienteSerializer(ModelSerializer):
+    class Meta:
+        model = Cliente
+        fields = ('id', 'nome')
+
+
+class ClienteViewAPI(ConditionalGetMixin, ModelViewSet):
+    queryset = Cliente.objects.all()
+    serializer_class = ClienteSerializer
+    pagination_class = PaginacaoCustomizada
+    authentication_classes = ()
+    permission_classes = ()
+    count_mode = 'exact'
+
+
+class ConditionalGetTestCase(ModelsTestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.cliente = Cliente.objects.create(nome='Maria')
+
+    def get(self, view_class=ClienteViewAPI, **headers):
+        return view_class.as_view({'get': 'list'})(self.factory.get('/clientes/', **headers))
+
+    def test_list_not_modified(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('ETag'))
+        response = self.get(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_list_modified_after_write(self):
+        etag = self.get()['ETag']
+        Cliente.objects.create(nome='João')
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_keyset_list_without_etag(self):
+        view_class = type('ClienteKeysetViewAPI', (ClienteViewAPI,), {'pagination_class': PaginacaoKeyset})
+        response = self.get(view_class)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+
+class KeysetTestCase(ModelsTestCase):
+    def setUp(self):
+        for nome in ('Ana', 'Bruno', 'Carla', 'Daniel', 'Eva'):
+            Cliente.objects.create(nome=nome)
+
+    def test_pages_follow_ordering(self):
+        keyset = Keyset(Cliente, ('nome',))
+        names, cursor = [], None
+        while True:
+            page = keyset.paginate(Cliente.objects.all(), 2, cursor)
+            names.extend(item.nome for item in page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(names, ['Ana', 'Bruno', 'Carla', 'Daniel', 'Eva'])
+
+    def test_previous_page(self):
+        keyset = Keyset(Cliente, ('-nome',))
+        first = keyset.paginate(Cliente.objects.all(), 2)
+        second = keyset.paginate(Cliente.objects.all(), 2, first.next_cursor)
+        previous = keyset.paginate(Cliente.objects.all(), 2, second.previous_cursor)
+        self.assertEqual([item.nome for item in second], ['Carla', 'Bruno'])
+        self.assertEqual([item.pk for item in previous], [item.pk for item in first])
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            Keyset(Cliente, ('nome',)).paginate(Cliente.objects.all(), 2, 'invalido')
+
+    def test_related_ordering_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            Keyset(Pedido, ('cliente__nome',))
+        with self.assertRaises(ImproperlyConfigured):
+            Keyset(Pedido, ('produtos',))
+
+
+
+class ArchiveTestCase(ModelsTestCase):
+    archived_models = (Cliente, Categoria)
+
+    def setUp(self):
+        self.produto = Produto.objects.create(nome='Café')
+        self.cliente = Cliente.objects.create(nome='Maria')
+        self.pedido = Pedido.objects.create(cliente=self.cliente)
+        self.pedido.produtos.add(self.produto)
+
+    def test_archive_moves_deleted_with_dependents(self):
+        self.cliente.delete()
+        result = archive_deleted(Cliente, days=0, sleep=0)
+        self.assertTrue(result.finished)
+        self.assertEqual(result.skipped, 0)
+        self.assertFalse(Cliente.objects_all.filter(pk=self.cliente.pk).exists())
+        self.assertFalse(Pedido.objects_all.filter(pk=self.pedido.pk).exists())
+        self.assertTrue(Cliente.objects_archive.filter(pk=self.cliente.pk).exists())
+        self.assertTrue(Pedido.objects_archive.filter(pk=self.pedido.pk).exists())
+        self.assertEqual(get_archive_model(Pedido.produtos.through).objects.count(), 1)
+        self.assertTrue(Produto.objects.filter(pk=self.produto.pk).exists())
+
+    def test_archive_skips_rows_with_live_dependents(self):
+        Cliente.objects_all.filter(pk=self.cliente.pk).soft_delete(cascade=False)
+        result = archive_deleted(Cliente, days=0, sleep=0)
+        self.assertTrue(result.finished)
+        self.assertEqual(result.skipped, 1)
+        self.assertTrue(Cliente.objects_all.filter(pk=self.cliente.pk).exists())
+        self.assertFalse(Pedido.objects_all.get(pk=self.pedido.pk).deleted)
+        self.assertFalse(Cliente.objects_archive.filter(pk=self.cliente.pk).exists())
+
+    def test_restore_brings_back_dependents(self):
+        self.cliente.delete()
+        archive_deleted(Cliente, days=0, sleep=0)
+        self.assertEqual(Cliente.objects_archive.filter(pk=self.cliente.pk).restore(undelete=True), 1)
+        self.assertFalse(Cliente.objects_all.get(pk=self.cliente.pk).deleted)
+        self.assertFalse(Pedido.objects_all.get(pk=self.pedido.pk).deleted)
+        self.assertEqual(list(self.pedido.produtos.all()), [self.produto])
+        self.assertFalse(Pedido.objects_archive.exists())
+
+
+class RekeyUUID7TestCase(ModelsTestCase):
+    def setUp(self):
+        self.clientes = [Cliente.objects.create(id=uuid.uuid4(), nome='Cliente {}'.format(index)) for index in range(5)]
+        self.pedidos = [Pedido.objects.create(id=uuid.uuid4(), cliente=cliente) for cliente in self.clientes]
+
+    def rekey(self):
+        rekey_uuid7('core', 'Cliente', batch_size=2)(apps, SimpleNamespace(connection=connection))
+
+    def test_rekey_replaces_keys_and_foreign_keys(self):
+        self.rekey()
+        clientes = list(Cliente.objects_all.all())
+        self.assertEqual(len(clientes), 5)
+        for cliente in clientes:
+            self.assertEqual(cliente.pk.version, 7)
+            self.assertEqual(round(uuid7_to_datetime(cliente.pk).timestamp() * 1000),
+                             int(cliente.created_on.timestamp() * 1000))
+        self.assertEqual({pedido.cliente_id for pedido in Pedido.objects_all.all()}, {cliente.pk for cliente in clientes})
+
+    def test_rekey_keeps_uuid7_keys(self):
+        self.rekey()
+        keys = set(Cliente.objects_all.values_list('pk', flat=True))
+        self.rekey()
+        self.assertEqual(set(Cliente.objects_all.values_list('pk', flat=True)), keys)
+
+
+class ExportTestCase(SimpleTestCase):
+    def test_format_cell_neutralises_formulas(self):
+        for value in ('=SUM(A1:A2)', '+1', '-1', '@cmd', '\tx', '\rx'):
+            self.assertEqual(format_cell(value), "'" + value)
+        self.assertEqual(format_cell('texto'), 'texto')
+        self.assertEqual(format_cell(-1), -1)
+
+    def test_format_cell_encodes_nested_values(self):
+        self.assertEqual(format_cell(['a', 'b']), '["a", "b"]')
+        self.assertEqual(format_cell({'nome': 'Café'}), '{"nome": "Café"}')
+        self.assertEqual(format_cell([{'nome': '=1'}]), '[{"nome": "=1"}]')
+
+    def test_csv(self):
+        content = ''.join(stream_csv(['nome', 'itens'], [[('=1+1', [1, 2]), (None, 3)]]))
+        self.assertEqual(content, '\ufeffnome,itens\r\n\'=1+1,"[1, 2]"\r\n,3\r\n')
+
+    def test_xlsx(self):
+        content = b''.join(stream_xlsx(['nome', 'total'], [[('=HYPERLINK("x")', 10)]]))
+        with zipfile.ZipFile(io.BytesIO(content)) as workbook:
+            sheet = workbook.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertIn('<t xml:space="preserve">\'=HYPERLINK("x")</t>', sheet)
+        self.assertIn('<c r="B2"><v>10</v></c>', sheet)
+
+
+class ClienteSyncViewAPI(SyncMixin, ClienteViewAPI):
+    pass
+
+
+class SyncTestCase(ModelsTestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.ativos = [Cliente.objects.create(nome=nome) for nome in ('Ana', 'Bruno')]
+        self.excluido = Cliente.objects.create(nome='Carla')
+        self.excluido.delete()
+        # fora da janela do SYNC_LAG_SECONDS
+        self.since = timezone.now() - timedelta(days=2)
+        Cliente.objects_all.update(updated_on=timezone.now() - timedelta(days=1))
+
+    def changes(self, view_class=ClienteSyncViewAPI, **params):
+        return view_class.as_view({'get': 'changes'})(self.factory.get('/clientes/changes/', params))
+
+    def test_changes_with_tombstones(self):
+        response = self.changes(since=self.since.isoformat())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(item['nome'] for item in response.data['upserts']), ['Ana', 'Bruno'])
+        self.assertEqual(response.data['deleted'], [self.excluido.pk])
+        self.assertFalse(response.data['more'])
+
+    def test_cursor_pages_and_next_sync(self):
+        seen, cursor, more = [], None, True
+        params = {'since': self.since.isoformat(), 'page_size': 1}
+        while more:
+            data = self.changes(**dict(params, cursor=cursor) if cursor else params).data
+            seen.extend([item['id'] for item in data['upserts']] + [str(pk) for pk in data['deleted']])
+            cursor, more = data['cursor'], data['more']
+        self.assertEqual(len(seen), 3)
+        self.assertEqual(len(set(seen)), 3)
+        data = self.changes(cursor=cursor).data
+        self.assertEqual((data['upserts'], data['deleted'], data['more']), ([], [], False))
+
+    def test_recent_changes_wait_for_lag(self):
+        Cliente.objects.create(nome='Daniel')
+        response = self.changes(since=self.since.isoformat())
+        self.assertNotIn('Daniel', [item['nome'] for item in response.data['upserts']])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.changes(cursor='invalido').status_code, 400)
+
+    def test_scoped_queryset_requires_sync_queryset(self):
+        view_class = type('ClienteScopedViewAPI', (ClienteSyncViewAPI,), {
+            'get_queryset': lambda self: Cliente.objects.filter(nome='Ana')})
+        with self.assertRaises(ImproperlyConfigured):
+            self.changes(view_class, since=self.since.isoformat())
+
+
+class ClienteBulkViewAPI(BulkWriteMixin, ClienteViewAPI):
+    pass
+
+
+class BulkWriteTestCase(ModelsTestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+
+    def post(self, data, action='bulk_create'):
+        request = self.factory.post('/clientes/{}/'.format(action), data, format='json')
+        return ClienteBulkViewAPI.as_view({'post': action})(request)
+
+    def test_bulk_create(self):
+        response = self.post([{'nome': 'Ana'}, {'nome': 'Bruno'}])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(set(Cliente.objects.values_list('pk', flat=True)), set(response.data['ids']))
+
+    def test_errors_by_index_and_nothing_written(self):
+        response = self.post({'items': [{'nome': 'Ana'}, {}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error_message'], '1 registro(s) inválido(s).')
+        self.assertEqual([error['index'] for error in response.data['errors']], [1])
+        self.assertIn('nome', response.data['errors'][0]['error_message'])
+        self.assertFalse(Cliente.objects_all.exists())
+
+    def test_deleted_key_is_not_recreated(self):
+        cliente = Cliente.objects.create(nome='Ana')
+        cliente.delete()
+        response = self.post([{'id': str(cliente.pk), 'nome': 'Ana'}], action='bulk_upsert')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'], [{'index': 0, 'error_message': {'id': ['Registro excluído.']}}])
+
+    def test_empty_list(self):
+        response = self.post([])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error_message': 'Informe a lista de registros.'})
+
+
+class FacetVersionTestCase(ModelsTestCase):
+    def setUp(self):
+        cache.clear()
+        self.categoria = Categoria.objects.create(nome='Bebidas')
+        Produto.objects.create(nome='Café', categoria=self.categoria)
+
+    def labels(self, model, name):
+        options, more = get_facet_options(model, model._meta.get_field(name))
+        return [option['choice_label'] for option in options]
+
+    def test_save_bumps_only_write_version(self):
+        facet_version, write_version = get_facet_version(Produto), get_write_version(Produto)
+        Produto.objects.create(nome='Chá')
+        self.assertEqual(get_facet_version(Produto), facet_version)
+        self.assertGreater(get_write_version(Produto), write_version)
+
+    def test_options_reloaded_after_bulk_write(self):
+        self.assertEqual(self.labels(Produto, 'nome'), ['Café'])
+        Produto.objects.create(nome='Chá')
+        # o save não invalida as opções, elas expiram pelo FACET_CACHE_TTL
+        self.assertEqual(self.labels(Produto, 'nome'), ['Café'])
+        Produto.objects.filter(nome='Café').update(nome='Café Especial')
+        self.assertEqual(self.labels(Produto, 'nome'), ['Café Especial', 'Chá'])
+
+    def test_related_options_follow_related_model_version(self):
+        self.assertEqual(self.labels(Produto, 'categoria'), [str(self.categoria)])
+        Categoria.objects.bulk_create([Categoria(nome='Doces')])
+        self.assertEqual(len(self.labels(Produto, 'categoria')), 2)
+
+    def test_soft_delete_bumps_facet_version(self):
+        versions = get_facet_version(Categoria), get_facet_version(Produto)
+        self.categoria.delete()
+        self.assertGreater(get_facet_version(Categoria), versions[0])
+        self.assertGreater(get_facet_version(Produto), versions[1])
@@ -0,0 +1,153 @@
+"""UUIDs ordenados pelo tempo (layout do UUID versão 7) para a chave primária do Base.
+
+    48 bits -- timestamp Unix em milissegundos
+     4 bits -- versão (7)
+    12 bits -- contador, garantindo a ordem dos ids gerados no mesmo milissegundo
+     2 bits -- variante (RFC 4122)
+    62 bits -- aleatórios
+
+Ao contrário do uuid4, os ids novos são sempre maiores que os anteriores, assim as
+inserções ficam concentradas no final do índice e a ordenação por id é cronológica.
+A utilização é opcional, habilitada pelo PRIMARY_KEY_UUID_VERSION = 7 no settings.
+Para as tabelas existentes o rekey_uuid7 gera uma operação RunPython que substitui
+as chaves uuid4 por uuid7 calculados a partir do created_on de cada registro.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from django.db import transaction
+from django.db.models import Case, Q, Value, When
+
+from .settings import PRIMARY_KEY_UUID_VERSION
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_last_timestamp = 0
+_counter = 0
+
+
+def _build(timestamp_ms, counter, random_bits):
+    value = (timestamp_ms & 0xFFFFFFFFFFFF) << 80
+    value |= 0x7 << 76
+    value |= (counter & 0xFFF) << 64
+    value |= 0b10 << 62
+    value |= random_bits & 0x3FFFFFFFFFFFFFFF
+    return uuid.UUID(int=value)
+
+
+def uuid7():
+    """Gera um UUID ordenado pelo tempo, monotônico dentro do processo"""
+    global _last_timestamp, _counter
+    with _lock:
+        timestamp_ms = int(time.time() * 1000)
+        if timestamp_ms <= _last_timestamp:
+            # mesmo milissegundo (ou relógio voltou), incrementa o contador mantendo a ordem
+            _counter += 1
+            if _counter > 0xFFF:
+                _last_timestamp += 1
+                _counter = 0
+            timestamp_ms = _last_timestamp
+        else:
+            _counter = int.from_bytes(os.urandom(2), 'big') & 0x3FF
+        _last_timestamp = timestamp_ms
+        counter = _counter
+    return _build(timestamp_ms, counter, int.from_bytes(os.urandom(8), 'big'))
+
+
+def uuid7_from_datetime(value):
+    """Gera um UUID ordenado com o tempo da data informada, utilizado na migração dos registros existentes"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    timestamp_ms = int(value.timestamp() * 1000)
+    random_bits = int.from_bytes(os.urandom(10), 'big')
+    return _build(timestamp_ms, random_bits >> 64, random_bits)
+
+
+def uuid7_to_datetime(value):
+    """Retorna a data de geração do UUID ordenado ou None caso não seja um UUID versão 7"""
+    if not isinstance(value, uuid.UUID):
+        value = uuid.UUID(str(value))
+    if value.version != 7:
+        return None
+    return datetime.fromtimestamp((value.int >> 80) / 1000, tz=timezone.utc)
+
+
+def is_time_ordered():
+    return PRIMARY_KEY_UUID_VERSION == 7
+
+
+# Default do campo id do Base, mantém o uuid.uuid4 para não gerar migrations quando não habilitado
+default_uuid = uuid7 if is_time_ordered() else uuid.uuid4
+
+
+def _case(column, mapping, output_field):
+    """CASE que troca cada chave antiga pela nova em um único UPDATE"""
+    return Case(*[When(**{column: old, 'then': Value(new)}) for old, new in mapping],
+                output_field=output_field)
+
+
+def rekey_uuid7(app_label, model_name, batch_size=1000):
+    """Cria a função para o migrations.RunPython que substitui as chaves dos registros existentes
+    por UUIDs ordenados gerados a partir do created_on, atualizando as chaves estrangeiras
+    (inclusive das tabelas intermediárias dos ManyToMany) que apontam para o model.
+
+    Os registros são processados em lotes de batch_size chaves, cada lote em uma transação
+    com um UPDATE (CASE com as novas chaves) na tabela do model e um em cada tabela que
+    possui chave estrangeira para ele, ou seja, 1 + quantidade de relacionamentos comandos
+    por lote. As chaves são lidas em lotes paginados por (created_on, pk), apenas as chaves
+    e o created_on do lote atual ficam em memória. As chaves que já são uuid7 são mantidas,
+    assim as chaves novas alcançadas pela paginação são ignoradas e uma execução
+    interrompida continua de onde parou.
+    As chaves estrangeiras do Django no PostgreSQL são DEFERRABLE INITIALLY DEFERRED e cada
+    lote atualiza as chaves estrangeiras das próprias chaves, assim cada lote é consistente.
+    Com o atomic = False na Migration cada lote é confirmado separadamente, evitando uma única
+    transação longa nas tabelas grandes.
+    Campos object_id de GenericForeignKey não são atualizados.
+
+    Exemplo:
+        operations = [migrations.RunPython(rekey_uuid7('app', 'Model'), migrations.RunPython.noop)]
+    """
+
+    def forwards(apps, schema_editor):
+        alias = schema_editor.connection.alias
+        model = apps.get_model(app_label, model_name)
+        manager = model._base_manager.using(alias)
+        pk_field = model._meta.pk
+        incoming = [
+            (rel.related_model, rel.field) for rel in model._meta.get_fields(include_hidden=True)
+            if rel.auto_created and not rel.concrete and (rel.one_to_many or rel.one_to_one)
+        ]
+        ordering = ('created_on', 'pk') if any(f.name == 'created_on' for f in model._meta.fields) else ('pk',)
+        queryset = manager.order_by(*ordering).values_list('pk', *ordering[:-1])
+        total = manager.count()
+        processed = 0
+        last = None
+        while True:
+            page = queryset
+            if last is not None and len(last) > 1:
+                page = page.filter(Q(created_on__gt=last[1]) | Q(created_on=last[1], pk__gt=last[0]))
+            elif last is not None:
+                page = page.filter(pk__gt=last[0])
+            rows = list(page[:batch_size])
+            if not rows:
+                break
+            last = rows[-1]
+            mapping = [(row[0], uuid7_from_datetime(row[1]) if len(row) > 1 and row[1] else uuid7())
+                       for row in rows if uuid.UUID(str(row[0])).version != 7]
+            processed += len(mapping)
+            if not mapping:
+                continue
+            olds = [old for old, new in mapping]
+            with transaction.atomic(using=alias):
+                manager.filter(pk__in=olds).update(**{pk_field.attname: _case('pk', mapping, pk_field)})
+                for related_model, field in incoming:
+                    related_model._base_manager.using(alias).filter(**{'{}__in'.format(field.attname): olds}).update(
+                        **{field.attname: _case(field.attname, mapping, pk_field)})
+            logger.info('rekey_uuid7 %s.%s: %s/%s', app_label, model_name, processed, total)
+
+    return forwards
@@ -4,45 +4,52 @@ as customizações implementadas.
 import logging
 import secrets
 import string
-from datetime import date, datetime
-from locale import normalize
+from collections import namedtuple
 
-import pytz
-from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import (LoginRequiredMixin,
                                         PermissionRequiredMixin)
 from django.contrib.auth.models import User
 from django.contrib.auth.views import (LoginView, LogoutView)
 from django.core.exceptions import (FieldDoesNotExist, FieldError,
-                                    ValidationError)
+                                    ImproperlyConfigured, ValidationError)
 from django.core.mail import EmailMessage
-from django.db.models import (ForeignKey, Q)
-from django.db.models.fields import BooleanField as BooleanFieldModel
-from django.db.models.fields.related_descriptors import ForwardManyToOneDescriptor, ManyToManyDescriptor
-from django.db.models.query_utils import DeferredAttribute
-from django.http import HttpResponse
-from django.shortcuts import redirect
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import redirect, render
 from django.urls import reverse
+from django.utils.functional import SimpleLazyObject
 from django.utils.text import camel_case_to_spaces
 from django.views import View
 from django.views.generic import DetailView, ListView, TemplateView
 from django.views.generic.edit import (CreateView, DeleteView, UpdateView)
 
+from .conditional import conditional_response, detail_validators, list_validators
+from .counting import COUNT_EXACT, CountingPaginator, get_count_mode
+from .export import EXPORT_QUERY_PARAM, EXPORT_WRITERS, export_response, iter_chunks
+from .facets import FACET_PAGE_PARAM, FACET_QUERY_PARAM, FACET_TERM_PARAM, build_facets, get_facet_options
 from .forms import BaseForm
+from .introspection import count_relations, get_relation_descriptors
+from .listing import compile_list_display, has_fk_attr, materialize_lookups
 from .models import Base
-from .settings import SYSTEM_NAME
+from .navigation import get_apps_for_user
+from .pagination import CURSOR_QUERY_PARAM, Keyset, KeysetPage, get_keyset_ordering
+from .permissions import get_permission_resolver
+from .query_planner import QueryPlanMixin, build_query_plan
+from .search import get_search_backend
+from .settings import DELETE_IMPACT_LIMIT, RELATED_PAGE_SIZE, SYSTEM_NAME
+from .soft_delete import delete_impact
 
 # Configurando o logger
 logger = logging.getLogger(__name__)
 
+# Parametros da URL das páginas de relacionamentos, ex: ?related=pedidos&page=2
+RELATED_QUERY_PARAM = 'related'
+RELATED_PAGE_PARAM = 'page'
 
-def has_fk_attr(classe=None, attr=None):
-    try:
-        classe.objects.values(attr)
-    except Exception as e:
-        return False
-    return True
+# Parametro da URL da prévia da exclusão em JSON, ex: ?impact=1
+IMPACT_QUERY_PARAM = 'impact'
+
+RelatedSection = namedtuple('RelatedSection', ['name', 'label', 'count', 'url'])
 
 
 def get_breadcrumbs(url_str):
@@ -77,39 +84,34 @@ def get_apps(self):
     Returns:
         List -- Lista com as apps que o usuário tem acesso
     """
+    return get_apps_for_user(getattr(self.request, 'user', None),
+                             get_permission_resolver(self.request).permissions)
 
-    from django.apps import apps
-    _apps = []
-    for app in apps.get_app_configs():
-        try:
-            if (app.name.lower().__contains__('django') or
-                    app.name.lower().__contains__('rest_framework') or
-                    app.name.lower().__contains__('core') or
-                    app.name.lower().__contains__('ckeditor') or
-                    app.name.lower().__contains__('corsheaders')):
-                continue
-            _models = []
-            for model in app.get_models():
-                _models.append({'name_model': model._meta.verbose_name,
-                                'url_list_model': '/{app}/{model}/'.format(
-                                    app=model._meta.app_label,
-                                    model=model._meta.model_name),
-                                'path_url': '{app}:{model}-list'.format(
-                                    app=model._meta.app_label.lower(),
-                                    model=model._meta.model_name.lower()
-                                ),
-                                'real_name_model': model._meta.model_name
-                                })
-            _apps.append({'name_app': '%s' % app.verbose_name,
-                          'models_app': _models,
-                          'index_url_app': '{}:{}-index'.format(model._meta.app_label,
-                                                                model._meta.app_label),
-                          'real_name_app': app.name,
-                          'real_name_model': model._meta.model_name})
-        except Exception as error:
-            print(error)
-            continue
-    return _apps
+
+def has_pending_messages(request):
+    """Verifica se existem mensagens a exibir, nesse caso a página não pode ser respondida com 304"""
+    return len(messages.get_messages(request)) > 0
+
+
+def get_model_permissions(request, model):
+    """Método para recuperar as permissões de adicionar, alterar e excluir do model
+    sem instanciar o model, quando os métodos has_*_permission não foram sobrescritos
+
+    Returns:
+        Dict -- {'has_add_permission': bool, 'has_change_permission': bool, 'has_delete_permission': bool}
+    """
+    permissions = {}
+    instance = None
+    resolver = get_permission_resolver(request)
+    for action in ('add', 'change', 'delete'):
+        name = 'has_{}_permission'.format(action)
+        if getattr(model, name, None) is getattr(Base, name):
+            permissions[name] = resolver.has_model_perm(action, model)
+        else:
+            # o model sobrescreveu o método, então ele é respeitado
+            instance = instance or model()
+            permissions[name] = getattr(instance, name)(request)
+    return permissions
 
 
 class BaseTemplateView(TemplateView):
@@ -161,7 +163,7 @@ class IndexTemplate(LoginRequiredMixin, PermissionRequiredMixin, BaseTemplateVie
         return not self.request.user is None and self.request.user.is_authenticated and self.request.user.is_active
 
 
-class BaseListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+class BaseListView(LoginRequiredMixin, PermissionRequiredMixin, QueryPlanMixin, ListView):
     """
     Classe base que deve ser herdada caso o desenvolvedor queira reaproveitar
     as funcionalidades já desenvolvidas ListView
@@ -175,12 +177,32 @@ class BaseListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
     model = Base
     list_filter = []
     search_fields = []
+    # Backend da pesquisa, quando None utiliza o SEARCH_BACKEND do settings
+    search_backend = None
     list_display = list_filter + search_fields
     query_params_q = ""
     url_pagination = ""
     query_params_filters = []
     paginate_by = 1000
     template_name_suffix = '_list'
+    # Quando True o plano de consulta carrega apenas as colunas do list_display
+    query_plan_only = False
+    # Modo de paginação: 'offset' (padrão do Django) ou 'keyset' (por cursor, recomendado para tabelas grandes)
+    pagination_mode = 'offset'
+    # Ordenação utilizada pelo modo keyset, quando None utiliza o Meta.ordering ou ('-created_on', 'id')
+    keyset_ordering = None
+    # Estratégia de contagem: 'exact', 'estimate' ou 'cached', quando None utiliza o settings (COUNT_MODE/COUNT_MODES)
+    count_mode = None
+    paginator_class = CountingPaginator
+    # Quantidade de opções carregadas por filtro, quando None utiliza o FACET_LIMIT do settings
+    facet_limit = None
+    # Quando True as opções dos filtros exibem a quantidade de registros por valor
+    facet_counts = False
+    # Registros por lote da exportação (?export=csv), quando None utiliza o EXPORT_CHUNK_SIZE do settings
+    export_chunk_size = None
+    # Quando True responde 304 (ETag com MAX(updated_on) e COUNT) caso a listagem não tenha sido alterada,
+    # apenas com o count_mode 'exact' e a paginação por offset (ver use_conditional_get)
+    conditional_get = True
 
     def __init__(self):
         if self.template_name is None:
@@ -205,91 +227,125 @@ class BaseListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
         retorna True
         """
         perms = self.get_permission_required()
+        resolver = get_permission_resolver(self.request)
         # o retorno usa a função any para retornar True caso tenha pelo menos uma das permissões na lista perms
-        return any(self.request.user.has_perm(perm) for perm in perms)
+        return any(resolver.has_perm(perm) for perm in perms)
+
+    def get(self, request, *args, **kwargs):
+        # o autocomplete dos filtros é atendido pela própria listagem, ex: ?facet=categoria&term=abc&page=2
+        if request.GET.get(FACET_QUERY_PARAM):
+            return self.get_facet_response(request.GET.get(FACET_QUERY_PARAM))
+        # a exportação utiliza os mesmos filtros da listagem, ex: ?export=csv&q=abc
+        if request.GET.get(EXPORT_QUERY_PARAM):
+            return self.get_export_response(request.GET.get(EXPORT_QUERY_PARAM))
+        # a queryset filtrada é montada uma única vez, para o ETag e para a página
+        queryset = self.get_queryset()
+        if not self.use_conditional_get() or has_pending_messages(request):
+            return self.render_list(queryset)
+        return conditional_response(request, list_validators(request, queryset),
+                                    lambda: self.render_list(queryset))
+
+    def use_conditional_get(self):
+        """O ETag da listagem executa um COUNT(*) exato, utilizado apenas com a contagem exata
+        e a paginação por offset, assim as tabelas grandes (estimate/cached/keyset) não pagam a contagem
+        """
+        return (self.conditional_get and self.pagination_mode != 'keyset' and
+                get_count_mode(self.model, self.count_mode) == COUNT_EXACT)
+
+    def render_list(self, queryset):
+        """Mesmo processamento do ListView.get, com a queryset já filtrada"""
+        self.object_list = queryset
+        if not self.get_allow_empty():
+            if self.get_paginate_by(self.object_list) is not None and hasattr(self.object_list, 'exists'):
+                is_empty = not self.object_list.exists()
+            else:
+                is_empty = not self.object_list
+            if is_empty:
+                raise Http404('Lista vazia e "%(class_name)s.allow_empty" é False.' % {
+                    'class_name': self.__class__.__name__})
+        return self.render_to_response(self.get_context_data())
+
+    def __export_cell(self, render, obj, row_fk):
+        # um erro em uma célula não interrompe o arquivo que já está sendo enviado
+        try:
+            return render(self, obj, row_fk)
+        except Exception as e:
+            logger.error('Erro: %s; No Metodo: %s' % (e, 'BaseListView.get_export_response()'))
+            return ''
+
+    def get_export_response(self, export_format):
+        """Exporta em streaming (ndjson, csv ou xlsx) as colunas do list_display de todos os registros filtrados
+
+        Raises:
+            Http404 -- Caso o formato não seja suportado
+        """
+        if export_format not in EXPORT_WRITERS:
+            raise Http404('Formato de exportação inválido')
+        list_display = self.get_list_display()
+        labels = dict(zip(list_display, self.list_display_verbose_name()))
+        compiled = compile_list_display(self.__class__, self.model, list_display)
+        columns = [name for name, render in compiled.columns]
+
+        def batches():
+            for chunk in iter_chunks(self.get_queryset(), self.export_chunk_size):
+                # os campos com '__' são resolvidos em uma única consulta por lote
+                values_fk = materialize_lookups(self.model, chunk, compiled.lookups)
+                yield [[self.__export_cell(render, obj, values_fk.get(obj.pk, {})) for name, render in compiled.columns]
+                       for obj in chunk]
+
+        return export_response(export_format, columns, ['{}'.format(labels.get(name, name)) for name in columns],
+                               batches(), self.model._meta.model_name)
+
+    def get_facet_response(self, field_name):
+        """Retorna uma página das opções do filtro em JSON
+
+        Raises:
+            Http404 -- Caso o campo não esteja no list_filter
+        """
+        if field_name not in self.list_filter:
+            raise Http404('Filtro inválido')
+        try:
+            field = self.model._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            raise Http404('Filtro inválido')
+        try:
+            page = int(self.request.GET.get(FACET_PAGE_PARAM, 1))
+        except ValueError:
+            page = 1
+        term = self.request.GET.get(FACET_TERM_PARAM, '').strip()
+        options, has_more = get_facet_options(self.model, field, term=term, page=page, limit=self.facet_limit,
+                                              with_counts=self.facet_counts)
+        return JsonResponse({'results': options, 'more': has_more})
+
+    def build_query_plan(self):
+        """Monta o plano de consulta a partir do list_display da view e do fields_display do model.
+        Os campos com '__' não entram no plano pois são resolvidos pelo materialize_lookups
+        """
+        fields = list(self.list_display or ['__str__'])
+        fields += list(getattr(self.model._meta, 'fields_display', None) or [])
+        fields = [name for name in fields if '__' not in name or name == '__str__']
+        return build_query_plan(self.model, fields, restrict_columns=self.query_plan_only)
 
     def get_queryset(self):
-        queryset = super(BaseListView, self).get_queryset()
+        queryset = self.apply_query_plan(super(BaseListView, self).get_queryset())
 
         if ((hasattr(self.model, '_meta') and hasattr(self.model._meta, 'ordering') and self.model._meta.ordering) or
                 ((hasattr(self.model, 'Meta') and hasattr(self.model.Meta, 'ordering') and self.model.Meta.ordering))):
             queryset = queryset.order_by(
                 *(self.model._meta.ordering or self.model.Meta.ordering))
 
+        chave = None
         try:
             param_filter = self.request.GET.get('q')
             query_dict = self.request.GET
-            query_params = Q()
-            for field in self.search_fields:
-                try:
-                    queryset.filter(**{"%s__icontains" % field: param_filter})
-                    query_params |= Q(**{"%s__icontains" %
-                                         field: param_filter})
-                    continue
-                except Exception as e:
-                    pass
-
-                if hasattr(self.model, field) and field != '' and (field in ['pk', 'id'] or (field.split('__')[-1] in ['pk', 'id'])):
-                    # se for um atributo de relacionamento então olha se é numero pois pk só aceita numero.
-                    if not param_filter or (param_filter and param_filter.isnumeric()):
-                        query_params |= Q(**{field: param_filter})
-                # olha se é um atributo normal ou se é de relacionamento
-                elif (hasattr(self.model, field) and type(getattr(self.model, field)) == DeferredAttribute):
-                    query_params |= Q(**{'%s__icontains' %
-                                         field: param_filter})
-                # resolve a opção de buscar pelo name do model quando usa GenericForeignKey com o atributo content_type no modelo
-                elif ('content_type' == field.split('__')[0] and hasattr(self.model, 'content_type') and
-                      type(getattr(self.model, 'content_type')) == ForwardManyToOneDescriptor and
-                      hasattr(ContentType, field.replace('content_type__', ''))):
-                    param_filter_content_type = param_filter
-                    try:
-                        param_filter_content_type = param_filter_content_type.replace(
-                            " ", '').lower()
-                        param_filter_content_type = normalize('NFKD', param_filter_content_type).encode('ASCII',
-                                                                                                        'ignore').decode(
-                            'ASCII')
-                    except Exception as erro_tipo:
-                        logger.error('Erro: %s; No Metodo: %s' %
-                                     (erro_tipo, 'BaseListView.get_queryset()'))
-                        pass
-                    query_params |= Q(**{'%s__icontains' %
-                                         field: param_filter_content_type})
-
-                elif ('content_object' == field.split('__')[0] and hasattr(self.model, 'content_object') and
-                      type(getattr(self.model, 'content_object')) == GenericForeignKey):
-                    try:
-                        # lista de objetos genericos usados pelo model
-                        list_object = queryset.values(
-                            'content_type_id').distinct()
-                        for obj in ContentType.objects.filter(id__in=list_object).all():
-                            try:
-                                # pega o campo do modelo a ser buscado
-                                field_name = field.replace(
-                                    'content_object__', '')
-                                # pega os ids dos objetos filtrados
-                                list_id_object = obj.model_class().objects.filter(
-                                    **{field_name: param_filter}).values_list('id', flat=True)
-                                if len(list_id_object) > 0:
-                                    query_params |= Q(
-                                        content_type_id=obj.id, object_id__in=list_id_object)
-                            except Exception as erro_content:
-                                logger.error('Erro: %s; No Metodo: %s' % (
-                                    erro_content, 'BaseListView.get_queryset()'))
-                                pass
-                    except Exception as e:
-                        logger.error('Erro: %s; No Metodo: %s' %
-                                     (e, 'BaseListView.get_queryset()'))
-                        pass
-                else:
-                    if hasattr(self.model, field) and type(getattr(self.model, field)) != ManyToManyDescriptor:
-                        query_params |= Q(**{field: param_filter})
-
             if param_filter:
-                queryset = queryset.filter(query_params)
+                # o search_fields é compilado uma única vez por classe, aqui apenas o termo é associado ao plano
+                queryset = get_search_backend(self.search_backend).search(
+                    queryset, param_filter, self.search_fields, self.__class__)
 
             for chave, valor in query_dict.items():
                 if valor is not None and valor != 'None' and valor != '':
-                    if chave not in ['q', 'csrfmiddlewaretoken', 'page']:
+                    if chave not in ['q', 'csrfmiddlewaretoken', 'page', CURSOR_QUERY_PARAM, EXPORT_QUERY_PARAM]:
                         not_exact = False
                         if "__not_exact" in chave:
                             not_exact = True
@@ -310,13 +366,16 @@ class BaseListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
                         queryset = queryset.filter(**{chave: valor})
             return queryset
         except FieldError as fe:
-            if field:
+            if chave:
                 # COLOQUE O extra_tags='danger' PARA CASO DE ERROS, POIS O DJANGO MANDA O NOME erro E NÃO danger QUE É PADRÃO DO BOOTSTRAP
                 messages.error(self.request, "Erro com o campo '%s'!" %
-                               field, extra_tags='danger')
+                               chave, extra_tags='danger')
                 logger.error('Erro: %s; No Metodo: %s' %
                              (fe, 'BaseListView.get_queryset()'))
             return queryset.none()
+        except ImproperlyConfigured:
+            # índice de pesquisa ausente ou configuração inválida não deve virar uma listagem vazia
+            raise
         except Exception as e:
             print(e)
             messages.error(
@@ -325,6 +384,24 @@ class BaseListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
                          (e, 'BaseListView.get_queryset()'))
             return queryset.none()
 
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        kwargs.setdefault('count_mode', self.count_mode)
+        return super(BaseListView, self).get_paginator(queryset, per_page, orphans=orphans,
+                                                       allow_empty_first_page=allow_empty_first_page, **kwargs)
+
+    def paginate_queryset(self, queryset, page_size):
+        """Sobrescrevendo a paginação para permitir o modo keyset,
+        onde a página é obtida a partir do cursor informado no parametro 'cursor'
+        """
+        if self.pagination_mode != 'keyset':
+            return super(BaseListView, self).paginate_queryset(queryset, page_size)
+        keyset = Keyset(self.model, get_keyset_ordering(self.model, self.keyset_ordering))
+        try:
+            page = keyset.paginate(queryset, page_size, self.request.GET.get(CURSOR_QUERY_PARAM))
+        except ValueError as error:
+            raise Http404(error)
+        return None, page, page.object_list, page.has_other_pages()
+
     def list_display_verbose_name(self):
         list_display_verbose_name = []
         for name in self.get_list_display():
@@ -467,6 +544,9 @@ class BaseListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
                 # retira o csrf token caso exista
                 if query_params.get('csrfmiddlewaretoken'):
                     query_params.pop('csrfmiddlewaretoken')
+                # retira o cursor da paginação keyset, ele é adicionado nos links de próxima/anterior
+                if query_params.get(CURSOR_QUERY_PARAM):
+                    query_params.pop(CURSOR_QUERY_PARAM)
                 # cria a url para add ao link de paginação para não perder os filtros
                 url_pagination = ''
                 for key, value in query_params.items():
@@ -480,73 +560,29 @@ class BaseListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
                 # O apps todas as verificações sobram os filtros que são add em outra variável no context apenas dele.
                 context['query_params_filters'] = query_params
 
+            # total de registros, exibido como ~N quando for uma estimativa
+            if context.get('paginator') is not None:
+                context['total_itens'] = '{}'.format(context['paginator'].count)
+
+            # links da paginação keyset carregando o cursor e os filtros
+            page = context.get('page_obj')
+            if isinstance(page, KeysetPage):
+                url_page = '?{}{}='.format(context.get('url_pagination', ''), CURSOR_QUERY_PARAM)
+                context['url_next_page'] = url_page + page.next_cursor if page.has_next() else ''
+                context['url_previous_page'] = url_page + page.previous_cursor if page.has_previous() else ''
+
             # manipulo a lista para tratar de forma diferente
             list_item = []
+            # o list_display é compilado uma única vez por classe em funções de renderização por coluna
+            compiled = compile_list_display(self.__class__, self.model, self.get_list_display())
+            # campos de relacionamento (ex: pai__name) resolvidos em uma única consulta para toda a página
+            values_fk = materialize_lookups(self.model, context['object_list'], compiled.lookups)
             for obj in context['object_list']:
-
                 field_dict = {}
-
-                obj._meta.get_fields(include_parents=True)
-
-                # percorre os atributos setados no list_display
-                for field_display in self.get_list_display():
+                row_fk = values_fk.get(obj.pk, {})
+                for field_display, render_column in compiled.columns:
                     try:
-                        if '__' in field_display and field_display != '__str__' and has_fk_attr(obj.__class__,
-                                                                                                field_display):
-                            lista_fk = context['object_list'].values(
-                                'id', field_display)
-                            for item_fk in lista_fk:
-                                if item_fk['id'] == obj.id:
-                                    field_dict[field_display] = "{}".format(
-                                        item_fk[field_display])
-                        elif hasattr(obj, field_display) and field_display != '__str__':
-                            # verifica se o campo não é None se sim entra no if
-                            if obj.__getattribute__(field_display) is not None:
-                                # Verificando se o campo possui o metodo do CHOICE
-                                str_metodo_choice = 'get_{nome}_display'.format(
-                                    nome=field_display)
-                                if hasattr(obj, str_metodo_choice):
-                                    field_dict[field_display] = "{}".format(
-                                        getattr(obj, str_metodo_choice)().__str__())
-                                else:
-                                    if type(getattr(obj, field_display)) == datetime:
-                                        campo_date_time = getattr(
-                                            obj, field_display)
-                                        tz = pytz.timezone(settings.TIME_ZONE)
-                                        date_tz = tz.normalize(campo_date_time)
-                                        field_dict[field_display] = "{}".format(
-                                            date_tz.strftime(settings.DATETIME_INPUT_FORMATS[0] or
-                                                             "%d/%m/%Y %H:%M"))
-                                    elif type(getattr(obj, field_display)) == date:
-                                        field_dict[field_display] = "{}".format(
-                                            getattr(obj, field_display).strftime(settings.DATE_INPUT_FORMATS[0] or
-                                                                                 "%d/%m/%Y"))
-                                    #     verifica se é um ManyToMany
-                                    elif hasattr(getattr(obj, field_display), 'all'):
-                                        list_many = []
-                                        # pega uma string feita com o str de cada objeto da lista
-                                        for sub_obj in getattr(obj, field_display).all():
-                                            list_many.append(
-                                                '{}'.format(sub_obj))
-                                        field_dict[field_display] = ', '.join(
-                                            list_many)
-                                    else:
-                                        field_dict[field_display] = "{}".format(
-                                            getattr(obj, field_display).__str__())
-                            else:
-                                # no caso de campos None ele coloca para aparecer vasio
-                                field_dict[field_display] = ""
-                        elif field_display == '__str__':
-                            field_dict[field_display] = "{}".format(
-                                getattr(obj, field_display)())
-
-                        elif hasattr(self, field_display) and self.__getattribute__(
-                                field_display) and field_display != '__str__':
-                            # elif verifica se existe auguma função feita na view e usada no display
-                            # elif verifica se é do tipo allow_tags
-                            # elif então usa o retorno da função para aparecer na lista
-                            field_dict[field_display] = getattr(
-                                self, field_display)(obj)
+                        field_dict[field_display] = render_column(self, obj, row_fk)
                     except Exception as e:
                         logger.error(e)
                         messages.error(self.request, "Erro com o campo '%s' no model '%s'!" % (field_display, str(obj)),
@@ -558,62 +594,9 @@ class BaseListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
             context['object_list'] = list_item
             context['system_name'] = SYSTEM_NAME
 
-            object_filters = []
-            # Refatorar para não precisar pecorrer os itens duas vezes
-            for field in self.model._meta.fields:
-                if field.name in self.list_filter:
-                    # o label do choices.
-                    filter = {}
-                    # variavel para ficar no label do campo
-                    label_name = ' '.join(str(field.name).split('_')).title()
-                    if hasattr(field, 'verbose_name') and field.verbose_name:
-                        label_name = field.verbose_name
-                    # Verificando se o campo e relacionamento
-                    if isinstance(field, ForeignKey):
-                        filter[field.name] = {'label': label_name, 'list': field.related_model.objects.distinct(),
-                                              'type_filter': 'ForeignKey'}
-                    # Verificando se o campo eh booleano
-                    elif isinstance(field, BooleanFieldModel):
-                        filter[field.name] = {'label': label_name, 'list': ['True', 'False'],
-                                              'type_filter': 'BooleanFieldModel'}
-                    elif isinstance(field, DateField) or isinstance(field, DateTimeField):
-                        # cria um choice list com  os operadores que poderá usar
-                        choice_date_list = []
-                        choice_date_list.append(
-                            {'choice_id': '__exact', 'choice_label': 'Igual'})
-                        choice_date_list.append(
-                            {'choice_id': '__not_exact', 'choice_label': 'Diferente'})
-                        choice_date_list.append(
-                            {'choice_id': '__lt', 'choice_label': 'Menor que'})
-                        choice_date_list.append(
-                            {'choice_id': '__gt', 'choice_label': 'Maior que'})
-                        choice_date_list.append(
-                            {'choice_id': '__lte', 'choice_label': 'Menor Igual a'})
-                        choice_date_list.append(
-                            {'choice_id': '__gte', 'choice_label': 'Maior Igual a'})
-
-                        filter[field.name] = {'label': label_name, 'list': choice_date_list,
-                                              'type_filter': str(type(field))[:-2].split('.')[-1]}
-                    else:
-                        # Verificando se o campo possui o atributo CHOICE
-                        if hasattr(field, 'choices') and len(getattr(field, 'choices')) > 0 \
-                                and hasattr(field, 'flatchoices') and len(getattr(field, 'flatchoices')) > 0:
-                            choice_list = []
-                            for choice in getattr(field, 'flatchoices'):
-                                item = {
-                                    'choice_id': choice[0], 'choice_label': choice[1]}
-                                choice_list.append(item)
-                            filter[field.name] = {'label': label_name, 'list': choice_list,
-                                                  'type_filter': 'ChoiceField'}
-                        else:
-                            # ele ja faz o distinct e ordena de acordo com o nome do campo
-                            # add um dicionario com o nome do label, lista do filtro e o tipo de campo
-                            filter[field.name] = {'label': label_name, 'list': self.get_queryset().
-                                values_list(field.name, flat=True).order_by(
-                                field.attname).distinct(field.attname),
-                                                  'type_filter': str(type(field))[:-2].split('.')[-1]}
-                    object_filters.append(filter)
-
+            # opções dos filtros limitadas e em cache, as demais são carregadas pelo autocomplete (?facet=campo)
+            object_filters = build_facets(self.model, self.list_filter, limit=self.facet_limit,
+                                          with_counts=self.facet_counts)
             context['filters'] = object_filters
 
             context['url_create'] = '{app}:{model}-create'.format(app=self.model._meta.app_label,
@@ -635,12 +618,7 @@ class BaseListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
                     self.model._meta.verbose_name_plural or self.model._meta.object_name).title()
             context['apps'] = get_apps(self)
 
-            context['has_add_permission'] = self.model(
-            ).has_add_permission(self.request)
-            context['has_change_permission'] = self.model(
-            ).has_change_permission(self.request)
-            context['has_delete_permission'] = self.model(
-            ).has_delete_permission(self.request)
+            context.update(get_model_permissions(self.request, self.model))
 
             return context
 
@@ -650,7 +628,67 @@ class BaseListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
             pass
 
 
-class BaseDetailView(LoginRequiredMixin, PermissionRequiredMixin, DetailView):
+class RelatedSectionsMixin(object):
+    """Seções dos relacionamentos (ManyToMany, ForeignKey reverso e genéricos) do registro.
+    A página exibe apenas o título e a quantidade de registros de cada seção, as quantidades
+    são obtidas em uma única consulta. Os registros são carregados sob demanda, página a
+    página, pela própria view, ex: ?related=pedidos&page=2
+    """
+
+    # Registros por página, quando None utiliza o RELATED_PAGE_SIZE do settings
+    related_page_size = None
+    related_template_name = 'core/block/related_page.html'
+
+    def get(self, request, *args, **kwargs):
+        if request.GET.get(RELATED_QUERY_PARAM):
+            self.object = self.get_object()
+            return self.get_related_response(request.GET.get(RELATED_QUERY_PARAM))
+        return super(RelatedSectionsMixin, self).get(request, *args, **kwargs)
+
+    def get_related_descriptors(self):
+        return get_relation_descriptors(self.model)
+
+    def get_related_url(self, name, page=1):
+        return '{path}?{related}={name}&{page_param}={page}'.format(
+            path=self.request.path, related=RELATED_QUERY_PARAM, name=name, page_param=RELATED_PAGE_PARAM, page=page)
+
+    def get_related_sections(self):
+        """Seções dos relacionamentos com as quantidades, sem carregar os registros"""
+        descriptors = self.get_related_descriptors()
+        counts = count_relations(self.object, descriptors)
+        return [RelatedSection(descriptor.name, descriptor.label, counts[descriptor.name],
+                               self.get_related_url(descriptor.name)) for descriptor in descriptors]
+
+    def get_related_response(self, name):
+        """Retorna o fragmento HTML com uma página dos registros do relacionamento
+
+        Raises:
+            Http404 -- Caso o relacionamento não seja exibido pela view
+        """
+        descriptor = next((item for item in self.get_related_descriptors() if item.name == name), None)
+        if descriptor is None:
+            raise Http404('Relacionamento inválido')
+        try:
+            page = max(int(self.request.GET.get(RELATED_PAGE_PARAM, 1)), 1)
+        except ValueError:
+            page = 1
+        page_size = self.related_page_size or RELATED_PAGE_SIZE
+        queryset = descriptor.get_queryset(self.object)
+        if not queryset.ordered:
+            queryset = queryset.order_by('pk')
+        # um registro a mais indica se existe a próxima página, sem o COUNT
+        offset = (page - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        has_more = len(rows) > page_size
+        return render(self.request, self.related_template_name, {
+            'section_name': name,
+            'object_list': rows[:page_size],
+            'page': page,
+            'next_url': self.get_related_url(name, page + 1) if has_more else None,
+        })
+
+
+class BaseDetailView(LoginRequiredMixin, PermissionRequiredMixin, RelatedSectionsMixin, QueryPlanMixin, DetailView):
     """
     Classe base que deve ser herdada caso o desenvolvedor queira reaproveitar
     as funcionalidades já desenvolvidas para DetailView
@@ -663,6 +701,15 @@ class BaseDetailView(LoginRequiredMixin, PermissionRequiredMixin, DetailView):
     model = Base
     exclude = []
     template_name_suffix = '_detail'
+    # Quando True responde 304 (ETag/Last-Modified do updated_on) caso o registro não tenha sido alterado
+    conditional_get = True
+
+    def get(self, request, *args, **kwargs):
+        if not self.conditional_get or has_pending_messages(request):
+            return super(BaseDetailView, self).get(request, *args, **kwargs)
+        validators = detail_validators(request, self.get_queryset(), self.kwargs.get(self.pk_url_kwarg))
+        return conditional_response(request, validators,
+                                    lambda: super(BaseDetailView, self).get(request, *args, **kwargs))
 
     def get_template_names(self):
         if self.template_name:
@@ -685,8 +732,12 @@ class BaseDetailView(LoginRequiredMixin, PermissionRequiredMixin, DetailView):
         retorna True
         """
         perms = self.get_permission_required()
+        resolver = get_permission_resolver(self.request)
         # o retorno usa a função any para retornar True caso tenha pelo menos uma das permissões na lista perms
-        return any(self.request.user.has_perm(perm) for perm in perms)
+        return any(resolver.has_perm(perm) for perm in perms)
+
+    def get_queryset(self):
+        return self.apply_query_plan(super(BaseDetailView, self).get_queryset())
 
     def get_context_data(self, **kwargs):
         context = super(BaseDetailView, self).get_context_data(**kwargs)
@@ -694,7 +745,10 @@ class BaseDetailView(LoginRequiredMixin, PermissionRequiredMixin, DetailView):
         context['user_ip'] = self.request.META.get(
             'HTTP_X_FORWARDED_FOR') or self.request.META.get('REMOTE_ADDR')
         context['object_list'] = object_list
+        # querysets não avaliadas, as seções exibidas na página são as related_sections,
+        # contadas apenas quando o template as utiliza
         context['many_fields'] = many_fields
+        context['related_sections'] = SimpleLazyObject(self.get_related_sections)
         context['system_name'] = SYSTEM_NAME
         context['url_create'] = '{app}:{model}-create'.format(app=self.model._meta.app_label,
                                                               model=self.model._meta.model_name)
@@ -716,12 +770,7 @@ class BaseDetailView(LoginRequiredMixin, PermissionRequiredMixin, DetailView):
                 self.model._meta.verbose_name or self.model._meta.object_name or '').title()
         context['apps'] = get_apps(self)
 
-        context['has_add_permission'] = self.model(
-        ).has_add_permission(self.request)
-        context['has_change_permission'] = self.model(
-        ).has_change_permission(self.request)
-        context['has_delete_permission'] = self.model(
-        ).has_delete_permission(self.request)
+        context.update(get_model_permissions(self.request, self.model))
 
         return context
 
@@ -792,12 +841,7 @@ class BaseUpdateView(LoginRequiredMixin, PermissionRequiredMixin, UpdateView):
                 self.model._meta.verbose_name_plural or self.model._meta.object_name or '').title()
         context['apps'] = get_apps(self)
 
-        context['has_add_permission'] = self.model(
-        ).has_add_permission(self.request)
-        context['has_change_permission'] = self.model(
-        ).has_change_permission(self.request)
-        context['has_delete_permission'] = self.model(
-        ).has_delete_permission(self.request)
+        context.update(get_model_permissions(self.request, self.model))
 
         return context
 
@@ -809,7 +853,8 @@ class BaseUpdateView(LoginRequiredMixin, PermissionRequiredMixin, UpdateView):
         formset_inlines = []
         if hasattr(self, 'inlines') and self.inlines:
             for item in self.inlines:
-                if item.model().has_change_permission(self.request):
+                inline_permissions = get_model_permissions(self.request, item.model)
+                if inline_permissions['has_change_permission']:
                     if self.request.POST:
                         formset = item(self.request.POST, self.request.FILES, instance=self.object,
                                        prefix=item.model._meta.model_name)
@@ -818,12 +863,11 @@ class BaseUpdateView(LoginRequiredMixin, PermissionRequiredMixin, UpdateView):
                                        prefix=item.model._meta.model_name)
                     lista_instance_inline = formset.queryset.all() or []
                     # só seta True caso os valores definidos na permissão do usuario e o can_delete do inlineformset_factory seja True
-                    formset.can_delete = item.model().has_delete_permission(
-                        self.request) and item.can_delete
+                    formset.can_delete = inline_permissions['has_delete_permission'] and item.can_delete
                     if not formset.can_delete:
                         # se não tem permisão de excluir, então seta o valor minimo para 0
                         formset.min_num = 0
-                    if not item.model().has_add_permission(self.request):
+                    if not inline_permissions['has_add_permission']:
                         # se não tem permisão de adcionar, então seta o valor minimo para 0
                         formset.max_num = 0
                     if hasattr(formset, 'prefix') and formset.prefix:
@@ -949,12 +993,7 @@ class BaseCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
                 self.model._meta.verbose_name_plural or self.model._meta.object_name or '').title()
         context['apps'] = get_apps(self)
 
-        context['has_add_permission'] = self.model(
-        ).has_add_permission(self.request)
-        context['has_change_permission'] = self.model(
-        ).has_change_permission(self.request)
-        context['has_delete_permission'] = self.model(
-        ).has_delete_permission(self.request)
+        context.update(get_model_permissions(self.request, self.model))
 
         return context
 
@@ -977,7 +1016,8 @@ class BaseCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
         formset_inlines = []
         if hasattr(self, 'inlines') and self.inlines:
             for item in self.inlines:
-                if item.model().has_change_permission(self.request):
+                inline_permissions = get_model_permissions(self.request, item.model)
+                if inline_permissions['has_change_permission']:
                     if self.request.POST:
                         formset = item(self.request.POST, self.request.FILES, instance=self.object,
                                        prefix=item.model._meta.model_name)
@@ -985,10 +1025,10 @@ class BaseCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
                         formset = item(instance=self.object,
                                        prefix=item.model._meta.model_name)
                     lista_instance_inline = formset.queryset.all() or []
-                    formset.can_delete = item.model().has_delete_permission(self.request)
+                    formset.can_delete = inline_permissions['has_delete_permission']
                     if not formset.can_delete:
                         formset.min_num = len(lista_instance_inline)
-                    if not item.model().has_add_permission(self.request):
+                    if not inline_permissions['has_add_permission']:
                         formset.max_num = len(lista_instance_inline)
                     if hasattr(formset, 'prefix') and formset.prefix:
                         # pode ser colocado o user aqui para utilizar na validação do forms
@@ -1035,7 +1075,7 @@ class BaseCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
             return redirect(self.get_success_url())
 
 
-class BaseDeleteView(LoginRequiredMixin, PermissionRequiredMixin, DeleteView):
+class BaseDeleteView(LoginRequiredMixin, PermissionRequiredMixin, RelatedSectionsMixin, QueryPlanMixin, DeleteView):
     """Classe para gerenciar a deleção dos itens do sistema
     Raises:
         ValidationError -- [Deve ser definido o caminho para o template]
@@ -1043,10 +1083,33 @@ class BaseDeleteView(LoginRequiredMixin, PermissionRequiredMixin, DeleteView):
 
     model = Base
     template_name_suffix = '_confirm_delete'
+    # Contagem máxima por tabela na prévia da exclusão, quando None utiliza o DELETE_IMPACT_LIMIT do settings
+    impact_limit = None
 
     def __init__(self):
         super(BaseDeleteView, self).__init__()
 
+    def get(self, request, *args, **kwargs):
+        # a prévia da exclusão também é atendida em JSON pela própria view, ex: ?impact=1
+        if request.GET.get(IMPACT_QUERY_PARAM):
+            self.object = self.get_object()
+            return JsonResponse({'results': self.get_delete_impact()})
+        return super(BaseDeleteView, self).get(request, *args, **kwargs)
+
+    def get_delete_impact(self):
+        """Registros que serão marcados como excluídos, com um COUNT por tabela da cascata
+
+        Returns:
+            List -- Lista de dicionários com label, verbose_name, count e capped
+        """
+        limit = DELETE_IMPACT_LIMIT if self.impact_limit is None else self.impact_limit
+        return [{
+            'label': item.model._meta.label,
+            'verbose_name': str(item.model._meta.verbose_name_plural),
+            'count': item.count,
+            'capped': item.capped,
+        } for item in delete_impact(self.model, [self.object.pk], using=self.object._state.db, limit=limit)]
+
     def get_template_names(self):
         if self.template_name:
             return [self.template_name, ]
@@ -1075,13 +1138,20 @@ class BaseDeleteView(LoginRequiredMixin, PermissionRequiredMixin, DeleteView):
         """
         return ('{app}.delete_{model}'.format(app=self.model._meta.app_label, model=self.model._meta.model_name),)
 
+    def get_queryset(self):
+        return self.apply_query_plan(super(BaseDeleteView, self).get_queryset())
+
     def get_context_data(self, **kwargs):
         context = super(BaseDeleteView, self).get_context_data(**kwargs)
         context['user_ip'] = self.request.META.get(
             'HTTP_X_FORWARDED_FOR') or self.request.META.get('REMOTE_ADDR')
         object_list, many_fields = self.object.get_all_related_fields()
         context['object_list'] = object_list
+        # querysets não avaliadas, as seções exibidas na página são as related_sections,
+        # contadas apenas quando o template as utiliza
         context['many_fields'] = many_fields
+        context['related_sections'] = SimpleLazyObject(self.get_related_sections)
+        context['delete_impact'] = self.get_delete_impact()
         context['system_name'] = SYSTEM_NAME
 
         context['url_create'] = '{app}:{model}-create'.format(app=self.model._meta.app_label,
@@ -1104,16 +1174,56 @@ class BaseDeleteView(LoginRequiredMixin, PermissionRequiredMixin, DeleteView):
                 self.model._meta.verbose_name_plural or self.model._meta.object_name or '').title()
         context['apps'] = get_apps(self)
 
-        context['has_add_permission'] = self.model(
-        ).has_add_permission(self.request)
-        context['has_change_permission'] = self.model(
-        ).has_change_permission(self.request)
-        context['has_delete_permission'] = self.model(
-        ).has_delete_permission(self.request)
+        context.update(get_model_permissions(self.request, self.model))
 
         return context
 
 
+class BaseBulkDeleteView(LoginRequiredMixin, PermissionRequiredMixin, View):
+    """Classe para gerenciar a exclusão em lote dos itens selecionados na listagem
+    Recebe via POST a lista de ids no parametro 'ids', os registros são marcados
+    como excluídos pelo BaseQuerySet.soft_delete em lotes, sem carregar os registros.
+    """
+
+    model = Base
+    success_url = None
+    # Quantidade de registros por transação, quando None utiliza o SOFT_DELETE_CHUNK_SIZE do settings
+    chunk_size = None
+
+    def get_permission_required(self):
+        """
+            cria a lista de permissões que a view pode ter de acordo com cada model.
+        """
+        return ('{app}.delete_{model}'.format(app=self.model._meta.app_label, model=self.model._meta.model_name),)
+
+    def has_permission(self):
+        resolver = get_permission_resolver(self.request)
+        return all(resolver.has_perm(perm) for perm in self.get_permission_required())
+
+    def get_success_url(self):
+        if self.success_url:
+            return reverse(self.success_url)
+        return reverse('{app}:{model}-list'.format(app=self.model._meta.app_label,
+                                                    model=self.model._meta.model_name))
+
+    def get_queryset(self):
+        return self.model._default_manager.all()
+
+    def post(self, request, *args, **kwargs):
+        ids = [pk for pk in request.POST.getlist('ids') if pk]
+        if not ids:
+            messages.warning(request, "Nenhum registro selecionado!")
+            return redirect(self.get_success_url())
+        try:
+            total, counts = self.get_queryset().filter(pk__in=ids).soft_delete(chunk_size=self.chunk_size)
+            messages.success(request, "{} registro(s) excluído(s) com sucesso!".format(
+                counts.get(self.model._meta.label, 0)))
+        except (ValidationError, ValueError) as e:
+            logger.error('Erro: %s; No Metodo: %s' % (e, 'BaseBulkDeleteView.post()'))
+            messages.error(request, "Erro ao tentar excluir os registros!", extra_tags='danger')
+        return redirect(self.get_success_url())
+
+
 class LoginView(LoginView):
     redirect_authenticated_user = True
     template_name = 'core/registration/login.html'